@@ -0,0 +1,119 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Dict, Optional
+
+class AdmissionRejected(Exception):
+    """Raised when a request can't be queued; carries a Retry-After hint in seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionTicket:
+    def __init__(self, session_id: Optional[str], queued_at: float):
+        self.session_id = session_id
+        self.queued_at = queued_at
+        self.started_at = None
+
+class AdmissionController:
+    """Bounded concurrency with a bounded wait queue in front of it.
+
+    At most `max_concurrency` requests run at once and at most `max_queue`
+    wait for a slot; anything beyond that, anything waiting longer than
+    `queue_timeout` seconds, and a session already holding
+    `per_session_limit` admitted or queued requests is rejected straight away
+    so the client can back off instead of timing out.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, per_session_limit: int,
+                 queue_timeout: float, window: int = 1000):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.per_session_limit = per_session_limit
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.sessions: Dict[str, int] = {}
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {"queue_full": 0, "session_limit": 0, "queue_timeout": 0}
+        self.wait_times = deque(maxlen=window)
+        self.service_times = deque(maxlen=window)
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue is likely to have drained, 1-60."""
+        service = sum(self.service_times) / len(self.service_times) if self.service_times else 1.0
+        estimate = service * (self.waiting + 1) / max(1, self.max_concurrency)
+        return max(1, min(60, math.ceil(estimate)))
+
+    async def acquire(self, session_id: Optional[str] = None,
+                      timeout: Optional[float] = None) -> AdmissionTicket:
+        """Wait for a slot; `timeout` (e.g. the request's deadline) can shorten the queue timeout."""
+        queue_timeout = self.queue_timeout if timeout is None else max(0.0, min(timeout, self.queue_timeout))
+        if session_id and self.sessions.get(session_id, 0) >= self.per_session_limit:
+            self.rejected["session_limit"] += 1
+            raise AdmissionRejected("session_limit", self.retry_after())
+        if self.active >= self.max_concurrency and self.waiting >= self.max_queue:
+            self.rejected["queue_full"] += 1
+            raise AdmissionRejected("queue_full", self.retry_after())
+
+        ticket = AdmissionTicket(session_id, time.monotonic())
+        self._hold_session(session_id, 1)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=queue_timeout)
+        except asyncio.TimeoutError:
+            self._hold_session(session_id, -1)
+            self.rejected["queue_timeout"] += 1
+            raise AdmissionRejected("queue_timeout", self.retry_after())
+        except BaseException:
+            # Client went away while queued
+            self._hold_session(session_id, -1)
+            raise
+        finally:
+            self.waiting -= 1
+
+        ticket.started_at = time.monotonic()
+        self.active += 1
+        self.admitted += 1
+        self.wait_times.append(ticket.started_at - ticket.queued_at)
+        return ticket
+
+    def release(self, ticket: AdmissionTicket) -> None:
+        self.active -= 1
+        self.service_times.append(time.monotonic() - ticket.started_at)
+        self._hold_session(ticket.session_id, -1)
+        self._slots.release()
+
+    def _hold_session(self, session_id: Optional[str], delta: int) -> None:
+        if not session_id:
+            return
+        count = self.sessions.get(session_id, 0) + delta
+        if count > 0:
+            self.sessions[session_id] = count
+        else:
+            self.sessions.pop(session_id, None)
+
+    def stats(self) -> Dict:
+        waits = sorted(self.wait_times)
+
+        def wait_ms(pct: float) -> float:
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(pct / 100 * len(waits)))] * 1000, 1)
+
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "wait_ms_p50": wait_ms(50),
+            "wait_ms_p95": wait_ms(95),
+            "wait_ms_max": wait_ms(100),
+            "service_ms_avg": round(sum(self.service_times) / len(self.service_times) * 1000, 1) if self.service_times else 0.0
+        }
@@ -3,450 +3,107 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from typing import List, Dict, Optional, Tuple
-import re
-from langchain_openai import ChatOpenAI
+import copy
+import threading
 from data_processing.pdf_processor import PDFProcessor
-from data_processing.csv_processor import CSVProcessor  
-from data_processing.embeddings import EmbeddingManager
+from data_processing.tokenizer import count_tokens
+from retrieval_state import RetrievalState
+from request_deadline import RequestDeadline
+from upstream import DeadlineExceeded
+from extractive import build_extractive_answer
+from model_router import ModelRouter, TEMPLATE_DIRECT
+from context_packer import ContextPacker
+from chunk_merger import merge_adjacent_chunks
+from single_flight import normalize_query
+from query_analysis import QueryAnalyzer
+from query_rules import MILITARY_TERMS, INTENT_PATTERNS, STRATEGY_RULES
 from config import settings
 
 class EnhancedRAGAgent:
     def __init__(self):
-        self.llm = ChatOpenAI(
-            api_key=settings.openai_api_key,
-            model="gpt-3.5-turbo",
-            temperature=0.1
-        )
+        # Generation model per strategy; self.llm is the default tier's client
+        self.model_router = ModelRouter(settings.model_tiers, settings.model_routes, settings.default_model_tier)
+        self.llm = self.model_router.llm_for(self.model_router.default_tier)
         self.pdf_processor = PDFProcessor()
-        self.csv_processor = CSVProcessor()
-        self.embedding_manager = EmbeddingManager()
+        self.context_packer = ContextPacker()
         
-        # Load CSV data
-        self.csv_processor.process_csv()
+        # CSV index, chunk store and collection handles; replaced whole by reload_state
+        self.state = RetrievalState.build()
+        self._reload_lock = threading.Lock()
         
         # Initialize military terminology and advanced features
         self.military_terms = self._initialize_military_terms()
         self.intent_patterns = self._initialize_intent_patterns()
         self.strategy_matrix = self._initialize_strategy_matrix()
+        self.query_analyzer = QueryAnalyzer(
+            self.military_terms,
+            self.intent_patterns,
+            self.strategy_matrix,
+            cache_size=settings.query_analysis_cache_size
+        )
+
+    @property
+    def csv_processor(self):
+        return self.state.csv_processor
+
+    @property
+    def embedding_manager(self):
+        return self.state.embedding_manager
+
+    @property
+    def chunk_store(self):
+        return self.state.chunk_store
+
+    @property
+    def section_titles(self):
+        return self.state.section_titles
+
+    @property
+    def pdf_shards(self):
+        return self.state.pdf_shards
+
+    def reload_state(self) -> Dict:
+        """Rebuild the retrieval indexes from disk and swap them in.
+
+        Queries already running keep the state they captured; the swap is a
+        single reference assignment, so new queries see either the old or the
+        new state, never a mix.
+        """
+        with self._reload_lock:
+            new_state = RetrievalState.build(version=self.state.version + 1)
+            self.state = new_state
+        return new_state.describe()
 
     def _initialize_military_terms(self) -> Dict[str, str]:
         """Initialize comprehensive military terminology mappings."""
-        return {
-            # Army units and structures
-            'squad': 'small military unit typically consisting of 9-13 soldiers',
-            'platoon': 'military unit typically consisting of 16-44 soldiers, usually 2-4 squads',
-            'company': 'military unit typically consisting of 80-250 soldiers, usually 3-5 platoons',
-            'battalion': 'military unit typically consisting of 300-1000 soldiers, usually 3-5 companies',
-            'brigade': 'military unit typically consisting of 1500-3200 soldiers, usually 3-5 battalions',
-            'division': 'military unit typically consisting of 10000-20000 soldiers, usually 3-4 brigades',
-            
-            # Military processes and procedures
-            'mdmp': 'Military Decision Making Process - systematic approach to problem solving and planning',
-            'troop leading procedures': 'TLP - eight-step process used by small unit leaders to plan and prepare for operations',
-            'mett-tc': 'Mission, Enemy, Terrain and weather, Troops and support available, Time available, Civil considerations',
-            'sop': 'Standard Operating Procedure - set of step-by-step instructions',
-            'conop': 'Concept of Operations - verbal or graphic statement that clearly and concisely expresses what the commander intends to accomplish',
-            'frago': 'Fragmentary Order - abbreviated form of an operation order issued as needed to change or modify a previous order',
-            'fragord': 'Fragmentary Order - abbreviated form of an operation order issued as needed to change or modify a previous order',
-            'opord': 'Operation Order - directive issued by a commander to coordinate the execution of an operation',
-            'warnord': 'Warning Order - preliminary notice of an order or action which is to follow',
-            
-            # Staff positions and roles
-            's1': 'Personnel Staff Officer - responsible for personnel management, administration, and sustainment',
-            's2': 'Intelligence Staff Officer - responsible for intelligence collection, analysis, and dissemination',
-            's3': 'Operations Staff Officer - responsible for operations, training, and security',
-            's4': 'Logistics Staff Officer - responsible for supply, maintenance, transportation, and services',
-            's5': 'Plans Staff Officer - responsible for planning and civil affairs operations',
-            's6': 'Signal Staff Officer - responsible for communications and information systems',
-            's7': 'Information Operations Staff Officer - responsible for information operations and cyber',
-            's8': 'Finance Staff Officer - responsible for financial management and resource management',
-            's9': 'Civil Affairs Staff Officer - responsible for civil affairs operations and coordination',
-            
-            # Training and evaluation
-            'acft': 'Army Combat Fitness Test - physical fitness assessment consisting of six events',
-            'apft': 'Army Physical Fitness Test - legacy physical fitness test with push-ups, sit-ups, and 2-mile run',
-            'ntc': 'National Training Center - premier combat training center located at Fort Irwin, California',
-            'jrtc': 'Joint Readiness Training Center - combat training center located at Fort Johnson, Louisiana',
-            'ctc': 'Combat Training Center - facility that provides realistic training environments',
-            'jmrc': 'Joint Multinational Readiness Center - combat training center located in Germany',
-            
-            # Awards and decorations
-            'aam': 'Army Achievement Medal - decoration for meritorious service or achievement',
-            'arcom': 'Army Commendation Medal - decoration for sustained acts of heroism or meritorious service',
-            'msm': 'Meritorious Service Medal - decoration for outstanding meritorious achievement or service',
-            'bsm': 'Bronze Star Medal - decoration for heroic or meritorious achievement or service',
-            'purple heart': 'decoration awarded to members wounded or killed in action',
-            
-            # Forms and documents
-            'da638': 'DA Form 638 - Recommendation for Award form',
-            'da31': 'DA Form 31 - Request and Authority for Leave and Earnings Statement',
-            'da4856': 'DA Form 4856 - Developmental Counseling Form',
-            'da2062': 'DA Form 2062 - Hand Receipt/Annex Number',
-            'ncoer': 'Non-Commissioned Officer Evaluation Report - performance evaluation for NCOs',
-            'oer': 'Officer Evaluation Report - performance evaluation for officers',
-            
-            # Combat and tactical terms
-            'coa': 'Course of Action - sequence of actions that a commander may follow',
-            'ccir': 'Commander\'s Critical Information Requirements - information requirements identified by the commander',
-            'pir': 'Priority Intelligence Requirements - intelligence requirements associated with a decision',
-            'oir': 'Other Intelligence Requirements - intelligence requirements not associated with a specific decision',
-            'isr': 'Intelligence, Surveillance, and Reconnaissance - activities that synchronize sensors, assets, and processing',
-            'bda': 'Battle Damage Assessment - evaluation of damage resulting from the application of military force',
-            'sitrep': 'Situation Report - report providing information on the current tactical situation',
-            'spot report': 'SPOTREP - concise narrative report of essential information covering events or conditions',
-            
-            # Leadership and development
-            'nco': 'Non-Commissioned Officer - enlisted soldier in a position of authority',
-            'snco': 'Senior Non-Commissioned Officer - NCO in grades E-7 through E-9',
-            'ncopd': 'Non-Commissioned Officer Professional Development - structured development program',
-            'ocs': 'Officer Candidate School - program to train enlisted soldiers to become officers',
-            'wocs': 'Warrant Officer Candidate School - program to train soldiers to become warrant officers',
-            
-            # Logistics and supply
-            'supply': 'provision of personnel, material, and other items required to sustain military operations',
-            'maintenance': 'actions taken to keep equipment in serviceable condition',
-            'transportation': 'movement of personnel, equipment, and supplies',
-            'sustainment': 'provision of logistics and personnel services necessary to maintain operations',
-            'class i': 'subsistence supplies including food and water',
-            'class ii': 'general supplies including clothing, individual equipment, and administrative supplies',
-            'class iii': 'petroleum, oils, and lubricants',
-            'class iv': 'construction and barrier materials',
-            'class v': 'ammunition and explosives',
-            'class vi': 'personal demand items including food, beverages, and sundries',
-            'class vii': 'major end items including vehicles, weapons systems, and equipment',
-            'class viii': 'medical supplies and equipment',
-            'class ix': 'repair parts and components',
-            'class x': 'material to support nonmilitary programs',
-            
-            # Military document components and formatting terms
-            'mission statement': 'concise statement of the task and purpose that defines what the unit must accomplish',
-            'execution': 'section of an OPORD that describes how the commander intends to accomplish the mission',
-            'scheme of maneuver': 'description of how the commander envisions the operation unfolding',
-            'concept of support': 'description of how supporting elements will enable the mission',
-            'tasks to subordinate units': 'specific missions assigned to subordinate elements',
-            'command and signal': 'information about command relationships and communications',
-            'coordinating instructions': 'instructions that apply to two or more units',
-            'scheme of fires': 'description of how fires support the maneuver plan',
-            'annex': 'appendix to an operation order providing detailed information on specific topics',
-            'commanders intent': 'clear, concise statement of what the force must do and the conditions the force must establish',
-            'end state': 'desired political and military conditions that define achievement of the commanders objectives'
-        }
+        return dict(MILITARY_TERMS)
 
     def _initialize_intent_patterns(self) -> Dict[str, Dict]:
         """Initialize enhanced intent analysis patterns for better hybrid detection."""
-        return {
-            'document_generation': {
-                'primary_indicators': [
-                    'write', 'create', 'generate', 'draft', 'compose', 'prepare', 'develop',
-                    'build', 'construct', 'formulate', 'make', 'produce', 'design', 'develop'
-                ],
-                'secondary_indicators': [
-                    'bullet', 'award', 'citation', 'evaluation', 'report', 'memo', 'letter',
-                    'recommendation', 'assessment', 'paragraph', 'statement', 'summary',
-                    'section', 'annex', 'order', 'brief', 'briefing'
-                ],
-                'form_indicators': [
-                    'da638', 'da31', 'da4856', 'ncoer', 'oer', 'form', 'template',
-                    'opord', 'frago', 'fragord', 'conop', 'sitrep', 'spot report'
-                ],
-                'formatting_indicators': [
-                    'phrase', 'format', 'structure', 'section', 'organize', 'layout',
-                    'arrange', 'word', 'language', 'tone', 'style', 'presentation',
-                    'phrasing', 'wording', 'formatting', 'organization'
-                ],
-                'weight': 0.8
-            },
-            'information_retrieval': {
-                'primary_indicators': [
-                    'what', 'how', 'when', 'where', 'why', 'who', 'explain', 'describe',
-                    'tell', 'show', 'list', 'identify', 'define', 'clarify', 'include'
-                ],
-                'secondary_indicators': [
-                    'role', 'responsibility', 'duty', 'process', 'procedure', 'step',
-                    'requirement', 'regulation', 'standard', 'guideline', 'policy',
-                    'components', 'elements', 'parts', 'contains', 'consists'
-                ],
-                'knowledge_indicators': [
-                    'during', 'in', 'for', 'about', 'regarding', 'concerning', 'involving',
-                    'within', 'inside', 'part of', 'component of'
-                ],
-                'weight': 0.7
-            },
-            'hybrid_request': {
-                'primary_indicators': [
-                    'using', 'based on', 'according to', 'following', 'incorporating',
-                    'with', 'including', 'considering', 'leveraging', 'per', 'via'
-                ],
-                'context_indicators': [
-                    'situation', 'mission', 'operation', 'training', 'deployment',
-                    'exercise', 'scenario', 'environment', 'context', 'for a', 'for an'
-                ],
-                'complexity_indicators': [
-                    'comprehensive', 'detailed', 'thorough', 'complete', 'full',
-                    'extensive', 'in-depth', 'elaborate', 'proper', 'correct'
-                ],
-                'format_knowledge_indicators': [
-                    'phrase', 'format', 'structure', 'section', 'how to write',
-                    'how to phrase', 'what to include', 'how to organize',
-                    'should include', 'should contain', 'goes in', 'belongs in'
-                ],
-                'document_type_indicators': [
-                    'coa statement', 'opord', 'frago', 'fragord', 'conop', 'sitrep', 'spot report',
-                    'evaluation', 'assessment', 'briefing', 'estimate', 'annex', 'appendix',
-                    'mission statement', 'execution section', 'scheme of maneuver',
-                    'concept of support', 'command and signal', 'coordinating instructions'
-                ],
-                'hybrid_keywords': [
-                    'write the', 'draft the', 'create a', 'build a', 'generate the',
-                    'list what', 'what goes in', 'what should be in', 'how do i',
-                    'what to put in', 'what belongs in', 'components of', 'elements of'
-                ],
-                'weight': 0.9
-            },
-            'clarification_needed': {
-                'ambiguous_indicators': [
-                    'help', 'assist', 'support', 'need', 'want', 'looking for',
-                    'guidance', 'advice', 'direction', 'suggestions'
-                ],
-                'vague_indicators': [
-                    'something', 'anything', 'stuff', 'things', 'this', 'that',
-                    'it', 'general', 'basic', 'simple'
-                ],
-                'weight': 0.3
-            }
-        }
+        return copy.deepcopy(INTENT_PATTERNS)
 
     def _initialize_strategy_matrix(self) -> Dict[str, Dict]:
         """Initialize enhanced strategy determination matrix for better hybrid detection."""
-        return {
-            'csv_only': {
-                'conditions': {
-                    'document_generation_high': lambda scores: scores.get('document_generation', 0) >= 0.7 and scores.get('information_retrieval', 0) < 0.3,
-                    'form_specific': lambda query: any(form in query.lower() for form in ['da638', 'da31', 'da4856', 'ncoer', 'oer']) and not any(word in query.lower() for word in ['what', 'how', 'explain', 'describe']),
-                    'template_only': lambda query: any(word in query.lower() for word in ['template', 'format only', 'structure only']) and not any(word in query.lower() for word in ['doctrine', 'definition', 'explain']),
-                    'formatting_focus': lambda query: any(word in query.lower() for word in ['format', 'structure', 'layout']) and not any(doc in query.lower() for doc in ['opord', 'coa', 'frago', 'annex'])
-                },
-                'confidence_boost': 0.1,
-                'prompt_strategy': 'template_focused'
-            },
-            'pdf_only': {
-                'conditions': {
-                    'information_retrieval_high': lambda scores: scores.get('information_retrieval', 0) >= 0.6 and scores.get('document_generation', 0) < 0.3,
-                    'knowledge_query': lambda query: any(term in query.lower() for term in ['what is', 'explain', 'describe', 'definition of', 'role of']) and not any(word in query.lower() for word in ['write', 'create', 'draft', 'format']),
-                    'doctrinal_only': lambda query: any(term in query.lower() for term in ['doctrine', 'regulation', 'manual', 'publication']) and not any(word in query.lower() for word in ['write', 'create', 'draft']),
-                    'pure_knowledge': lambda query: query.lower().startswith(('what is', 'explain', 'describe', 'define')) and not any(word in query.lower() for word in ['section', 'paragraph', 'write', 'create'])
-                },
-                'confidence_boost': 0.1,
-                'prompt_strategy': 'knowledge_focused'
-            },
-            'hybrid_approach': {
-                'conditions': {
-                    'hybrid_request_high': lambda scores: scores.get('hybrid_request', 0) >= 0.4,
-                    'balanced_generation_retrieval': lambda scores: (scores.get('document_generation', 0) >= 0.3 and scores.get('information_retrieval', 0) >= 0.3),
-                    'document_plus_knowledge': lambda query: any(doc in query.lower() for doc in ['opord', 'coa', 'frago', 'fragord', 'annex', 'sitrep']) and any(action in query.lower() for action in ['write', 'create', 'draft', 'build', 'generate']),
-                    'section_writing': lambda query: any(section in query.lower() for section in ['section', 'paragraph', 'part']) and any(action in query.lower() for action in ['write', 'create', 'draft', 'phrase']),
-                    'formatting_with_content': lambda query: any(fmt in query.lower() for fmt in ['phrase', 'format', 'structure', 'include', 'goes in']) and any(doc in query.lower() for doc in ['opord', 'coa', 'frago', 'annex', 'statement']),
-                    'what_should_include': lambda query: any(phrase in query.lower() for phrase in ['what should', 'what to include', 'what goes in', 'how do i', 'list what']),
-                    'write_with_doctrine': lambda query: any(action in query.lower() for action in ['write', 'draft', 'create', 'build']) and any(doc in query.lower() for doc in ['mission statement', 'execution', 'scheme of maneuver', 'concept of support', 'command and signal']),
-                    'military_document_creation': lambda query: len([term for term in ['opord', 'coa', 'frago', 'fragord', 'annex', 'sitrep', 'conop'] if term in query.lower()]) >= 1 and len([action for action in ['write', 'create', 'draft', 'build', 'generate', 'phrase', 'format'] if action in query.lower()]) >= 1
-                },
-                'confidence_boost': 0.4,
-                'prompt_strategy': 'hybrid_reasoning'
-            },
-            'clarification_required': {
-                'conditions': {
-                    'ambiguous_high': lambda scores: scores.get('clarification_needed', 0) >= 0.6,
-                    'insufficient_context': lambda scores: max(scores.values()) < 0.4 if scores else True,
-                    'conflicting_signals': lambda scores: len([s for s in scores.values() if s >= 0.4]) >= 3 if scores else False,
-                    'very_short_query': lambda query: len(query.split()) <= 3 and not any(doc in query.lower() for doc in ['opord', 'coa', 'frago'])
-                },
-                'confidence_boost': 0.0,
-                'prompt_strategy': 'clarification'
-            }
-        }
+        return copy.deepcopy(STRATEGY_RULES)
 
     def expand_military_terms(self, query: str) -> str:
         """Expand military terminology and acronyms for better understanding."""
-        expanded_query = query.lower()
-        
-        # Track expansions for logging
-        expansions_made = []
-        
-        for term, definition in self.military_terms.items():
-            # Create regex pattern for whole word matching
-            pattern = r'\b' + re.escape(term) + r'\b'
-            if re.search(pattern, expanded_query):
-                # Add definition context without replacing the original term
-                expansion = f"{term} ({definition})"
-                expanded_query = re.sub(pattern, expansion, expanded_query)
-                expansions_made.append(term)
-        
-        return expanded_query
+        return self.query_analyzer.expand_military_terms(query)
 
     def analyze_query_intent(self, query: str) -> Dict[str, any]:
         """Perform enhanced intent analysis with better hybrid detection."""
-        query_lower = query.lower()
-        expanded_query = self.expand_military_terms(query)
-        
-        intent_scores = {}
-        
-        # Calculate scores for each intent category
-        for intent_type, patterns in self.intent_patterns.items():
-            score = 0.0
-            indicators_found = []
-            
-            # Check primary indicators
-            if 'primary_indicators' in patterns:
-                primary_matches = sum(1 for indicator in patterns['primary_indicators'] 
-                                    if indicator in query_lower)
-                primary_score = min(primary_matches * 0.3, 1.0) * patterns['weight']
-                score += primary_score
-                
-                if primary_matches > 0:
-                    indicators_found.extend([ind for ind in patterns['primary_indicators'] if ind in query_lower])
-            
-            # Check secondary indicators
-            if 'secondary_indicators' in patterns:
-                secondary_matches = sum(1 for indicator in patterns['secondary_indicators'] 
-                                      if indicator in query_lower)
-                secondary_score = min(secondary_matches * 0.2, 0.6) * patterns['weight']
-                score += secondary_score
-                
-                if secondary_matches > 0:
-                    indicators_found.extend([ind for ind in patterns['secondary_indicators'] if ind in query_lower])
-            
-            # Check all other indicator types
-            for indicator_type in ['form_indicators', 'knowledge_indicators', 'context_indicators', 
-                                 'complexity_indicators', 'ambiguous_indicators', 'vague_indicators',
-                                 'formatting_indicators', 'format_knowledge_indicators', 
-                                 'document_type_indicators', 'hybrid_keywords']:
-                if indicator_type in patterns:
-                    matches = sum(1 for indicator in patterns[indicator_type] 
-                                if indicator in query_lower)
-                    if matches > 0:
-                        # Different weights for different indicator types
-                        if indicator_type in ['formatting_indicators', 'format_knowledge_indicators', 'hybrid_keywords']:
-                            indicator_score = min(matches * 0.25, 0.5) * patterns['weight']
-                        elif indicator_type in ['document_type_indicators']:
-                            indicator_score = min(matches * 0.3, 0.6) * patterns['weight']
-                        else:
-                            indicator_score = min(matches * 0.15, 0.4) * patterns['weight']
-                        
-                        score += indicator_score
-                        indicators_found.extend([ind for ind in patterns[indicator_type] if ind in query_lower])
-            
-            # Enhanced military terminology bonus
-            military_term_count = len([term for term in self.military_terms.keys() if term in query_lower])
-            military_bonus = min(military_term_count * 0.1, 0.3)
-            score += military_bonus
-            
-            # Special hybrid detection bonuses
-            if intent_type == 'hybrid_request':
-                # Bonus for document creation with specific military docs
-                doc_creation_bonus = 0
-                if any(action in query_lower for action in ['write', 'draft', 'create', 'build', 'generate']):
-                    if any(doc in query_lower for doc in ['opord', 'coa', 'frago', 'fragord', 'annex']):
-                        doc_creation_bonus = 0.3
-                
-                # Bonus for section/component questions
-                section_bonus = 0
-                if any(section in query_lower for section in ['section', 'paragraph', 'part', 'component']):
-                    if any(question in query_lower for question in ['what', 'how', 'include', 'goes in']):
-                        section_bonus = 0.2
-                
-                # Bonus for formatting + content questions
-                format_content_bonus = 0
-                if any(fmt in query_lower for fmt in ['phrase', 'format', 'structure']):
-                    if any(doc in query_lower for doc in ['statement', 'section', 'paragraph']):
-                        format_content_bonus = 0.25
-                
-                score += doc_creation_bonus + section_bonus + format_content_bonus
-            
-            # Normalize score
-            intent_scores[intent_type] = min(score, 1.0)
-        
-        # Determine primary intent
-        primary_intent = max(intent_scores.items(), key=lambda x: x[1])
-        
-        # Calculate confidence based on score separation
-        sorted_scores = sorted(intent_scores.values(), reverse=True)
-        if len(sorted_scores) > 1:
-            confidence = "high" if sorted_scores[0] - sorted_scores[1] >= 0.2 else "medium" if sorted_scores[0] >= 0.4 else "low"
-        else:
-            confidence = "high" if sorted_scores[0] >= 0.6 else "medium" if sorted_scores[0] >= 0.4 else "low"
-        
-        return {
-            'primary_intent': primary_intent[0],
-            'intent_scores': intent_scores,
-            'confidence': confidence,
-            'expanded_query': expanded_query,
-            'military_terms_found': [term for term in self.military_terms.keys() if term in query_lower]
-        }
+        intent_analysis = self.query_analyzer.analyze_intent(query)
+        intent_analysis['target_sections'] = self.query_analyzer.detect_sections(query)
+        return intent_analysis
 
     def determine_tool_strategy(self, query: str, intent_analysis: Dict) -> Dict[str, any]:
         """Determine enhanced tool usage strategy with better hybrid detection."""
-        
-        strategy_scores = {}
-        reasoning_steps = []
-        
-        # Evaluate each strategy against its conditions
-        for strategy_name, strategy_config in self.strategy_matrix.items():
-            score = 0.0
-            conditions_met = []
-            
-            if 'conditions' not in strategy_config:
-                continue
-                
-            for condition_name, condition_func in strategy_config['conditions'].items():
-                try:
-                    if condition_name.endswith('_high') or condition_name.endswith('_low'):
-                        # Score-based condition
-                        if condition_func(intent_analysis['intent_scores']):
-                            score += 0.25
-                            conditions_met.append(condition_name)
-                    else:
-                        # Query-based condition
-                        if condition_func(query):
-                            score += 0.25
-                            conditions_met.append(condition_name)
-                except Exception as e:
-                    # Handle any condition evaluation errors gracefully
-                    print(f"Error evaluating condition {condition_name}: {e}")
-            
-            # Apply confidence boost
-            if score > 0 and 'confidence_boost' in strategy_config:
-                score += strategy_config['confidence_boost']
-            
-            strategy_scores[strategy_name] = min(score, 1.0)
-            
-            if conditions_met:
-                reasoning_steps.append(f"{strategy_name}: {len(conditions_met)} conditions met - {', '.join(conditions_met)}")
-        
-        # Determine primary strategy
-        primary_strategy = max(strategy_scores.items(), key=lambda x: x[1])
-        
-        # Map strategy to tools
-        tool_mapping = {
-            'csv_only': {'primary': 'csv', 'secondary': None},
-            'pdf_only': {'primary': 'pdf', 'secondary': None},
-            'hybrid_approach': {'primary': 'csv', 'secondary': 'pdf'},
-            'clarification_required': {'primary': 'clarification', 'secondary': None}
-        }
-        
-        tools = tool_mapping[primary_strategy[0]]
-        
-        return {
-            'strategy': primary_strategy[0],
-            'strategy_confidence': primary_strategy[1],
-            'primary_tool': tools['primary'],
-            'secondary_tool': tools['secondary'],
-            'strategy_scores': strategy_scores,
-            'reasoning_steps': reasoning_steps,
-            'prompt_strategy': self.strategy_matrix[primary_strategy[0]]['prompt_strategy']
-        }
+        return self.query_analyzer.determine_strategy(query, intent_analysis)
 
-    def enhanced_csv_search(self, query: str, intent_analysis: Dict, max_results: int = 5) -> List[Dict]:
+    def enhanced_csv_search(self, query: str, intent_analysis: Dict, max_results: int = 5,
+                            state: Optional[RetrievalState] = None) -> List[Dict]:
         """Enhanced CSV search with intent-aware filtering and scoring."""
+        state = state or self.state
         
         # Extract key terms for better matching
         search_terms = []
@@ -466,7 +123,7 @@ class EnhancedRAGAgent:
         
         for term in search_terms:
             # Try exact search first
-            exact_results = self.csv_processor.search_exact(term)
+            exact_results = state.csv_processor.search_exact(term)
             for result in exact_results:
                 result['search_term'] = term
                 result['match_type'] = 'exact'
@@ -474,7 +131,7 @@ class EnhancedRAGAgent:
             all_results.extend(exact_results)
             
             # Try fuzzy search with lower threshold
-            fuzzy_results = self.csv_processor.search_fuzzy(term, threshold=0.3)
+            fuzzy_results = state.csv_processor.search_fuzzy(term, threshold=0.3)
             for result in fuzzy_results:
                 result['search_term'] = term
                 result['match_type'] = 'fuzzy'
@@ -496,37 +153,55 @@ class EnhancedRAGAgent:
         
         return unique_results[:max_results]
 
-    def enhanced_pdf_search(self, query: str, intent_analysis: Dict, max_results: int = 5) -> List[Dict]:
+    def enhanced_pdf_search(self, query: str, intent_analysis: Dict, max_results: int = 5,
+                            state: Optional[RetrievalState] = None,
+                            deadline: Optional[RequestDeadline] = None) -> List[Dict]:
         """Enhanced PDF search with expanded military terminology."""
+        state = state or self.state
+        deadline = deadline or RequestDeadline()
+        candidate_multiplier = settings.pdf_candidate_multiplier
+        if deadline.below(settings.degrade_reduce_results_below):
+            candidate_multiplier = 1
         
         # Use expanded query for better semantic matching
-        search_query = intent_analysis.get('expanded_query', query)
+        search_query = intent_analysis.get('expanded_query', query) if settings.pdf_use_expanded_query else query
         print(f"DEBUG: PDF search query: '{search_query}'")
         
-        # Debug ChromaDB collection
-        try:
-            collection = self.embedding_manager.get_collection("pdf_documents")
-            count = collection.count()
-            print(f"DEBUG: ChromaDB collection 'pdf_documents' has {count} documents")
-            
-        except Exception as e:
-            print(f"DEBUG: ChromaDB collection test failed: {e}")
+        print(f"DEBUG: Searching {len(state.pdf_shards)} PDF collection(s): {', '.join(state.pdf_shards)}")
         
         try:
-            results = self.embedding_manager.query_similar(
-                collection_name="pdf_documents",
+            section_filter = self.build_section_filter(intent_analysis, state)
+            results = state.embedding_manager.query_shards(
+                collection_names=state.pdf_shards,
                 query=search_query,
-                n_results=max_results * 2  # Get more results for filtering
+                n_results=max_results * candidate_multiplier,  # Get more results for filtering
+                where=section_filter,
+                deadline=deadline.remaining()
             )
-            print(f"DEBUG: Raw PDF results from ChromaDB: {len(results)}")
+            print(f"DEBUG: Raw PDF results from ChromaDB: {len(results)} (section filter: {section_filter})")
+            
+            if not results and deadline.below(settings.degrade_skip_requery_below):
+                # No budget left for the fallback searches below
+                deadline.degrade("skipped_pdf_requery")
+                return []
+            
+            if not results and section_filter:
+                # The targeted chapter had nothing relevant; search the whole manual
+                results = state.embedding_manager.query_shards(
+                    collection_names=state.pdf_shards,
+                    query=search_query,
+                    n_results=max_results * candidate_multiplier,
+                    deadline=deadline.remaining()
+                )
             
             if not results:
                 print("DEBUG: No results returned from ChromaDB")
                 # Try with original query
-                results = self.embedding_manager.query_similar(
-                    collection_name="pdf_documents",
+                results = state.embedding_manager.query_shards(
+                    collection_names=state.pdf_shards,
                     query=query,
-                    n_results=max_results * 2
+                    n_results=max_results * candidate_multiplier,
+                    deadline=deadline.remaining()
                 )
                 print(f"DEBUG: Original query '{query}' returned {len(results)} results")
                 
@@ -545,11 +220,11 @@ class EnhancedRAGAgent:
                 military_term_matches = [term for term in intent_analysis.get('military_terms_found', []) 
                                        if term in text_lower]
                 
-                if military_term_matches:
+                if military_term_matches and settings.pdf_keyword_boosts:
                     relevance_score += len(military_term_matches) * 0.1
                 
                 # Boost score based on intent alignment
-                if intent_analysis['primary_intent'] == 'information_retrieval':
+                if settings.pdf_keyword_boosts and intent_analysis['primary_intent'] == 'information_retrieval':
                     if any(word in text_lower for word in ['process', 'procedure', 'step', 'role', 'responsibility']):
                         relevance_score += 0.2
                 
@@ -558,56 +233,101 @@ class EnhancedRAGAgent:
                 scored_results.append(result)
                 print(f"DEBUG: Result {i} score: {relevance_score:.3f}, text preview: {result.get('text', '')[:100]}...")
             
-            # Sort by relevance and return top results
+            # Sort by relevance, then fold neighbouring chunks of the same page together
             scored_results.sort(key=lambda x: x.get('relevance_score', 0), reverse=True)
-            final_results = scored_results[:max_results]
+            top_results = self.expand_with_neighbors(scored_results[:max_results], settings.pdf_neighbor_expansion, state)
+            final_results = merge_adjacent_chunks(top_results)
             print(f"DEBUG: Returning {len(final_results)} final PDF results")
             return final_results
             
         except Exception as e:
+            if isinstance(e, DeadlineExceeded):
+                deadline.degrade("pdf_search_timed_out")
             print(f"DEBUG: Error in enhanced PDF search: {str(e)}")
             import traceback
             print(f"DEBUG: Full traceback: {traceback.format_exc()}")
             return []
 
+    def build_section_filter(self, intent_analysis: Dict,
+                             state: Optional[RetrievalState] = None) -> Optional[Dict]:
+        """Chroma `where` clause restricting search to chapters/sections the query targets."""
+        state = state or self.state
+        phrases = intent_analysis.get('target_sections', [])
+        if not phrases or not settings.section_filtering_enabled:
+            return None
+        
+        clauses = []
+        for field in ('chapter', 'section'):
+            titles = [title for title in state.section_titles.get(field, [])
+                      if any(phrase in title.lower().replace('-', ' ') for phrase in phrases)]
+            if titles:
+                clauses.append({field: {"$in": titles}})
+        
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+    def expand_with_neighbors(self, results: List[Dict], n: int,
+                              state: Optional[RetrievalState] = None) -> List[Dict]:
+        """Add the chunks within ±n of each hit using direct page-index lookups."""
+        state = state or self.state
+        if n <= 0 or not len(state.chunk_store):
+            return results
+        
+        seen = {r['id'] for r in results if r.get('id')}
+        expanded = list(results)
+        
+        for result in results:
+            hit_id = result.get('id')
+            if not hit_id:
+                continue
+            for neighbor in state.chunk_store.get_neighbors(hit_id, n):
+                if neighbor['id'] in seen:
+                    continue
+                seen.add(neighbor['id'])
+                expanded.append({
+                    "id": neighbor["id"],
+                    "text": neighbor["text"],
+                    "metadata": neighbor["metadata"],
+                    # Context for a hit ranks just below the hit itself
+                    "relevance_score": result.get('relevance_score', 0) * 0.9,
+                    "military_terms_matched": [],
+                    "expanded_from": hit_id
+                })
+        
+        return expanded
+
     def generate_enhanced_response(self, query: str, csv_results: List[Dict], pdf_results: List[Dict], 
-                                 intent_analysis: Dict, strategy: Dict) -> Dict:
+                                 intent_analysis: Dict, strategy: Dict,
+                                 deadline: Optional[RequestDeadline] = None,
+                                 answer_mode: Optional[str] = None) -> Dict:
         """Generate response using advanced prompt engineering strategies."""
+        deadline = deadline or RequestDeadline()
         
         # Handle clarification requests
         if strategy['primary_tool'] == 'clarification':
             return self._generate_clarification_request(query, intent_analysis)
         
-        # Build enhanced context
-        context_parts = []
-        
-        if csv_results:
-            context_parts.append("=== DOCUMENT TEMPLATES AND FORMATS ===")
-            for result in csv_results:
-                relevance_info = f" (Relevance: {result.get('relevance_score', 'N/A')}, Match: {result.get('match_type', 'N/A')})"
-                context_parts.append(
-                    f"Template: {result.get('template_name', 'Unknown')}\n"
-                    f"Field: {result.get('field_label', 'Unknown')}\n"
-                    f"Instructions: {result.get('instructions', 'No instructions')}{relevance_info}\n"
-                )
-        
-        if pdf_results:
-            context_parts.append("=== MILITARY KNOWLEDGE AND PROCEDURES ===")
-            for result in pdf_results:
-                metadata = result.get('metadata', {})
-                relevance_info = f" (Relevance: {result.get('relevance_score', 'N/A')})"
-                military_terms = result.get('military_terms_matched', [])
-                terms_info = f" [Military terms: {', '.join(military_terms)}]" if military_terms else ""
-                
-                context_parts.append(
-                    f"Source: {metadata.get('source', 'Unknown')} (Page {metadata.get('page', 'Unknown')})\n"
-                    f"Content: {result.get('text', '')}{relevance_info}{terms_info}\n"
-                )
-        
-        context = "\n".join(context_parts)
+        # Extractive answers need no LLM call: on request, or when the deadline can't afford one
+        if (answer_mode or settings.answer_mode) == 'extractive':
+            return self._generate_extractive_response(query, csv_results, pdf_results,
+                                                      intent_analysis, strategy, "requested")
+        if deadline.below(settings.degrade_extractive_below):
+            deadline.degrade("extractive_answer")
+            return self._generate_extractive_response(query, csv_results, pdf_results,
+                                                      intent_analysis, strategy, "deadline")
+        
+        # Pure template-format questions are answered from the instructions directly
+        model_tier = self.model_router.route(query, strategy, csv_results)
+        if model_tier == TEMPLATE_DIRECT:
+            return self._generate_template_answer(csv_results, intent_analysis, strategy)
+        
+        # Pack the highest-value sources into the strategy's token budget
+        prompt_strategy = strategy.get('prompt_strategy', 'knowledge_focused')
+        packed = self.context_packer.pack(csv_results, pdf_results, prompt_strategy)
+        context = packed["context"]
         
         # Select prompt strategy based on determined approach
-        prompt_strategy = strategy.get('prompt_strategy', 'knowledge_focused')
         system_prompt = self._get_system_prompt(prompt_strategy, intent_analysis, strategy)
         
         # Create user prompt with enhanced context
@@ -620,13 +340,31 @@ class EnhancedRAGAgent:
         ]
         
         try:
-            response = self.llm.invoke(messages)
+            llm = self.model_router.llm_for(model_tier)
+            invoke_args = {}
+            if deadline.below(settings.degrade_cap_answer_below):
+                # A shorter answer finishes sooner
+                invoke_args["max_tokens"] = min(settings.degraded_max_tokens,
+                                                llm.max_tokens or settings.degraded_max_tokens)
+                deadline.degrade("capped_answer_length")
+            response = self.model_router.caller_for(model_tier).call(
+                llm.invoke, messages, deadline=deadline.remaining(), **invoke_args
+            )
             return {
                 "answer": response.content,
                 "sources_used": {
-                    "csv_sources": len(csv_results),
-                    "pdf_sources": len(pdf_results)
+                    "csv_sources": len(packed["csv_results"]),
+                    "pdf_sources": len(packed["pdf_results"])
                 },
+                # What retrieval found vs what fit in the prompt
+                "context_packing": {
+                    "retrieved": {"csv_sources": len(csv_results), "pdf_sources": len(pdf_results)},
+                    "sources_dropped": packed["sources_dropped"],
+                    "context_tokens": packed["context_tokens"],
+                    "budget": packed["budget"]
+                },
+                "token_usage": {**self._token_usage(response, system_prompt, user_prompt, packed),
+                                "model": llm.model_name},
                 "tool_used": strategy['primary_tool'],
                 "confidence": strategy['strategy_confidence'],
                 "intent_analysis": intent_analysis,
@@ -635,10 +373,16 @@ class EnhancedRAGAgent:
                     "military_terms_expanded": len(intent_analysis.get('military_terms_found', [])),
                     "intent_confidence": intent_analysis['confidence'],
                     "strategy_reasoning": strategy['reasoning_steps'],
-                    "context_sources": len(csv_results) + len(pdf_results)
+                    "context_sources": len(packed["csv_results"]) + len(packed["pdf_results"]),
+                    "sources_dropped_by_budget": packed["sources_dropped"],
+                    "model_tier": model_tier
                 }
             }
         except Exception as e:
+            if settings.extractive_fallback and (csv_results or pdf_results):
+                # Don't waste the retrieval: answer from the retrieved passages instead
+                return self._generate_extractive_response(query, csv_results, pdf_results,
+                                                          intent_analysis, strategy, f"llm_unavailable: {str(e)}")
             return {
                 "answer": f"I apologize, but I encountered an error generating a response: {str(e)}",
                 "sources_used": {"csv_sources": 0, "pdf_sources": 0},
@@ -649,6 +393,76 @@ class EnhancedRAGAgent:
                 "reasoning_chain": {"error": str(e)}
             }
 
+    def _generate_extractive_response(self, query: str, csv_results: List[Dict], pdf_results: List[Dict],
+                                      intent_analysis: Dict, strategy: Dict, reason: str) -> Dict:
+        """Answer with the best-matching retrieved sentences and their page/template citations."""
+        extract = build_extractive_answer(
+            query, csv_results, pdf_results,
+            extra_terms=intent_analysis.get('military_terms_found', []),
+            max_chars=settings.extractive_max_chars
+        )
+        answer = extract["answer"]
+        if answer:
+            answer = "Most relevant passages from the source documents:\n\n" + answer
+        else:
+            answer = "I couldn't find passages in the manuals or templates that answer this question directly."
+        return {
+            "answer": answer,
+            "answer_mode": "extractive",
+            "sources_used": {"csv_sources": len(csv_results), "pdf_sources": len(pdf_results)},
+            "token_usage": {"prompt_tokens": 0, "completion_tokens": 0, "model": None},
+            "tool_used": strategy['primary_tool'],
+            "confidence": strategy['strategy_confidence'],
+            "intent_analysis": intent_analysis,
+            "strategy": strategy,
+            "reasoning_chain": {
+                "military_terms_expanded": len(intent_analysis.get('military_terms_found', [])),
+                "intent_confidence": intent_analysis['confidence'],
+                "strategy_reasoning": strategy['reasoning_steps'],
+                "context_sources": len(csv_results) + len(pdf_results),
+                "extractive_reason": reason,
+                "sentences_used": extract["sentences_used"],
+                "citations": extract["citations"]
+            }
+        }
+
+    def _generate_template_answer(self, csv_results: List[Dict], intent_analysis: Dict, strategy: Dict) -> Dict:
+        """Answer a template-format question with the matching fields' instructions, no LLM call."""
+        fields = csv_results[:settings.template_direct_max_fields]
+        sections = [
+            f"**{r.get('template_name', '')} - {r.get('field_label', '')}**\n{r.get('instructions', '')}"
+            for r in fields
+        ]
+        return {
+            "answer": "Here are the template instructions that match your question:\n\n" + "\n\n".join(sections),
+            "sources_used": {"csv_sources": len(fields), "pdf_sources": 0},
+            "token_usage": {"prompt_tokens": 0, "completion_tokens": 0, "model": None},
+            "tool_used": strategy['primary_tool'],
+            "confidence": strategy['strategy_confidence'],
+            "intent_analysis": intent_analysis,
+            "strategy": strategy,
+            "reasoning_chain": {
+                "military_terms_expanded": len(intent_analysis.get('military_terms_found', [])),
+                "intent_confidence": intent_analysis['confidence'],
+                "strategy_reasoning": strategy['reasoning_steps'],
+                "context_sources": len(fields),
+                "model_tier": TEMPLATE_DIRECT
+            }
+        }
+
+    def _token_usage(self, response, system_prompt: str, user_prompt: str, packed: Dict) -> Dict:
+        """Report prompt tokens, preferring the count returned by the API."""
+        usage = (getattr(response, 'response_metadata', None) or {}).get('token_usage', {})
+        prompt_tokens = usage.get('prompt_tokens')
+        if prompt_tokens is None:
+            prompt_tokens = count_tokens(system_prompt) + count_tokens(user_prompt)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": usage.get('completion_tokens'),
+            "context_tokens": packed["context_tokens"],
+            "context_budget": packed["budget"]
+        }
+
     def _get_system_prompt(self, strategy: str, intent_analysis: Dict, strategy_info: Dict) -> str:
         """Generate sophisticated system prompts based on strategy."""
         
@@ -854,25 +668,52 @@ Focus on being a helpful guide that leads users to more productive Army-focused
             }
         }
 
-    def process_query(self, query: str) -> Dict:
-        """Main enhanced query processing with advanced reasoning pipeline."""
-        
-        # Step 1: Advanced Intent Analysis
+    def analyze_query(self, query: str) -> Dict:
+        """Intent analysis and tool strategy for a query, computed once and passed along."""
         intent_analysis = self.analyze_query_intent(query)
-        
-        # Step 2: Sophisticated Strategy Determination
         strategy = self.determine_tool_strategy(query, intent_analysis)
+        return {"intent_analysis": intent_analysis, "strategy": strategy}
+
+    def coalescing_key(self, query: str, analysis: Optional[Dict] = None) -> Tuple[str, str]:
+        """Key identifying requests that would produce the same answer."""
+        analysis = analysis or self.analyze_query(query)
+        return normalize_query(query), analysis['strategy']['strategy']
+
+    def process_query(self, query: str, deadline: Optional[RequestDeadline] = None,
+                      answer_mode: Optional[str] = None, analysis: Optional[Dict] = None) -> Dict:
+        """Main enhanced query processing with advanced reasoning pipeline.
+
+        `analysis` is analyze_query()'s result when the caller already has it.
+        """
         
-        # Step 3: Enhanced Source Retrieval
+        # Pin the indexes for this query so a concurrent reload can't change them mid-way
+        state = self.state
+        deadline = deadline or RequestDeadline()
+        
+        # Steps 1-2: Intent Analysis and Strategy Determination
+        analysis = analysis or self.analyze_query(query)
+        intent_analysis = analysis['intent_analysis']
+        strategy = analysis['strategy']
+        
+        # Step 3: Enhanced Source Retrieval, trimmed when the request deadline is close
         csv_results = []
         pdf_results = []
-        
-        if strategy['primary_tool'] == 'csv' or strategy.get('secondary_tool') == 'csv':
-            csv_results = self.enhanced_csv_search(query, intent_analysis)
+        max_results = 5
+        if deadline.below(settings.degrade_reduce_results_below):
+            max_results = settings.degraded_max_results
+            deadline.degrade("reduced_results")
+        
+        tools = {strategy['primary_tool'], strategy.get('secondary_tool')}
+        if strategy.get('secondary_tool') and deadline.below(settings.degrade_skip_secondary_below):
+            tools.discard(strategy['secondary_tool'])
+            deadline.degrade(f"skipped_secondary_tool:{strategy['secondary_tool']}")
+        
+        if 'csv' in tools:
+            csv_results = self.enhanced_csv_search(query, intent_analysis, max_results, state=state)
             print(f"DEBUG: Found {len(csv_results)} CSV results")
         
-        if strategy['primary_tool'] == 'pdf' or strategy.get('secondary_tool') == 'pdf':
-            pdf_results = self.enhanced_pdf_search(query, intent_analysis)
+        if 'pdf' in tools:
+            pdf_results = self.enhanced_pdf_search(query, intent_analysis, max_results, state=state, deadline=deadline)
             print(f"DEBUG: Found {len(pdf_results)} PDF results")
             for i, result in enumerate(pdf_results[:2]):  # Show first 2 results
                 print(f"DEBUG: PDF result {i}: Page {result.get('metadata', {}).get('page')}, Text: {result.get('text', '')[:100]}...")
@@ -882,7 +723,7 @@ Focus on being a helpful guide that leads users to more productive Army-focused
         
         # Step 4: Advanced Response Generation
         response = self.generate_enhanced_response(
-            query, csv_results, pdf_results, intent_analysis, strategy
+            query, csv_results, pdf_results, intent_analysis, strategy, deadline, answer_mode
         )
         
         # Step 5: Add Enhanced Metadata
@@ -914,14 +755,13 @@ Focus on being a helpful guide that leads users to more productive Army-focused
                     for r in pdf_results
                 ]
             },
-            "sources_used": {
-                "csv_sources": len(csv_results),
-                "pdf_sources": len(pdf_results)
-            },
+            "degradations": list(deadline.degradations),
+            "deadline": deadline.summary(),
             "enhanced_metadata": {
                 "military_terms_expanded": len(intent_analysis.get('military_terms_found', [])),
                 "strategy_confidence": strategy['strategy_confidence'],
                 "total_sources": len(csv_results) + len(pdf_results),
+                "index_version": state.version,
                 "processing_pipeline": "enhanced_v3.0_hybrid_optimized"
             }
         })
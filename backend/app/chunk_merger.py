@@ -0,0 +1,103 @@
+from typing import List, Dict, Optional
+from config import settings
+
+# Shorter suffix/prefix matches are treated as coincidence, not splitter overlap
+MIN_OVERLAP_CHARS = 20
+
+def _overlap_length(left: str, right: str, max_overlap: int) -> int:
+    """Length of the longest suffix of `left` that is also a prefix of `right`."""
+    limit = min(len(left), len(right), max_overlap)
+    for k in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:k]):
+            return k
+    return 0
+
+def _merge_run(run: List[Dict], max_overlap: int) -> Dict:
+    """Collapse a run of consecutive chunks into a single result."""
+    if len(run) == 1:
+        return run[0]
+
+    merged_text = run[0].get('text', '')
+    for result in run[1:]:
+        text = result.get('text', '')
+        overlap = _overlap_length(merged_text, text, max_overlap)
+        merged_text += text[overlap:] if overlap else "\n" + text
+
+    metadata = dict(run[0].get('metadata', {}))
+    metadata['chunk_indices'] = [r['metadata']['chunk_index'] for r in run]
+    page_ends = [r['metadata'].get('page_end') for r in run if r['metadata'].get('page_end') is not None]
+    if page_ends:
+        metadata['page_end'] = max(page_ends)
+
+    # Scale the stored per-chunk counts by how much text survived de-duplication
+    token_counts = [r['metadata'].get('token_count') for r in run]
+    if all(count is not None for count in token_counts):
+        total_chars = sum(len(r.get('text', '')) for r in run) or 1
+        metadata['token_count'] = int(round(sum(token_counts) * len(merged_text) / total_chars))
+    else:
+        metadata.pop('token_count', None)
+
+    military_terms = []
+    for result in run:
+        for term in result.get('military_terms_matched', []):
+            if term not in military_terms:
+                military_terms.append(term)
+
+    return {
+        **run[0],
+        "text": merged_text,
+        "metadata": metadata,
+        "relevance_score": max(r.get('relevance_score') or 0 for r in run),
+        "military_terms_matched": military_terms,
+        "merged_chunks": len(run)
+    }
+
+def merge_adjacent_chunks(results: List[Dict], max_overlap: Optional[int] = None) -> List[Dict]:
+    """Merge PDF results that are consecutive chunks of the same (source, page).
+
+    Chunks numbered through the whole document (cross-page chunking) are
+    grouped by source alone, so a run can continue across a page break; the
+    merged result keeps the first page and the furthest page_end. Overlapping text produced by the splitter is emitted once. Results are
+    returned sorted by relevance; merged results keep the best score of their run.
+    """
+    if max_overlap is None:
+        max_overlap = settings.chunk_overlap
+        if settings.chunk_unit == "tokens":
+            # Overlap is configured in tokens; compare text with a generous chars-per-token bound
+            max_overlap *= 8
+
+    groups = {}
+    passthrough = []
+    for result in results:
+        metadata = result.get('metadata') or {}
+        if metadata.get('page') is None or metadata.get('chunk_index') is None:
+            passthrough.append(result)
+            continue
+        if metadata.get('chunk_index_scope') == 'document':
+            key = (metadata.get('source'), None)
+        else:
+            key = (metadata.get('source'), metadata['page'])
+        groups.setdefault(key, []).append(result)
+
+    merged = []
+    for group in groups.values():
+        group.sort(key=lambda r: r['metadata']['chunk_index'])
+        run = [group[0]]
+        for result in group[1:]:
+            previous_index = run[-1]['metadata']['chunk_index']
+            current_index = result['metadata']['chunk_index']
+            if current_index == previous_index:
+                # Duplicate hit for the same chunk; keep the better-scored copy
+                if (result.get('relevance_score') or 0) > (run[-1].get('relevance_score') or 0):
+                    run[-1] = result
+                continue
+            if current_index == previous_index + 1:
+                run.append(result)
+            else:
+                merged.append(_merge_run(run, max_overlap))
+                run = [result]
+        merged.append(_merge_run(run, max_overlap))
+
+    merged.extend(passthrough)
+    merged.sort(key=lambda r: r.get('relevance_score') or 0, reverse=True)
+    return merged
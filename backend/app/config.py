@@ -1,16 +1,146 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Optional, Dict
 import os
 
 class Settings(BaseSettings):
     openai_api_key: str
     chunk_size: int = 1000
     chunk_overlap: int = 200
+    # Unit for chunk_size/chunk_overlap: "chars" or "tokens" (embedding tokenizer)
+    chunk_unit: str = "chars"
+    # Let chunks run across page breaks (metadata keeps the start page and page_end)
+    chunk_across_pages: bool = True
     chroma_persist_directory: str = "./chroma_db"
+    # "persistent" opens chroma_persist_directory in-process; "http" uses a shared
+    # Chroma server (chroma run --path ./chroma_db --port 8001)
+    chroma_mode: str = "persistent"
+    chroma_host: str = "localhost"
+    chroma_port: int = 8001
+    chroma_ssl: bool = False
+    chroma_http_pool_size: int = 16
+    chroma_http_retries: int = 3
     pdf_path: str = "./data/ARN42404-FM_5-0-000-WEB-1.pdf"
     csv_path: str = "./data/template_fields.csv"
+    # Prebuilt CSV index written by initialize_data.py; rebuilt when the CSV hash changes
+    csv_snapshot_path: str = "./data/template_fields.snapshot.pkl"
+    chunk_store_path: str = "./chroma_db/chunk_store.json"
+    # Embedding model for chunks and queries; recorded in the shard registry and snapshots
+    embedding_model: str = "text-embedding-ada-002"
+    # Optional reduction of chunk and query embeddings: "none", "truncate" (leading dims) or "pca" (fitted at ingest)
+    embedding_reduction: str = "none"
+    embedding_dimensions: int = 256
+    # Where fitted projections are saved; collections record which file they used
+    embedding_projection_dir: str = "./chroma_db/projections"
+    # Extracted page text keyed by PDF digest, so re-chunking skips PDF parsing ("" disables)
+    page_text_cache_dir: str = "./data/page_cache"
+    # Multi-document corpus: ingest every PDF in this directory instead of pdf_path
+    pdf_directory: str = ""
+    shard_by: str = "document"  # "document" or "family" (fm, adp, ar, ...)
+    shard_registry_path: str = "./chroma_db/shards.json"
+    ingest_workers: int = 4
+    # Background ingest jobs (POST /api/ingest): fewer, lower-priority workers so
+    # queries keep their CPU, and seconds to keep the old collections after the swap
+    ingest_job_workers: int = 2
+    ingest_embed_batch_size: int = 256
+    ingest_retire_grace_seconds: float = 30.0
+    # Shared job state, so every worker can report or cancel a job; old collections
+    # are kept if some worker hasn't loaded the new index within the timeout
+    ingest_job_dir: str = "./chroma_db/ingest_jobs"
+    ingest_retire_timeout_seconds: float = 300.0
+    query_fanout_workers: int = 8
+    # Vector index (applied when collections are created at ingest)
+    chroma_distance_metric: str = "l2"  # "l2", "cosine" or "ip"
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 100
+    hnsw_ef_search: int = 10
+    # PDF search fetches max_results * this many candidates before re-scoring
+    pdf_candidate_multiplier: int = 2
+    # Retrieval variants compared by evaluate_retrieval.py
+    pdf_use_expanded_query: bool = True
+    pdf_keyword_boosts: bool = True
+    # Chunks fetched either side of each PDF hit via the page index (0 disables)
+    pdf_neighbor_expansion: int = 0
+    # Restrict PDF search to outline chapters/sections the query targets
+    section_filtering_enabled: bool = True
+    # Max context tokens packed into the prompt, keyed by prompt_strategy
+    context_token_budgets: Dict[str, int] = {
+        "template_focused": 1200,
+        "knowledge_focused": 2500,
+        "hybrid_reasoning": 3500,
+        "clarification": 0
+    }
+    default_context_token_budget: int = 2500
+    # Share one in-flight computation between concurrent identical queries
+    query_coalescing_enabled: bool = True
+    # Bounded LRU size for memoized intent/strategy analysis
+    query_analysis_cache_size: int = 1024
+    # Admission control for /api/query: concurrent queries, waiting queries beyond
+    # that, per-session cap (queued + running) and max seconds spent queued
+    max_concurrent_queries: int = 8
+    query_queue_depth: int = 32
+    per_session_concurrency: int = 2
+    query_queue_timeout: float = 30.0
+    # Upstream (OpenAI) calls: deadline in seconds, and hedge with one duplicate
+    # request once a call runs past this percentile of recent latency (0 disables)
+    llm_deadline: float = 30.0
+    llm_hedge_percentile: float = 95
+    embedding_deadline: float = 5.0
+    embedding_hedge_percentile: float = 90
+    upstream_max_workers: int = 32
+    # Generation model tiers (timeout in seconds) and the tier each strategy or
+    # prompt_strategy is routed to; strategy names take precedence
+    model_tiers: Dict[str, Dict] = {
+        "fast": {"model": "gpt-3.5-turbo", "max_tokens": 400, "timeout": 10},
+        "standard": {"model": "gpt-3.5-turbo", "max_tokens": 800, "timeout": 20},
+        "complex": {"model": "gpt-3.5-turbo", "max_tokens": 1500, "timeout": 30}
+    }
+    model_routes: Dict[str, str] = {
+        "csv_only": "fast",
+        "template_focused": "fast",
+        "pdf_only": "standard",
+        "knowledge_focused": "standard",
+        "hybrid_approach": "complex",
+        "hybrid_reasoning": "complex"
+    }
+    default_model_tier: str = "standard"
+    # Answer pure template-format questions from the CSV instructions, no LLM call
+    template_direct_answers: bool = True
+    template_direct_max_fields: int = 3
+    # Request deadline (ms) applied when the client sends none; 0 = no deadline
+    default_request_deadline_ms: int = 0
+    # Remaining request budget (seconds) below which each stage degrades
+    degrade_reduce_results_below: float = 8.0
+    degrade_skip_secondary_below: float = 6.0
+    degrade_cap_answer_below: float = 5.0
+    degrade_skip_requery_below: float = 4.0
+    degraded_max_results: int = 3
+    degraded_max_tokens: int = 250
+    # "generative" (LLM) or "extractive" (ranked retrieved sentences, no LLM call);
+    # extractive is also the fallback when the LLM fails or the deadline is nearly spent
+    answer_mode: str = "generative"
+    extractive_fallback: bool = True
+    extractive_max_chars: int = 900
+    degrade_extractive_below: float = 1.5
+    # Fail fast while this share of recent upstream calls is failing
+    circuit_breaker_error_rate: float = 0.5
+    circuit_breaker_min_calls: int = 10
+    circuit_breaker_cooldown: float = 30.0
+    # Seconds between checks of the CSV/chunk store/shard registry for changes (0 disables)
+    index_reload_interval: float = 0
+    # Required as X-Admin-Token on admin endpoints; they refuse every request while unset
+    admin_token: str = ""
+    # Per-request profiling: this share of queries, plus any sent with X-Profile: 1 and the admin token
+    profile_sample_rate: float = 0.0
+    profile_interval_ms: float = 10
+    # Caps on profiler cost: concurrent profiled requests and sampling time per request
+    profile_max_concurrent: int = 2
+    profile_max_seconds: float = 60
+    profile_dir: str = "./data/profiles"
+    profile_retain: int = 200
     
     class Config:
         env_file = ".env"
+        # model_tiers/model_routes would otherwise warn about pydantic's "model_" namespace
+        protected_namespaces = ('settings_',)
 
 settings = Settings() 
\ No newline at end of file
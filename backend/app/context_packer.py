@@ -0,0 +1,103 @@
+from typing import List, Dict, Optional
+from data_processing.tokenizer import count_tokens
+from config import settings
+
+CSV_SECTION_HEADER = "=== DOCUMENT TEMPLATES AND FORMATS ==="
+PDF_SECTION_HEADER = "=== MILITARY KNOWLEDGE AND PROCEDURES ==="
+
+def _estimate_tokens(text: str) -> int:
+    """Cheap estimate for short labels/headers that are built at query time."""
+    return len(text) // 4 + 1
+
+def page_label(metadata: Dict) -> str:
+    """"Page 12", or "Pages 12-13" for a chunk that runs across a page break."""
+    page, page_end = metadata.get('page', 'Unknown'), metadata.get('page_end')
+    if page_end is not None and page_end != page:
+        return f"Pages {page}-{page_end}"
+    return f"Page {page}"
+
+class ContextPacker:
+    """Greedy, token-budgeted selection of retrieved sources for the prompt."""
+
+    def __init__(self, budgets: Optional[Dict[str, int]] = None, default_budget: Optional[int] = None):
+        self.budgets = budgets if budgets is not None else settings.context_token_budgets
+        self.default_budget = default_budget if default_budget is not None else settings.default_context_token_budget
+
+    def budget_for(self, prompt_strategy: str) -> int:
+        """Token budget configured for a prompt strategy."""
+        return self.budgets.get(prompt_strategy, self.default_budget)
+
+    def format_csv_result(self, result: Dict) -> str:
+        return (
+            f"Template: {result.get('template_name', 'Unknown')}\n"
+            f"Field: {result.get('field_label', 'Unknown')}\n"
+            f"Instructions: {result.get('instructions', 'No instructions')}\n"
+        )
+
+    def format_pdf_result(self, result: Dict) -> str:
+        metadata = result.get('metadata', {})
+        military_terms = result.get('military_terms_matched', [])
+        terms_info = f" [Military terms: {', '.join(military_terms)}]" if military_terms else ""
+        return (
+            f"Source: {metadata.get('source', 'Unknown')} ({page_label(metadata)})\n"
+            f"Content: {result.get('text', '')}{terms_info}\n"
+        )
+
+    def csv_result_tokens(self, result: Dict) -> int:
+        """Tokens for a CSV block, using the count stored in the search index."""
+        if result.get('token_count') is not None:
+            return int(result['token_count'])
+        return count_tokens(self.format_csv_result(result))
+
+    def pdf_result_tokens(self, result: Dict) -> int:
+        """Tokens for a PDF block, using the chunk's ingest-time count plus header estimate."""
+        metadata = result.get('metadata', {})
+        text_tokens = metadata.get('token_count')
+        if text_tokens is None:
+            # Collections ingested before token counts were stored
+            text_tokens = count_tokens(result.get('text', ''))
+        military_terms = result.get('military_terms_matched', [])
+        header = f"Source: {metadata.get('source', 'Unknown')} ({page_label(metadata)})\nContent: "
+        return int(text_tokens) + _estimate_tokens(header) + _estimate_tokens(', '.join(military_terms))
+
+    def pack(self, csv_results: List[Dict], pdf_results: List[Dict], prompt_strategy: str) -> Dict:
+        """Keep the highest-relevance sources that fit in the strategy's token budget."""
+        budget = self.budget_for(prompt_strategy)
+
+        candidates = [('csv', r, self.csv_result_tokens(r)) for r in csv_results]
+        candidates += [('pdf', r, self.pdf_result_tokens(r)) for r in pdf_results]
+        candidates.sort(key=lambda c: c[1].get('relevance_score') or 0, reverse=True)
+
+        used_tokens = 0
+        kept_ids = set()
+        section_cost = {'csv': _estimate_tokens(CSV_SECTION_HEADER), 'pdf': _estimate_tokens(PDF_SECTION_HEADER)}
+        sections_opened = set()
+
+        for kind, result, tokens in candidates:
+            cost = tokens if kind in sections_opened else tokens + section_cost[kind]
+            if used_tokens + cost > budget:
+                continue
+            used_tokens += cost
+            sections_opened.add(kind)
+            kept_ids.add(id(result))
+
+        # Preserve retrieval order within each section
+        kept_csv = [r for r in csv_results if id(r) in kept_ids]
+        kept_pdf = [r for r in pdf_results if id(r) in kept_ids]
+
+        context_parts = []
+        if kept_csv:
+            context_parts.append(CSV_SECTION_HEADER)
+            context_parts.extend(self.format_csv_result(r) for r in kept_csv)
+        if kept_pdf:
+            context_parts.append(PDF_SECTION_HEADER)
+            context_parts.extend(self.format_pdf_result(r) for r in kept_pdf)
+
+        return {
+            "context": "\n".join(context_parts),
+            "csv_results": kept_csv,
+            "pdf_results": kept_pdf,
+            "context_tokens": used_tokens,
+            "budget": budget,
+            "sources_dropped": len(candidates) - len(kept_ids)
+        }
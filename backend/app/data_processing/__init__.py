@@ -1,5 +1,6 @@
 from .pdf_processor import PDFProcessor
 from .csv_processor import CSVProcessor
 from .embeddings import EmbeddingManager
+from .chunk_store import ChunkStore
 
-__all__ = ['PDFProcessor', 'CSVProcessor', 'EmbeddingManager'] 
\ No newline at end of file
+__all__ = ['PDFProcessor', 'CSVProcessor', 'EmbeddingManager', 'ChunkStore'] 
\ No newline at end of file
@@ -0,0 +1,135 @@
+from typing import List, Dict, Optional
+import json
+import os
+
+def make_chunk_id(page_num: int, chunk_index: int, prefix: str = "") -> str:
+    """Chunk ID used in the vector store and the page index.
+
+    Multi-document corpora pass a per-document prefix so IDs stay unique.
+    """
+    return f"{prefix}page_{page_num}_chunk_{chunk_index}"
+
+class ChunkStore:
+    """Ingest-time page index with direct chunk lookup by ID.
+
+    Holds every chunk's text and metadata keyed by chunk ID, and for each
+    (source, page) the ordered chunk IDs with their character offsets in the
+    page text, so neighbours of a search hit can be fetched without another
+    similarity query.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.chunks: Dict[str, Dict] = {}
+        self.pages: Dict[str, Dict[int, List[Dict]]] = {}
+        # source -> every entry of the document in reading order, built on first use
+        self._documents: Dict[str, List[Dict]] = {}
+
+    def add_page(self, page_num: int, page_text: str, chunks: List[Dict], id_prefix: str = "") -> List[str]:
+        """Index a page's chunks (in order) and return their IDs."""
+        if not chunks:
+            return []
+        source = chunks[0]["metadata"].get("source", "")
+        entries = []
+        search_from = 0
+        for chunk in chunks:
+            chunk_id = make_chunk_id(page_num, chunk["metadata"]["chunk_index"], id_prefix)
+            offset = page_text.find(chunk["text"], search_from)
+            if offset >= 0:
+                search_from = offset + 1
+            self.chunks[chunk_id] = {"text": chunk["text"], "metadata": chunk["metadata"]}
+            entries.append({"id": chunk_id, "offset": offset if offset >= 0 else None})
+        self.pages.setdefault(source, {})[page_num] = entries
+        self._documents.pop(source, None)
+        return [entry["id"] for entry in entries]
+
+    def _page_entries(self, page_num: int, source: Optional[str]) -> List[Dict]:
+        if source is None:
+            if len(self.pages) != 1:
+                return []
+            source = next(iter(self.pages))
+        return self.pages.get(source, {}).get(page_num, [])
+
+    def _document_entries(self, source: str) -> List[Dict]:
+        if source not in self._documents:
+            pages = self.pages.get(source, {})
+            self._documents[source] = [entry for page_num in sorted(pages) for entry in pages[page_num]]
+        return self._documents[source]
+
+    def get(self, chunk_id: str) -> Optional[Dict]:
+        """Fetch one chunk by ID."""
+        chunk = self.chunks.get(chunk_id)
+        if chunk is None:
+            return None
+        return {"id": chunk_id, "text": chunk["text"], "metadata": dict(chunk["metadata"])}
+
+    def get_page(self, page_num: int, source: Optional[str] = None) -> List[Dict]:
+        """All chunks of a page, in reading order. `source` may be omitted for single-document stores."""
+        return [self.get(entry["id"]) for entry in self._page_entries(page_num, source)]
+
+    def get_page_entries(self, page_num: int, source: Optional[str] = None) -> List[Dict]:
+        """Ordered chunk IDs and character offsets for a page."""
+        return list(self._page_entries(page_num, source))
+
+    def get_neighbors(self, chunk_id: str, n: int = 1) -> List[Dict]:
+        """Up to n chunks either side of chunk_id, excluding itself.
+
+        Chunks numbered per page stay on their page; chunks numbered through
+        the document (cross-page chunking) reach across page breaks.
+        """
+        chunk = self.chunks.get(chunk_id)
+        if chunk is None or n <= 0:
+            return []
+        metadata = chunk["metadata"]
+        if metadata.get("chunk_index_scope") == "document":
+            entries = self._document_entries(metadata.get("source", ""))
+        else:
+            entries = self._page_entries(metadata["page"], metadata.get("source", ""))
+        # Entries are stored in chunk_index order, so the index is the position
+        chunk_index = metadata["chunk_index"]
+        window = entries[max(0, chunk_index - n):chunk_index + n + 1]
+        return [self.get(entry["id"]) for entry in window if entry["id"] != chunk_id]
+
+    def section_titles(self) -> Dict[str, List[str]]:
+        """Distinct chapter and section titles present in the index."""
+        chapters, sections = set(), set()
+        for chunk in self.chunks.values():
+            metadata = chunk["metadata"]
+            if metadata.get("chapter"):
+                chapters.add(metadata["chapter"])
+            if metadata.get("section"):
+                sections.add(metadata["section"])
+        return {"chapter": sorted(chapters), "section": sorted(sections)}
+
+    def clear(self) -> None:
+        self.chunks = {}
+        self.pages = {}
+        self._documents = {}
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"chunks": self.chunks, "pages": self.pages}, f)
+        os.replace(tmp_path, self.path)
+
+    @classmethod
+    def load(cls, path: str) -> "ChunkStore":
+        """Load a saved store; a missing file yields an empty store."""
+        store = cls(path)
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            store.chunks = data.get("chunks", {})
+            # JSON object keys are strings; pages are keyed by int
+            store.pages = {
+                source: {int(page): entries for page, entries in pages.items()}
+                for source, pages in data.get("pages", {}).items()
+            }
+        return store
+
+    def page_count(self) -> int:
+        return sum(len(pages) for pages in self.pages.values())
+
+    def __len__(self) -> int:
+        return len(self.chunks)
@@ -0,0 +1,107 @@
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from data_processing.tokenizer import count_tokens
+
+CHUNK_UNITS = ("chars", "tokens")
+
+# Joins pages in cross-page mode; a line break, so the splitter may still cut there
+PAGE_JOINER = "\n"
+
+class Chunker:
+    """Splits a document's pages into overlapping chunks with page metadata.
+
+    One splitter is built up front and reused for every page and document.
+    `unit` sizes chunks in characters or in tokens (same tokenizer as the
+    embedding model). With `across_pages` a document's pages are split as one
+    text, so a paragraph running over a page break stays in one chunk; each
+    chunk is filed under the page it starts on and records the last page it
+    reaches in `page_end`. Its `chunk_index` then counts through the whole
+    document (`chunk_index_scope` "document") rather than restarting on each
+    page, so chunks either side of a page break are still consecutive.
+    """
+
+    def __init__(self, chunk_size: int, overlap: int, unit: str = "chars", across_pages: bool = False):
+        if unit not in CHUNK_UNITS:
+            raise ValueError(f"chunk unit must be one of {CHUNK_UNITS}, got {unit!r}")
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.unit = unit
+        self.across_pages = across_pages
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=overlap,
+            length_function=count_tokens if unit == "tokens" else len,
+        )
+
+    @staticmethod
+    def _metadata(text: str, source: str, page_num: int, page_end: int, chunk_index: int,
+                  section_info: Optional[Dict[str, str]], scope: str = "page") -> Dict:
+        return {
+            "source": source,
+            "page": page_num,
+            "page_end": page_end,
+            "chunk_index": chunk_index,
+            "chunk_index_scope": scope,
+            "token_count": count_tokens(text),
+            # Chroma metadata can't hold None, so unknown sections are ""
+            "chapter": (section_info or {}).get("chapter", ""),
+            "section": (section_info or {}).get("section", "")
+        }
+
+    def chunk_page(self, page_text: str, page_num: int, source: str,
+                   section_info: Optional[Dict[str, str]] = None) -> List[Dict]:
+        """Chunks of a single page."""
+        return [
+            {"text": chunk, "metadata": self._metadata(chunk, source, page_num, page_num, i, section_info)}
+            for i, chunk in enumerate(self.splitter.split_text(page_text))
+        ]
+
+    def chunk_document(self, pages: List[str], source: str,
+                       page_sections: Optional[Dict[int, Dict[str, str]]] = None) -> List[Tuple[int, str, List[Dict]]]:
+        """(page_num, page_text, chunks) for each page that chunks start on, in page order."""
+        page_sections = page_sections or {}
+        if not self.across_pages:
+            return [
+                (page_num, page_text, self.chunk_page(page_text, page_num, source, page_sections.get(page_num)))
+                for page_num, page_text in enumerate(pages, 1)
+                if page_text and page_text.strip()  # Skip empty pages
+            ]
+
+        page_nums, starts, parts, position = [], [], [], 0
+        for page_num, page_text in enumerate(pages, 1):
+            if not page_text or not page_text.strip():
+                continue
+            page_nums.append(page_num)
+            starts.append(position)
+            parts.append(page_text)
+            position += len(page_text) + len(PAGE_JOINER)
+        text = PAGE_JOINER.join(parts)
+
+        def page_at(offset: int) -> int:
+            return page_nums[max(0, bisect_right(starts, offset) - 1)]
+
+        by_page: Dict[int, List[Dict]] = {}
+        search_from, previous_start = 0, 0
+        for chunk_index, chunk in enumerate(self.splitter.split_text(text)):
+            offset = text.find(chunk, search_from)
+            if offset < 0:
+                # The splitter only trims whitespace, so this shouldn't happen; stay on the last page
+                offset = previous_start
+            else:
+                search_from = offset + 1
+            previous_start = offset
+            page_num = page_at(offset)
+            page_end = page_at(offset + max(0, len(chunk) - 1))
+            by_page.setdefault(page_num, []).append({
+                "text": chunk,
+                "metadata": self._metadata(chunk, source, page_num, page_end, chunk_index,
+                                           page_sections.get(page_num), "document")
+            })
+        return [(page_num, pages[page_num - 1], by_page[page_num]) for page_num in page_nums if page_num in by_page]
+
+@lru_cache(maxsize=8)
+def get_chunker(chunk_size: int, overlap: int, unit: str = "chars", across_pages: bool = False) -> Chunker:
+    """Shared Chunker per configuration, built once per process."""
+    return Chunker(chunk_size, overlap, unit, across_pages)
@@ -1,6 +1,7 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 import pandas as pd
 from difflib import SequenceMatcher
+import pickle
 import sys
 import os
 
@@ -8,11 +9,18 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config import settings
+from data_processing.tokenizer import count_tokens
+from data_processing.hashing import file_digest
+
+# Bump when the snapshot layout or anything derived into it changes
+SNAPSHOT_VERSION = 1
 
 class CSVProcessor:
     def __init__(self):
         self.df = None
         self.search_index = {}
+        # (lowercased key, entry) pairs so searches don't lowercase every key per query
+        self.lower_keys = []
 
     def load_csv(self, file_path: str) -> pd.DataFrame:
         """Load CSV file into pandas DataFrame."""
@@ -22,28 +30,41 @@ class CSVProcessor:
     def create_search_index(self, df: pd.DataFrame) -> Dict:
         """Create searchable index from DataFrame."""
         self.search_index = {}
-        for _, row in df.iterrows():
-            key = f"{row['template_name']}|{row['field_label']}"
+        columns = df[["template_name", "field_label", "instructions"]]
+        for template_name, field_label, instructions in columns.itertuples(index=False, name=None):
+            key = f"{template_name}|{field_label}"
             self.search_index[key] = {
-                "template_name": row["template_name"],
-                "field_label": row["field_label"],
-                "instructions": row["instructions"]
+                "template_name": template_name,
+                "field_label": field_label,
+                "instructions": instructions,
+                # Pre-counted so context packing never tokenizes at query time
+                "token_count": count_tokens(
+                    f"Template: {template_name}\n"
+                    f"Field: {field_label}\n"
+                    f"Instructions: {instructions}\n"
+                )
             }
+        self._build_lexical_index()
         return self.search_index
 
+    def _build_lexical_index(self) -> None:
+        self.lower_keys = [(key.lower(), value) for key, value in self.search_index.items()]
+
     def search_exact(self, query: str) -> List[Dict]:
         """Perform exact match search."""
+        query_lower = query.lower()
         results = []
-        for key, value in self.search_index.items():
-            if query.lower() in key.lower():
+        for key_lower, value in self.lower_keys:
+            if query_lower in key_lower:
                 results.append(value)
         return results
 
     def search_fuzzy(self, query: str, threshold: float = 0.6) -> List[Dict]:
         """Perform fuzzy search using difflib."""
+        query_lower = query.lower()
         results = []
-        for key, value in self.search_index.items():
-            similarity = SequenceMatcher(None, query.lower(), key.lower()).ratio()
+        for key_lower, value in self.lower_keys:
+            similarity = SequenceMatcher(None, query_lower, key_lower).ratio()
             if similarity >= threshold:
                 results.append({
                     **value,
@@ -51,7 +72,47 @@ class CSVProcessor:
                 })
         return sorted(results, key=lambda x: x["similarity_score"], reverse=True)
 
-    def process_csv(self) -> Dict:
-        """Load and process CSV file."""
+    def write_snapshot(self, snapshot_path: str, source_hash: str) -> None:
+        """Persist the built index so later starts skip pandas entirely."""
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "source_hash": source_hash,
+            "search_index": self.search_index,
+            "lower_keys": [key_lower for key_lower, _ in self.lower_keys]
+        }
+        tmp_path = snapshot_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot_path)
+
+    def load_snapshot(self, snapshot_path: str, source_hash: str) -> bool:
+        """Load a snapshot if it matches this version and CSV digest."""
+        if not os.path.exists(snapshot_path):
+            return False
+        try:
+            with open(snapshot_path, 'rb') as f:
+                snapshot = pickle.load(f)
+        except Exception as e:
+            print(f"Ignoring unreadable CSV snapshot {snapshot_path}: {e}")
+            return False
+        if snapshot.get("version") != SNAPSHOT_VERSION or snapshot.get("source_hash") != source_hash:
+            return False
+        self.search_index = snapshot["search_index"]
+        self.lower_keys = list(zip(snapshot["lower_keys"], self.search_index.values()))
+        return True
+
+    def process_csv(self, snapshot_path: Optional[str] = None, force_rebuild: bool = False) -> Dict:
+        """Load the CSV index, from the snapshot when it is current."""
+        snapshot_path = snapshot_path or settings.csv_snapshot_path
+        source_hash = file_digest(settings.csv_path)
+        if not force_rebuild and self.load_snapshot(snapshot_path, source_hash):
+            return self.search_index
+
+        # Snapshot missing or stale: rebuild from the CSV and refresh it
         self.df = self.load_csv(settings.csv_path)
-        return self.create_search_index(self.df)
\ No newline at end of file
+        self.create_search_index(self.df)
+        try:
+            self.write_snapshot(snapshot_path, source_hash)
+        except OSError as e:
+            print(f"Could not write CSV snapshot {snapshot_path}: {e}")
+        return self.search_index
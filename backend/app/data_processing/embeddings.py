@@ -1,4 +1,6 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import chromadb
 from chromadb.config import Settings as ChromaSettings
 from langchain_openai import OpenAIEmbeddings
@@ -9,43 +11,216 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config import settings
+from upstream import upstream_caller
+from data_processing.projection import EmbeddingProjection, PROJECTION_KEY
+
+# One HTTP client (and connection pool) per Chroma server per process
+_http_clients = {}
+_http_clients_lock = threading.Lock()
+
+def _reset_http_clients_after_fork():
+    # Pooled sockets opened before a fork would be shared with the parent
+    for client in _http_clients.values():
+        session = _http_session(client)
+        if session is not None:
+            session.close()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_http_clients_after_fork)
+
+# Persistent clients a forked worker replaced; kept referenced so the child
+# never finalizes (and closes) the parent's SQLite connection
+_parent_clients = []
+
+def _http_session(client):
+    # chromadb's HTTP API keeps its requests.Session on the server proxy object
+    return getattr(getattr(client, "_server", None), "_session", None)
+
+def _configure_http_pool(client) -> None:
+    """Size the connection pool and retry connection errors and 502/503/504."""
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = _http_session(client)
+    if session is None:
+        print("Chroma HTTP client has no session to configure; using its defaults")
+        return
+    retry = Retry(
+        total=settings.chroma_http_retries,
+        backoff_factor=0.2,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=None  # queries and adds are POSTs
+    )
+    adapter = HTTPAdapter(pool_maxsize=settings.chroma_http_pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+def create_chroma_client():
+    """Chroma client for settings.chroma_mode.
+
+    "persistent" opens chroma_persist_directory in this process. "http" shares
+    one pooled client to a standalone Chroma server, so several workers and a
+    concurrent ingest don't all contend on the same SQLite file.
+    """
+    if settings.chroma_mode == "http":
+        key = (settings.chroma_host, settings.chroma_port, settings.chroma_ssl)
+        with _http_clients_lock:
+            if key not in _http_clients:
+                client = chromadb.HttpClient(
+                    host=settings.chroma_host,
+                    port=settings.chroma_port,
+                    ssl=settings.chroma_ssl
+                )
+                _configure_http_pool(client)
+                _http_clients[key] = client
+            return _http_clients[key]
+    return chromadb.PersistentClient(path=settings.chroma_persist_directory)
+
+def hnsw_collection_metadata(space: Optional[str] = None, m: Optional[int] = None,
+                             ef_construction: Optional[int] = None, ef_search: Optional[int] = None) -> Dict:
+    """Chroma collection metadata for the HNSW index, defaulting to Settings."""
+    return {
+        "hnsw:space": space or settings.chroma_distance_metric,
+        "hnsw:M": m or settings.hnsw_m,
+        "hnsw:construction_ef": ef_construction or settings.hnsw_ef_construction,
+        "hnsw:search_ef": ef_search or settings.hnsw_ef_search
+    }
 
 class EmbeddingManager:
     def __init__(self):
-        self.embeddings = OpenAIEmbeddings(api_key=settings.openai_api_key)
+        self.embeddings = OpenAIEmbeddings(model=settings.embedding_model, api_key=settings.openai_api_key,
+                                           timeout=settings.embedding_deadline)
+        self.embedding_caller = upstream_caller("embedding")
         
-        # Create ChromaDB client with proper persistence
-        self.chroma_client = chromadb.PersistentClient(
-            path=settings.chroma_persist_directory
-        )
+        self.chroma_client = create_chroma_client()
+        # Collection handles resolved once per load; see refresh_collections
+        self.collections = {}
+        # Collection -> projection its vectors were stored with (None: full size)
+        self.projections: Dict[str, Optional[EmbeddingProjection]] = {}
+        self._projection_files: Dict[str, EmbeddingProjection] = {}
+
+    def reopen_client(self) -> None:
+        """Open this process's own persistent Chroma client and re-resolve the cached collections.
+
+        For a forked worker: SQLite connections and chromadb's system state must
+        not be used across a fork. Vectors are re-read from disk, so the HNSW
+        segments are per worker rather than shared with the parent.
+        """
+        from chromadb.api.client import SharedSystemClient
+        _parent_clients.append(self.chroma_client)
+        # chromadb caches one system per path; the cached one belongs to the parent
+        SharedSystemClient.clear_system_cache()
+        self.chroma_client = create_chroma_client()
+        self.refresh_collections(list(self.collections))
+        self.warm_collections()
 
     def get_collection(self, collection_name: str):
         """Get or create a ChromaDB collection."""
+        if collection_name in self.collections:
+            return self.collections[collection_name]
         return self.chroma_client.get_or_create_collection(collection_name)
 
+    def refresh_collections(self, collection_names: List[str]) -> None:
+        """Resolve and cache handles for the collections queries will use."""
+        self.collections = {
+            name: self.chroma_client.get_or_create_collection(name)
+            for name in collection_names
+        }
+        self.projections = {name: self._load_projection(collection) for name, collection in self.collections.items()}
+
+    def _load_projection(self, collection) -> Optional[EmbeddingProjection]:
+        file_name = (collection.metadata or {}).get(PROJECTION_KEY)
+        if not file_name:
+            return None
+        if file_name not in self._projection_files:
+            path = os.path.join(settings.embedding_projection_dir, file_name)
+            self._projection_files[file_name] = EmbeddingProjection.load(path)
+        return self._projection_files[file_name]
+
+    def projection_for(self, collection_name: str) -> Optional[EmbeddingProjection]:
+        """Projection recorded on a collection, so queries are reduced the same way as its chunks."""
+        if collection_name not in self.projections:
+            self.projections[collection_name] = self._load_projection(self.get_collection(collection_name))
+        return self.projections[collection_name]
+
+    def _query_vector(self, collection_name: str, query_embedding: List[float]) -> List[float]:
+        projection = self.projection_for(collection_name)
+        return projection.apply_one(query_embedding) if projection else query_embedding
+
+    def warm_collections(self) -> None:
+        """Run one query per cached collection so its index is loaded before use."""
+        for name, collection in self.collections.items():
+            try:
+                sample = collection.peek(limit=1)
+                if sample["embeddings"] is not None and len(sample["embeddings"]):
+                    collection.query(query_embeddings=[list(sample["embeddings"][0])], n_results=1, include=[])
+            except Exception as e:
+                print(f"Could not warm collection {name}: {e}")
+
+    def embed_query(self, query: str, deadline: Optional[float] = None) -> List[float]:
+        """Embed a query under the embedding deadline (or a shorter one), hedging slow calls."""
+        return self.embedding_caller.call(self.embeddings.embed_query, query, deadline=deadline)
+
     def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings for a list of texts."""
         return self.embeddings.embed_documents(texts)
 
-    def query_similar(self, collection_name: str, query: str, n_results: int = 5) -> List[Dict]:
-        """Query similar documents from a collection."""
-        collection = self.get_collection(collection_name)
-        query_embedding = self.embeddings.embed_query(query)
+    def query_similar(self, collection_name: str, query: str, n_results: int = 5,
+                      where: Optional[Dict] = None) -> List[Dict]:
+        """Query similar documents from a collection, optionally filtered by metadata."""
+        query_embedding = self.embed_query(query)
+        return self._query_collection(collection_name, self._query_vector(collection_name, query_embedding),
+                                      n_results, where)
+
+    def query_shards(self, collection_names: List[str], query: str, n_results: int = 5,
+                     where: Optional[Dict] = None, deadline: Optional[float] = None) -> List[Dict]:
+        """Embed once, search every shard concurrently and merge the top-k by distance."""
+        query_embedding = self.embed_query(query, deadline)
+        if len(collection_names) == 1:
+            name = collection_names[0]
+            return self._query_collection(name, self._query_vector(name, query_embedding), n_results, where)
+        
+        # Shards built together share one projection; reduce the query once per projection
+        vectors = {}
+        for name in collection_names:
+            projection = self.projection_for(name)
+            if id(projection) not in vectors:
+                vectors[id(projection)] = projection.apply_one(query_embedding) if projection else query_embedding
+        with ThreadPoolExecutor(max_workers=max(1, min(settings.query_fanout_workers, len(collection_names)))) as pool:
+            shard_results = pool.map(
+                lambda name: self._query_collection(name, vectors[id(self.projection_for(name))], n_results, where),
+                collection_names
+            )
+            merged = [result for results in shard_results for result in results]
         
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results
-        )
+        merged.sort(key=lambda result: result["distance"])
+        return merged[:n_results]
+
+    def _query_collection(self, collection_name: str, query_embedding: List[float], n_results: int,
+                          where: Optional[Dict] = None) -> List[Dict]:
+        collection = self.get_collection(collection_name)
+        query_args = {"query_embeddings": [query_embedding], "n_results": n_results}
+        if where:
+            query_args["where"] = where
+        try:
+            results = collection.query(**query_args)
+        except Exception as e:
+            # One bad shard (e.g. mid-reindex) shouldn't fail the whole search
+            print(f"Query failed for collection {collection_name}: {e}")
+            return []
         
         return [
             {
+                "id": doc_id,
                 "text": doc,
                 "metadata": meta,
-                "distance": dist
+                "distance": dist,
+                "collection": collection_name
             }
-            for doc, meta, dist in zip(
+            for doc_id, doc, meta, dist in zip(
+                results["ids"][0],
                 results["documents"][0],
                 results["metadatas"][0],
                 results["distances"][0]
             )
-        ]
\ No newline at end of file
+        ]
@@ -0,0 +1,85 @@
+from typing import Dict, Optional
+import threading
+import time
+
+class IngestCancelled(Exception):
+    """Raised inside an ingest run once cancellation has been requested."""
+
+class IngestProgress:
+    """Counters an ingest run updates as it goes, readable from other threads.
+
+    `process_corpus` advances `stage` through extracting -> embedding ->
+    storing -> finalizing and checks for cancellation between batches.
+    """
+
+    def __init__(self):
+        self.stage = "queued"
+        self.stage_started = time.monotonic()
+        self.documents_total = 0
+        self.documents_done = 0
+        self.pages_done = 0
+        self.chunks_total = 0
+        self.chunks_embedded = 0
+        self.chunks_stored = 0
+        self.embed_started: Optional[float] = None
+        self.cancel_requested = threading.Event()
+        self._lock = threading.Lock()
+
+    def check_cancelled(self) -> None:
+        if self.cancel_requested.is_set():
+            raise IngestCancelled("Ingest cancelled")
+
+    def set_stage(self, stage: str) -> None:
+        self.check_cancelled()
+        self.stage = stage
+        self.stage_started = time.monotonic()
+        if stage == "embedding":
+            self.embed_started = self.stage_started
+
+    def document_extracted(self, page_count: int, chunk_count: int) -> None:
+        with self._lock:
+            self.documents_done += 1
+            self.pages_done += page_count
+            self.chunks_total += chunk_count
+
+    def chunks_embedded_add(self, count: int) -> None:
+        with self._lock:
+            self.chunks_embedded += count
+
+    def chunks_stored_add(self, count: int) -> None:
+        with self._lock:
+            self.chunks_stored += count
+
+    def embedding_rate(self) -> Optional[float]:
+        """Chunks embedded per second so far."""
+        if self.embed_started is None or not self.chunks_embedded:
+            return None
+        return self.chunks_embedded / max(time.monotonic() - self.embed_started, 1e-6)
+
+    def eta_seconds(self) -> Optional[float]:
+        """Seconds left in the current stage, extrapolated from its progress so far."""
+        elapsed = time.monotonic() - self.stage_started
+        if self.stage == "extracting" and self.documents_done:
+            return elapsed / self.documents_done * (self.documents_total - self.documents_done)
+        if self.stage == "embedding":
+            rate = self.embedding_rate()
+            return (self.chunks_total - self.chunks_embedded) / rate if rate else None
+        if self.stage == "storing" and self.chunks_stored:
+            return elapsed / self.chunks_stored * (self.chunks_total - self.chunks_stored)
+        return None
+
+    def snapshot(self) -> Dict:
+        rate = self.embedding_rate()
+        eta = self.eta_seconds()
+        return {
+            "stage": self.stage,
+            "documents_total": self.documents_total,
+            "documents_done": self.documents_done,
+            "pages_done": self.pages_done,
+            "chunks_total": self.chunks_total,
+            "chunks_embedded": self.chunks_embedded,
+            "chunks_stored": self.chunks_stored,
+            "embedding_chunks_per_sec": round(rate, 1) if rate else None,
+            "stage_eta_seconds": round(eta, 1) if eta is not None else None,
+            "cancel_requested": self.cancel_requested.is_set()
+        }
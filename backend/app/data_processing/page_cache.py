@@ -0,0 +1,126 @@
+from typing import Dict, List, Optional, Tuple
+import json
+import mmap
+import os
+import struct
+
+MAGIC = b"PGTXT001"
+HEADER = struct.Struct("<8sI")  # magic, page count
+OFFSET = struct.Struct("<Q")
+
+class PageTextFile:
+    """Read-only view of one cached document: an offset table over UTF-8 page text.
+
+    Layout: magic, page count, (pages + 1) uint64 byte offsets into the text
+    block, then the concatenated page text. The file is memory-mapped, so
+    reading a page touches only that page's bytes.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        if os.fstat(self._file.fileno()).st_size < HEADER.size:
+            self._file.close()
+            raise ValueError(f"Page text cache file is truncated: {path}")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.page_count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"Not a page text cache file: {path}")
+        self._table = HEADER.size
+        self._text = self._table + (self.page_count + 1) * OFFSET.size
+        # A torn or partly copied file would otherwise read as short pages
+        if len(self._map) < self._text or len(self._map) != self._text + self._offset(self.page_count):
+            self.close()
+            raise ValueError(f"Page text cache file is truncated or padded: {path}")
+
+    def _offset(self, index: int) -> int:
+        return OFFSET.unpack_from(self._map, self._table + index * OFFSET.size)[0]
+
+    def __len__(self) -> int:
+        return self.page_count
+
+    def page(self, index: int) -> str:
+        """Text of the page at 0-based `index`."""
+        if not 0 <= index < self.page_count:
+            raise IndexError(index)
+        start, end = self._offset(index), self._offset(index + 1)
+        return self._map[self._text + start:self._text + end].decode("utf-8")
+
+    def pages(self) -> List[str]:
+        return [self.page(i) for i in range(self.page_count)]
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class PageTextCache:
+    """Extracted PDF page text (and outline sections) keyed by file digest.
+
+    Re-chunking with another chunk_size/overlap, or building several indexes
+    from the same PDFs, reads pages from here instead of parsing the PDF again.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _paths(self, digest: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, digest)
+        return base + ".pages", base + ".sections.json"
+
+    def open(self, digest: str) -> Optional[PageTextFile]:
+        pages_path, _ = self._paths(digest)
+        if not os.path.exists(pages_path):
+            return None
+        try:
+            return PageTextFile(pages_path)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Ignoring unreadable page cache {pages_path}: {e}")
+            return None
+
+    def load(self, digest: str) -> Optional[Tuple[List[str], Dict[int, Dict[str, str]]]]:
+        """(pages, page_sections) for the PDF with this digest, or None on a cache miss."""
+        _, sections_path = self._paths(digest)
+        if not os.path.exists(sections_path):
+            return None
+        cached = self.open(digest)
+        if cached is None:
+            return None
+        try:
+            with cached:
+                pages = cached.pages()
+            with open(sections_path) as f:
+                sections = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable page cache entry {digest}: {e}")
+            return None
+        return pages, {int(page): info for page, info in sections.items()}
+
+    def store(self, digest: str, pages: List[str], page_sections: Dict[int, Dict[str, str]]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        pages_path, sections_path = self._paths(digest)
+        encoded = [(page or "").encode("utf-8") for page in pages]
+
+        offsets, position = [0], 0
+        for data in encoded:
+            position += len(data)
+            offsets.append(position)
+
+        tmp_path = pages_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(encoded)))
+            f.write(b"".join(OFFSET.pack(offset) for offset in offsets))
+            for data in encoded:
+                f.write(data)
+        os.replace(tmp_path, pages_path)
+
+        # Written last: its presence marks the entry complete
+        tmp_path = sections_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(page_sections, f)
+        os.replace(tmp_path, sections_path)
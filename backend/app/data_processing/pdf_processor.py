@@ -1,29 +1,113 @@
 import sys
 import os
-from typing import List, Dict
+from typing import List, Dict, Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import glob
+import json
+import re
+import time
 import pypdf
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
-import chromadb
 from dotenv import load_dotenv
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config import settings
+from data_processing.chunker import get_chunker
+from data_processing.chunk_store import ChunkStore
+from data_processing.embeddings import hnsw_collection_metadata, create_chroma_client
+from data_processing.ingest_progress import IngestProgress
+from data_processing.page_cache import PageTextCache
+from data_processing.projection import EmbeddingProjection, PROJECTION_KEY
+from data_processing.hashing import file_digest
 from dotenv import load_dotenv
 load_dotenv()
 
+# Collection used when only settings.pdf_path is ingested (the original single-PDF layout)
+DEFAULT_COLLECTION = "pdf_documents"
+
+# Publication family from file names such as "ARN42404-FM_5-0-000-WEB-1.pdf"
+FAMILY_PATTERN = re.compile(r'(?:^|[^A-Za-z])(ADP|ADRP|ATP|ATTP|FM|AR|TC|TM|PAM)[_\- ]?\d', re.IGNORECASE)
+
+def document_slug(file_name: str) -> str:
+    """Collection/ID-safe identifier for a document."""
+    stem = os.path.splitext(os.path.basename(file_name))[0]
+    return re.sub(r'[^a-z0-9]+', '_', stem.lower()).strip('_')
+
+def document_family(file_name: str) -> str:
+    """Publication family (fm, adp, ar, ...) or "misc" if it can't be told from the name."""
+    match = FAMILY_PATTERN.search(os.path.basename(file_name))
+    return match.group(1).lower() if match else "misc"
+
+def shard_for(file_name: str, shard_by: str) -> str:
+    """Collection a document is stored in: one per document or one per family."""
+    key = document_family(file_name) if shard_by == "family" else document_slug(file_name)
+    # Chroma names: 3-63 chars, alphanumeric start/end
+    return f"pdf_{key}"[:63].rstrip('_')
+
+def load_shard_registry(path: str) -> Dict[str, List[str]]:
+    """Collection name -> sources; defaults to the single-PDF collection."""
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f).get("shards", {})
+    return {DEFAULT_COLLECTION: [os.path.basename(settings.pdf_path)]}
+
+def chunking_config() -> Dict:
+    """Settings that determine chunk boundaries, as recorded with an index."""
+    return {
+        "chunk_size": settings.chunk_size,
+        "chunk_overlap": settings.chunk_overlap,
+        "chunk_unit": settings.chunk_unit,
+        "chunk_across_pages": settings.chunk_across_pages
+    }
+
+def versioned_collection_name(name: str, suffix: str) -> str:
+    """Collection name with a build suffix, kept within Chroma's 63-character limit."""
+    if not suffix:
+        return name
+    return f"{name[:63 - len(suffix)].rstrip('_')}{suffix}"
+
+def _lower_priority() -> None:
+    # Ingest workers yield the CPU to query serving
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass
+
+def extract_document(file_path: str, chunk_size: int, overlap: int, cache_dir: str = "",
+                     unit: str = "chars", across_pages: bool = False) -> Dict:
+    """Parse and chunk one PDF. Runs in an ingest worker process.
+
+    With a cache_dir, page text and outline sections come from the page text
+    cache when this exact file (by digest) was parsed before.
+    """
+    source = os.path.basename(file_path)
+    cache = PageTextCache(cache_dir) if cache_dir else None
+    digest = file_digest(file_path) if cache else None
+    cached = cache.load(digest) if cache else None
+    if cached:
+        pages, page_sections = cached
+    else:
+        pages = PDFProcessor.load_pdf(file_path)
+        page_sections = PDFProcessor.load_page_sections(file_path)
+        if cache:
+            cache.store(digest, pages, page_sections)
+    chunker = get_chunker(chunk_size, overlap, unit, across_pages)
+    chunked_pages = chunker.chunk_document(pages, source, page_sections)
+    return {"file_path": file_path, "source": source, "page_count": len(pages), "pages": chunked_pages,
+            "page_cache": ("hit" if cached else "miss") if cache else None}
+
 class PDFProcessor:
     def __init__(self):
-        self.embeddings = OpenAIEmbeddings(api_key=settings.openai_api_key)
+        self.embeddings = OpenAIEmbeddings(model=settings.embedding_model, api_key=settings.openai_api_key)
         
-        # Use PersistentClient to ensure data persists
-        self.chroma_client = chromadb.PersistentClient(
-            path=settings.chroma_persist_directory
-        )
-        self.collection = self.chroma_client.get_or_create_collection("pdf_documents")
+        self.chroma_client = create_chroma_client()
+        # The single-PDF collection once a build without shard_by has stored it; never created up front
+        self.collection = None
+        self.chunk_store = ChunkStore(settings.chunk_store_path)
 
-    def load_pdf(self, file_path: str) -> List[str]:
+    @staticmethod
+    def load_pdf(file_path: str) -> List[str]:
         """Load PDF and extract text from each page."""
         pages = []
         with open(file_path, 'rb') as file:
@@ -32,103 +116,264 @@ class PDFProcessor:
                 pages.append(page.extract_text())
         return pages
 
-    def chunk_text(self, page_text: str, page_num: int, chunk_size: int, overlap: int) -> List[Dict]:
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=overlap,
-            length_function=len,
-        )
+    @staticmethod
+    def load_page_sections(file_path: str) -> Dict[int, Dict[str, str]]:
+        """Map each 1-based page to its chapter and section from the PDF outline."""
+        with open(file_path, 'rb') as file:
+            pdf = pypdf.PdfReader(file)
+            entries = []
+            
+            def walk(outline, depth):
+                for item in outline:
+                    if isinstance(item, list):
+                        walk(item, depth + 1)
+                        continue
+                    try:
+                        page_index = pdf.get_destination_page_number(item)
+                    except Exception:
+                        continue
+                    if page_index is not None and page_index >= 0:
+                        entries.append((page_index + 1, depth, " ".join(str(item.title).split())))
+            
+            try:
+                walk(pdf.outline, 0)
+            except Exception as e:
+                print(f"Could not read PDF outline: {e}")
+            num_pages = len(pdf.pages)
         
-        chunks = text_splitter.split_text(page_text)
-        return [
-            {
-                "text": chunk,
-                "metadata": {
-                    "source": "ARN42404-FM_5-0-000-WEB-1.pdf",
-                    "page": page_num,
-                    "chunk_index": i
-                }
-            }
-            for i, chunk in enumerate(chunks)
-        ]
+        # Outline order is reading order; sort by page only so ties keep that order
+        entries.sort(key=lambda entry: entry[0])
+        page_sections = {}
+        chapter, section = "", ""
+        position = 0
+        for page_num in range(1, num_pages + 1):
+            while position < len(entries) and entries[position][0] <= page_num:
+                _, depth, title = entries[position]
+                if depth == 0:
+                    chapter, section = title, ""
+                elif depth == 1:
+                    section = title
+                position += 1
+            page_sections[page_num] = {"chapter": chapter, "section": section}
+        return page_sections
 
-    def process_pdf_to_vectorstore(self) -> None:
-        """Process PDF and store in ChromaDB."""
-        print(f"Loading PDF from: {settings.pdf_path}")
-        
-        # Force delete and recreate collection to fix dimension mismatch
+    @staticmethod
+    def chunk_text(page_text: str, page_num: int, chunk_size: int, overlap: int,
+                   section_info: Optional[Dict[str, str]] = None, source: Optional[str] = None) -> List[Dict]:
+        """Chunk a single page with the configured chunk unit."""
+        chunker = get_chunker(chunk_size, overlap, settings.chunk_unit)
+        return chunker.chunk_page(page_text, page_num, source or os.path.basename(settings.pdf_path), section_info)
+
+    def _reset_collection(self, name: str, extra_metadata: Optional[Dict] = None):
+        """Delete and recreate a collection (avoids embedding dimension mismatches)."""
         try:
-            self.chroma_client.delete_collection("pdf_documents")
-            print("Deleted existing collection")
+            self.chroma_client.delete_collection(name)
+            print(f"Deleted existing collection {name}")
         except:
-            print("No existing collection to delete")
+            print(f"No existing collection {name} to delete")
         
         # Create fresh collection with no default embedding function
-        self.collection = self.chroma_client.create_collection(
-            name="pdf_documents",
-            embedding_function=None  # This prevents ChromaDB from using default embeddings
+        return self.chroma_client.create_collection(
+            name=name,
+            embedding_function=None,  # This prevents ChromaDB from using default embeddings
+            metadata={**hnsw_collection_metadata(), **(extra_metadata or {})}
         )
-        print("Created fresh collection without default embedding function")
+
+    def process_pdf_to_vectorstore(self) -> None:
+        """Process the configured PDF (or every PDF in settings.pdf_directory) into ChromaDB.
+
+        The index is built under fresh collection names and the previous
+        collections are only deleted once it is complete, so a failed run
+        leaves the existing index in place.
+        """
+        previous = list(load_shard_registry(settings.shard_registry_path))
+        suffix = f"_v{int(time.time())}"
+        if settings.pdf_directory:
+            file_paths = sorted(glob.glob(os.path.join(settings.pdf_directory, "*.pdf")))
+            print(f"Loading {len(file_paths)} PDFs from: {settings.pdf_directory}")
+            registry = self.process_corpus(file_paths, settings.shard_by, collection_suffix=suffix)
+        else:
+            print(f"Loading PDF from: {settings.pdf_path}")
+            registry = self.process_corpus([settings.pdf_path], collection_suffix=suffix)
+        self.retire_collections([name for name in previous if name not in registry])
+
+    def process_corpus(self, file_paths: List[str], shard_by: Optional[str] = None,
+                       progress: Optional[IngestProgress] = None, collection_suffix: str = "",
+                       workers: Optional[int] = None, low_priority: bool = False) -> Dict[str, List[str]]:
+        """Ingest PDFs in parallel into per-document or per-family collections.
+
+        Parsing and chunking run in a process pool, embedding in a thread pool
+        (in batches, so progress and cancellation are checked between them);
+        Chroma writes stay in this process. With shard_by=None the single PDF
+        goes to DEFAULT_COLLECTION with the original un-prefixed chunk IDs.
+
+        With a `collection_suffix` the new collections get fresh names and the
+        previous ones are left for the caller to retire once queries have moved
+        over, so the old index keeps serving throughout. Without one, collections
+        are replaced in place once embedding has succeeded, and previous shards
+        the new registry no longer lists are deleted at the end.
+        """
+        if not file_paths:
+            raise ValueError("No PDF files to ingest")
+        single_document = shard_by is None
+        progress = progress or IngestProgress()
+        workers = max(1, min(workers or settings.ingest_workers, len(file_paths)))
+        previous = list(load_shard_registry(settings.shard_registry_path))
         
-        # Load PDF
-        pages = self.load_pdf(settings.pdf_path)
-        print(f"Loaded PDF with {len(pages)} pages")
+        progress.set_stage("extracting")
+        progress.documents_total = len(file_paths)
+        documents = []
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_lower_priority if low_priority else None) as pool:
+            futures = [pool.submit(extract_document, path, settings.chunk_size, settings.chunk_overlap,
+                                   settings.page_text_cache_dir, settings.chunk_unit,
+                                   settings.chunk_across_pages)
+                       for path in file_paths]
+            try:
+                for future in futures:
+                    document = future.result()
+                    documents.append(document)
+                    progress.document_extracted(document["page_count"],
+                                                sum(len(chunks) for _, _, chunks in document["pages"]))
+                    progress.check_cancelled()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
         
-        # Process each page and generate embeddings
-        all_documents = []
-        all_metadatas = []
-        all_ids = []
-        all_embeddings = []
+        # Index pages for direct lookups and group chunks by shard
+        self.chunk_store.clear()
+        shards: Dict[str, Dict] = {}
+        for document in documents:
+            print(f"{document['source']}: {document['page_count']} pages, "
+                  f"{sum(len(chunks) for _, _, chunks in document['pages'])} chunks"
+                  + (f" (page text cache {document['page_cache']})" if document['page_cache'] else ""))
+            name = DEFAULT_COLLECTION if single_document else shard_for(document["source"], shard_by)
+            name = versioned_collection_name(name, collection_suffix)
+            id_prefix = "" if single_document else f"{document_slug(document['source'])}_"
+            shard = shards.setdefault(name, {"sources": [], "documents": [], "metadatas": [], "ids": []})
+            shard["sources"].append(document["source"])
+            for page_num, page_text, chunks in document["pages"]:
+                chunk_ids = self.chunk_store.add_page(page_num, page_text, chunks, id_prefix)
+                for chunk, chunk_id in zip(chunks, chunk_ids):
+                    shard["documents"].append(chunk["text"])
+                    shard["metadatas"].append(chunk["metadata"])
+                    shard["ids"].append(chunk_id)
         
-        for page_num, page_text in enumerate(pages, 1):
-            if not page_text.strip():  # Skip empty pages
-                continue
-                
-            chunks = self.chunk_text(page_text, page_num, settings.chunk_size, settings.chunk_overlap)
-            print(f"Page {page_num}: Created {len(chunks)} chunks")
-            
-            # Collect all chunks for batch processing
-            for chunk in chunks:
-                all_documents.append(chunk["text"])
-                all_metadatas.append(chunk["metadata"])
-                all_ids.append(f"page_{page_num}_chunk_{chunk['metadata']['chunk_index']}")
+        # Generate embeddings for all shards concurrently
+        print(f"Generating embeddings for {sum(len(s['documents']) for s in shards.values())} chunks "
+              f"across {len(shards)} collections...")
+        progress.set_stage("embedding")
         
-        print(f"Total chunks to process: {len(all_documents)}")
+        def embed_shard(shard: Dict) -> List[List[float]]:
+            vectors = []
+            batch_size = settings.ingest_embed_batch_size
+            for i in range(0, len(shard["documents"]), batch_size):
+                progress.check_cancelled()
+                batch = shard["documents"][i:i+batch_size]
+                vectors.extend(self.embeddings.embed_documents(batch))
+                progress.chunks_embedded_add(len(batch))
+            return vectors
         
-        # Generate embeddings for all documents
-        print("Generating embeddings...")
-        all_embeddings = self.embeddings.embed_documents(all_documents)
-        print(f"Generated {len(all_embeddings)} embeddings, dimension: {len(all_embeddings[0])}")
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(shards)))) as pool:
+            embedded = dict(zip(shards, pool.map(embed_shard, shards.values())))
         
-        # Add all documents in batches with embeddings
-        batch_size = 100
-        for i in range(0, len(all_documents), batch_size):
-            batch_docs = all_documents[i:i+batch_size]
-            batch_metas = all_metadatas[i:i+batch_size]
-            batch_ids = all_ids[i:i+batch_size]
-            batch_embeddings = all_embeddings[i:i+batch_size]
-            
-            print(f"Processing batch {i//batch_size + 1}: {len(batch_docs)} documents")
-            
-            self.collection.add(
-                documents=batch_docs,
-                metadatas=batch_metas,
-                ids=batch_ids,
-                embeddings=batch_embeddings  # Provide our own embeddings
-            )
+        projection, projection_metadata = None, {}
+        if settings.embedding_reduction != "none":
+            # One projection per build, fitted on every shard, so a query is reduced once for all of them
+            projection = EmbeddingProjection.fit(settings.embedding_reduction, settings.embedding_dimensions,
+                                                 [vector for vectors in embedded.values() for vector in vectors])
+            embedded = {name: projection.apply(vectors) for name, vectors in embedded.items()}
+            file_name = f"projection{collection_suffix}.npz"
+            projection.save(os.path.join(settings.embedding_projection_dir, file_name))
+            projection_metadata = projection.collection_metadata(file_name)
+            print(f"Reduced embeddings with {projection.describe()}")
         
-        # Verify storage
-        final_count = self.collection.count()
-        print(f"Successfully stored {final_count} documents in ChromaDB")
+        progress.set_stage("storing")
+        created = []
+        try:
+            for name, shard in shards.items():
+                collection = self._reset_collection(name, projection_metadata)
+                created.append(name)
+                all_embeddings = embedded[name]
+                
+                # Add all documents in batches with embeddings
+                batch_size = 100
+                for i in range(0, len(shard["documents"]), batch_size):
+                    progress.check_cancelled()
+                    collection.add(
+                        documents=shard["documents"][i:i+batch_size],
+                        metadatas=shard["metadatas"][i:i+batch_size],
+                        ids=shard["ids"][i:i+batch_size],
+                        embeddings=all_embeddings[i:i+batch_size]  # Provide our own embeddings
+                    )
+                    progress.chunks_stored_add(len(shard["ids"][i:i+batch_size]))
+                print(f"Stored {collection.count()} chunks in collection {name}")
+                if single_document:
+                    self.collection = collection
+            progress.set_stage("finalizing")
+        except BaseException:
+            if collection_suffix:
+                # Half-built new collections; the previous index is untouched
+                self.retire_collections(created)
+            raise
+        
+        self.chunk_store.save()
+        print(f"Saved page index for {self.chunk_store.page_count()} pages to {settings.chunk_store_path}")
+        
+        registry = {name: shard["sources"] for name, shard in shards.items()}
+        os.makedirs(os.path.dirname(os.path.abspath(settings.shard_registry_path)), exist_ok=True)
+        # Written atomically: running servers may be polling this file for changes
+        tmp_path = settings.shard_registry_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "shard_by": shard_by or "single",
+                "shards": registry,
+                # What the vectors were built with, for snapshots and consistency checks
+                "embedding_model": settings.embedding_model,
+                "chunking": chunking_config()
+            }, f, indent=2)
+        os.replace(tmp_path, settings.shard_registry_path)
+        print(f"Saved shard registry with {len(registry)} collections to {settings.shard_registry_path}")
+        if not collection_suffix:
+            # Removed documents shouldn't linger
+            self.retire_collections([name for name in previous if name not in registry])
         
         # Test a simple query with OpenAI embeddings
         test_embedding = self.embeddings.embed_query("military decision making process")
+        if projection:
+            test_embedding = projection.apply_one(test_embedding)
         print(f"Test embedding dimension: {len(test_embedding)}")
         
-        test_results = self.collection.query(
+        first_collection = self.chroma_client.get_collection(next(iter(registry)))
+        test_results = first_collection.query(
             query_embeddings=[test_embedding],
             n_results=3
         )
         print(f"Test query returned {len(test_results['documents'][0])} results")
         if test_results['documents'][0]:
-            print(f"Sample result: {test_results['documents'][0][0][:100]}...")
\ No newline at end of file
+            print(f"Sample result: {test_results['documents'][0][0][:100]}...")
+        
+        return registry
+
+    def retire_collections(self, names: List[str]) -> None:
+        """Delete collections that are no longer in the shard registry, and projections nothing uses."""
+        projection_files = set()
+        for name in names:
+            try:
+                metadata = self.chroma_client.get_collection(name).metadata or {}
+                if metadata.get(PROJECTION_KEY):
+                    projection_files.add(metadata[PROJECTION_KEY])
+                self.chroma_client.delete_collection(name)
+                print(f"Deleted retired collection {name}")
+            except Exception as e:
+                print(f"Could not delete collection {name}: {e}")
+        if not projection_files:
+            return
+        in_use = {(collection.metadata or {}).get(PROJECTION_KEY)
+                  for collection in self.chroma_client.list_collections()}
+        for file_name in projection_files - in_use:
+            try:
+                os.remove(os.path.join(settings.embedding_projection_dir, file_name))
+            except OSError:
+                pass
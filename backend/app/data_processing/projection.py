@@ -0,0 +1,95 @@
+from typing import Dict, List, Optional, Sequence
+import os
+import numpy as np
+
+REDUCTIONS = ("none", "truncate", "pca")
+
+# Collection metadata keys that tie a collection to the projection its vectors went through
+PROJECTION_KEY = "embedding_projection"
+DIMS_KEY = "embedding_dims"
+
+class EmbeddingProjection:
+    """Reduces embeddings to `dims` dimensions, identically for chunks and queries.
+
+    "truncate" keeps the leading dimensions (what text-embedding-3 models do
+    natively with their `dimensions` option); "pca" projects onto the top
+    principal components of the corpus, fitted once at ingest. Outputs are
+    re-normalized to unit length, as the full-size embeddings are.
+    """
+
+    def __init__(self, kind: str, dims: int, source_dims: int,
+                 mean: Optional[np.ndarray] = None, components: Optional[np.ndarray] = None,
+                 explained_variance: Optional[float] = None):
+        self.kind = kind
+        self.dims = dims
+        self.source_dims = source_dims
+        self.mean = mean
+        self.components = components
+        self.explained_variance = explained_variance
+
+    @classmethod
+    def fit(cls, kind: str, dims: int, vectors: Sequence[Sequence[float]]) -> "EmbeddingProjection":
+        """Build a projection for `vectors` (the corpus embeddings)."""
+        if kind not in REDUCTIONS or kind == "none":
+            raise ValueError(f"embedding reduction must be 'truncate' or 'pca', got {kind!r}")
+        x = np.asarray(vectors, dtype=np.float64)
+        source_dims = x.shape[1]
+        if not 0 < dims < source_dims:
+            raise ValueError(f"Target dimensions must be between 1 and {source_dims - 1}, got {dims}")
+        if kind == "truncate":
+            return cls(kind, dims, source_dims)
+
+        if len(x) < dims:
+            raise ValueError(f"PCA to {dims} dimensions needs at least {dims} vectors, got {len(x)}")
+        mean = x.mean(axis=0)
+        centered = x - mean
+        # Eigenvectors of the D x D covariance; cheaper than an SVD of the N x D corpus
+        eigenvalues, eigenvectors = np.linalg.eigh(centered.T @ centered)
+        order = np.argsort(eigenvalues)[::-1][:dims]
+        explained = float(eigenvalues[order].sum() / max(eigenvalues.sum(), 1e-12))
+        return cls(kind, dims, source_dims, mean.astype(np.float32),
+                   eigenvectors[:, order].T.astype(np.float32), explained)
+
+    def apply(self, vectors: Sequence[Sequence[float]]) -> List[List[float]]:
+        x = np.asarray(vectors, dtype=np.float32)
+        if x.shape[1] != self.source_dims:
+            raise ValueError(f"Projection expects {self.source_dims}-dimensional embeddings, got {x.shape[1]}")
+        if self.kind == "pca":
+            x = (x - self.mean) @ self.components.T
+        else:
+            x = x[:, :self.dims]
+        norms = np.linalg.norm(x, axis=1, keepdims=True)
+        return (x / np.maximum(norms, 1e-12)).tolist()
+
+    def apply_one(self, vector: Sequence[float]) -> List[float]:
+        return self.apply([vector])[0]
+
+    def collection_metadata(self, file_name: str) -> Dict:
+        return {PROJECTION_KEY: file_name, DIMS_KEY: self.dims}
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        arrays = {"kind": np.array(self.kind), "dims": np.array(self.dims),
+                  "source_dims": np.array(self.source_dims)}
+        if self.kind == "pca":
+            arrays.update(mean=self.mean, components=self.components,
+                          explained_variance=np.array(self.explained_variance))
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "EmbeddingProjection":
+        with np.load(path) as data:
+            kind = str(data["kind"])
+            if kind == "pca":
+                return cls(kind, int(data["dims"]), int(data["source_dims"]), data["mean"],
+                           data["components"], float(data["explained_variance"]))
+            return cls(kind, int(data["dims"]), int(data["source_dims"]))
+
+    def describe(self) -> Dict:
+        summary = {"kind": self.kind, "dims": self.dims, "source_dims": self.source_dims}
+        if self.explained_variance is not None:
+            summary["explained_variance"] = round(self.explained_variance, 4)
+        return summary
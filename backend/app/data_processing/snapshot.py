@@ -0,0 +1,211 @@
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+import hashlib
+import io
+import json
+import os
+import zipfile
+import numpy as np
+
+from config import settings
+from data_processing.embeddings import create_chroma_client
+from data_processing.pdf_processor import chunking_config, load_shard_registry
+from data_processing.projection import PROJECTION_KEY
+
+# Bump when the archive layout changes
+SNAPSHOT_FORMAT = 1
+MANIFEST = "manifest.json"
+READ_BATCH = 5000
+
+class SnapshotError(Exception):
+    """The snapshot is unreadable, corrupt, or doesn't fit this deployment."""
+
+def _check_name(name: str, kind: str) -> str:
+    """Names from the archive become file and collection names; refuse anything path-like."""
+    if not name or ".." in name or "/" in name or "\\" in name or os.sep in name:
+        raise SnapshotError(f"Snapshot has an unsafe {kind} name: {name!r}")
+    return name
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def _npy_bytes(array: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+def _read_registry() -> Dict:
+    if os.path.exists(settings.shard_registry_path):
+        with open(settings.shard_registry_path) as f:
+            return json.load(f)
+    return {"shard_by": "single", "shards": load_shard_registry(settings.shard_registry_path)}
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def export_snapshot(path: str) -> Dict:
+    """Write every PDF collection, the page index and shard registry to one archive.
+
+    Each collection is stored column by column: IDs, texts and metadata as
+    JSON, vectors as one float32 .npy matrix. The manifest records counts,
+    dimensions, the embedding model and chunking config, and a SHA-256 per
+    entry so an import can verify everything before touching the store.
+    """
+    client = create_chroma_client()
+    registry = _read_registry()
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "created_at": datetime.now().isoformat(),
+        "embedding_model": registry.get("embedding_model", settings.embedding_model),
+        "chunking": registry.get("chunking", chunking_config()),
+        "collections": {},
+        "entries": {}
+    }
+    entries: Dict[str, bytes] = {}
+
+    for name in registry["shards"]:
+        collection = client.get_collection(name)
+        ids, documents, metadatas, vectors = [], [], [], []
+        total = collection.count()
+        for offset in range(0, total, READ_BATCH):
+            batch = collection.get(include=["documents", "metadatas", "embeddings"],
+                                   limit=READ_BATCH, offset=offset)
+            ids.extend(batch["ids"])
+            documents.extend(batch["documents"])
+            metadatas.extend(batch["metadatas"])
+            vectors.extend(batch["embeddings"])
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+
+        prefix = f"collections/{name}/"
+        entries[prefix + "ids.json"] = json.dumps(ids).encode("utf-8")
+        entries[prefix + "documents.json"] = json.dumps(documents).encode("utf-8")
+        entries[prefix + "metadatas.json"] = json.dumps(metadatas).encode("utf-8")
+        entries[prefix + "embeddings.npy"] = _npy_bytes(matrix)
+        collection_metadata = collection.metadata or {}
+        manifest["collections"][name] = {
+            "count": len(ids),
+            "dims": int(matrix.shape[1]),
+            "metadata": collection_metadata
+        }
+        projection_file = collection_metadata.get(PROJECTION_KEY)
+        if projection_file and f"projections/{projection_file}" not in entries:
+            with open(os.path.join(settings.embedding_projection_dir, projection_file), "rb") as f:
+                entries[f"projections/{projection_file}"] = f.read()
+        print(f"Exported {len(ids)} chunks ({matrix.shape[1]} dims) from collection {name}")
+
+    entries["shard_registry.json"] = json.dumps(registry, indent=2).encode("utf-8")
+    with open(settings.chunk_store_path, "rb") as f:
+        entries["chunk_store.json"] = f.read()
+
+    manifest["entries"] = {entry: _sha256(data) for entry, data in entries.items()}
+    tmp_path = path + ".tmp"
+    with zipfile.ZipFile(tmp_path, "w") as archive:
+        for entry, data in entries.items():
+            # Vectors barely compress; text and metadata do
+            compression = zipfile.ZIP_STORED if entry.endswith(".npy") else zipfile.ZIP_DEFLATED
+            archive.writestr(entry, data, compress_type=compression)
+        archive.writestr(MANIFEST, json.dumps(manifest, indent=2))
+    os.replace(tmp_path, path)
+    return manifest
+
+def _load_verified(archive: zipfile.ZipFile) -> Tuple[Dict, Dict[str, bytes]]:
+    try:
+        manifest = json.loads(archive.read(MANIFEST))
+    except KeyError:
+        raise SnapshotError("Snapshot has no manifest")
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise SnapshotError(f"Unsupported snapshot format {manifest.get('format')} (expected {SNAPSHOT_FORMAT})")
+
+    entries = {}
+    for entry, expected in manifest["entries"].items():
+        try:
+            data = archive.read(entry)
+        except KeyError:
+            raise SnapshotError(f"Snapshot is missing {entry}")
+        if _sha256(data) != expected:
+            raise SnapshotError(f"Checksum mismatch for {entry}")
+        if entry.startswith("projections/"):
+            _check_name(entry[len("projections/"):], "projection")
+        entries[entry] = data
+    for name in manifest.get("collections", {}):
+        _check_name(name, "collection")
+    return manifest, entries
+
+def _collection_columns(name: str, info: Dict, entries: Dict[str, bytes]) -> Dict:
+    prefix = f"collections/{name}/"
+    ids = json.loads(entries[prefix + "ids.json"])
+    documents = json.loads(entries[prefix + "documents.json"])
+    metadatas = json.loads(entries[prefix + "metadatas.json"])
+    vectors = np.load(io.BytesIO(entries[prefix + "embeddings.npy"]), allow_pickle=False)
+
+    count = info["count"]
+    if not (len(ids) == len(documents) == len(metadatas) == vectors.shape[0] == count):
+        raise SnapshotError(f"Collection {name}: column lengths don't match the manifest count {count}")
+    if vectors.ndim != 2 or vectors.shape[1] != info["dims"]:
+        raise SnapshotError(f"Collection {name}: vectors are {vectors.shape}, expected {info['dims']} dims")
+    if len(set(ids)) != len(ids):
+        raise SnapshotError(f"Collection {name}: duplicate chunk IDs")
+    if not np.isfinite(vectors).all():
+        raise SnapshotError(f"Collection {name}: vectors contain NaN or infinite values")
+    projection_file = info["metadata"].get(PROJECTION_KEY)
+    if projection_file and f"projections/{projection_file}" not in entries:
+        raise SnapshotError(f"Collection {name}: projection {projection_file} is not in the snapshot")
+    return {"ids": ids, "documents": documents, "metadatas": metadatas, "vectors": vectors}
+
+def import_snapshot(path: str, force: bool = False, batch_size: Optional[int] = None) -> Dict:
+    """Load a snapshot written by export_snapshot into this node's store, without embedding calls.
+
+    Every entry is checksummed and every collection's columns are checked
+    before anything is written. Collections that already hold data are
+    only replaced with `force`. The shard registry is written last, so a
+    running server's index watcher only sees the import once it's complete.
+    """
+    try:
+        with zipfile.ZipFile(path) as archive:
+            manifest, entries = _load_verified(archive)
+    except zipfile.BadZipFile as e:
+        raise SnapshotError(f"Not a readable snapshot: {e}")
+
+    if manifest["embedding_model"] != settings.embedding_model:
+        raise SnapshotError(f"Snapshot vectors come from {manifest['embedding_model']}, but queries here "
+                            f"would be embedded with {settings.embedding_model}")
+    columns = {name: _collection_columns(name, info, entries)
+               for name, info in manifest["collections"].items()}
+
+    client = create_chroma_client()
+    existing = {collection.name: collection for collection in client.list_collections()}
+    occupied = [name for name in columns if name in existing and existing[name].count() > 0]
+    if occupied and not force:
+        raise SnapshotError(f"Collections already hold data: {', '.join(occupied)} (use force to replace them)")
+
+    batch_size = batch_size or READ_BATCH
+    imported: List[str] = []
+    for name, data in columns.items():
+        if name in existing:
+            client.delete_collection(name)
+        collection = client.create_collection(name=name, embedding_function=None,
+                                              metadata=manifest["collections"][name]["metadata"])
+        for i in range(0, len(data["ids"]), batch_size):
+            collection.add(
+                ids=data["ids"][i:i+batch_size],
+                documents=data["documents"][i:i+batch_size],
+                metadatas=data["metadatas"][i:i+batch_size],
+                embeddings=data["vectors"][i:i+batch_size].tolist()
+            )
+        imported.append(name)
+        print(f"Imported {collection.count()} chunks into collection {name}")
+
+    for entry, data in entries.items():
+        if entry.startswith("projections/"):
+            _write_atomic(os.path.join(settings.embedding_projection_dir, entry[len("projections/"):]), data)
+    _write_atomic(settings.chunk_store_path, entries["chunk_store.json"])
+    _write_atomic(settings.shard_registry_path, entries["shard_registry.json"])
+
+    if manifest["chunking"] != chunking_config():
+        print(f"Note: snapshot was chunked with {manifest['chunking']}; this node's settings are "
+              f"{chunking_config()}. Queries are unaffected; a local re-ingest would chunk differently.")
+    return {"collections": imported, "chunks": sum(len(data["ids"]) for data in columns.values())}
@@ -0,0 +1,23 @@
+from functools import lru_cache
+import tiktoken
+
+# Same BPE used by gpt-3.5-turbo and text-embedding-ada-002
+ENCODING_NAME = "cl100k_base"
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    """Load the tokenizer once; returns None if the BPE file is unavailable offline."""
+    try:
+        return tiktoken.get_encoding(ENCODING_NAME)
+    except Exception as e:
+        print(f"Warning: could not load tokenizer '{ENCODING_NAME}', using estimate: {e}")
+        return None
+
+def count_tokens(text: str) -> int:
+    """Count tokens locally, falling back to a ~4 chars/token estimate."""
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,89 @@
+import math
+import re
+from typing import Dict, Iterable, List
+
+STOPWORDS = {
+    'the', 'and', 'for', 'with', 'that', 'this', 'what', 'who', 'how', 'why', 'when', 'where',
+    'are', 'was', 'were', 'been', 'being', 'have', 'has', 'had', 'does', 'did', 'can', 'could',
+    'should', 'would', 'will', 'into', 'from', 'about', 'their', 'there', 'them', 'they', 'your',
+    'you', 'our', 'his', 'her', 'its', 'which', 'than', 'then', 'also', 'any', 'all', 'each',
+    'during', 'write', 'explain', 'describe', 'tell', 'give', 'list', 'please', 'need', 'help'
+}
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9(])')
+WORD = re.compile(r"[a-z0-9][a-z0-9'\-]*")
+MIN_SENTENCE_WORDS = 5
+
+def query_terms(query: str, extra_terms: Iterable[str] = ()) -> List[str]:
+    """Content words of the query plus any expansion terms, lowercased and de-duplicated."""
+    terms = []
+    for text in (query, *extra_terms):
+        for word in WORD.findall(text.lower()):
+            if len(word) > 2 and word not in STOPWORDS and word not in terms:
+                terms.append(word)
+    return terms
+
+def split_sentences(text: str) -> List[str]:
+    text = re.sub(r'\s+', ' ', text).strip()
+    return [s for s in SENTENCE_BOUNDARY.split(text) if len(s.split()) >= MIN_SENTENCE_WORDS]
+
+def score_sentence(sentence: str, terms: List[str]) -> float:
+    """Distinct query terms in the sentence, normalized so long sentences don't win on length."""
+    words = set(WORD.findall(sentence.lower()))
+    overlap = sum(1 for term in terms if term in words)
+    return overlap / math.sqrt(len(words)) if overlap else 0.0
+
+def _candidates(csv_results: List[Dict], pdf_results: List[Dict]) -> List[Dict]:
+    multi_document = len({r.get('metadata', {}).get('source') for r in pdf_results}) > 1
+    candidates = []
+    for result in pdf_results:
+        metadata = result.get('metadata', {})
+        citation = f"p. {metadata.get('page')}"
+        if metadata.get('page_end') not in (None, metadata.get('page')):
+            citation = f"pp. {metadata.get('page')}-{metadata.get('page_end')}"
+        if multi_document:
+            citation = f"{metadata.get('source')}, {citation}"
+        for sentence in split_sentences(result.get('text', '')):
+            candidates.append({"sentence": sentence, "citation": citation,
+                               "source_score": result.get('relevance_score') or 0.0})
+    for result in csv_results:
+        citation = f"{result.get('template_name', '')} - {result.get('field_label', '')}"
+        for sentence in split_sentences(str(result.get('instructions', ''))):
+            candidates.append({"sentence": sentence, "citation": citation,
+                               "source_score": result.get('relevance_score') or 0.0})
+    return candidates
+
+def build_extractive_answer(query: str, csv_results: List[Dict], pdf_results: List[Dict],
+                            extra_terms: Iterable[str] = (), max_chars: int = 900) -> Dict:
+    """Answer from the retrieved text alone: the sentences sharing the most query terms, cited.
+
+    Sentences are ranked by query-term overlap (ties broken by the retrieval
+    score of their source) and taken in rank order until `max_chars`.
+    """
+    terms = query_terms(query, extra_terms)
+    ranked = []
+    for candidate in _candidates(csv_results, pdf_results):
+        score = score_sentence(candidate["sentence"], terms)
+        if score > 0:
+            ranked.append((score, candidate["source_score"], candidate))
+    ranked.sort(key=lambda item: (item[0], item[1]), reverse=True)
+
+    selected, seen, length = [], set(), 0
+    for _, _, candidate in ranked:
+        key = candidate["sentence"].lower()
+        if key in seen:
+            continue
+        line = f"- {candidate['sentence']} [{candidate['citation']}]"
+        if length + len(line) > max_chars:
+            # Too long for what's left; a shorter, lower-ranked sentence may still fit
+            continue
+        seen.add(key)
+        selected.append(candidate)
+        length += len(line) + 1
+
+    if not selected:
+        return {"answer": "", "citations": [], "sentences_used": 0}
+    return {
+        "answer": "\n".join(f"- {c['sentence']} [{c['citation']}]" for c in selected),
+        "citations": list(dict.fromkeys(c["citation"] for c in selected)),
+        "sentences_used": len(selected)
+    }
@@ -0,0 +1,360 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import glob
+import json
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from data_processing.ingest_progress import IngestProgress, IngestCancelled
+from config import settings
+
+# Seconds between index-version reports from each serving process
+HEARTBEAT_SECONDS = 5.0
+# Seconds between writes of a running job's progress to the shared store
+PUBLISH_SECONDS = 1.0
+
+def heartbeat_interval() -> float:
+    return settings.index_reload_interval or HEARTBEAT_SECONDS
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _write_json(path: str, data) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+def _read_json(path: str):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+class IngestJobStore:
+    """Ingest job state shared by every worker process, as files next to the shard registry.
+
+    `<job>.json` holds the latest describe() of a job, written by the process
+    running it; `<job>.cancel` asks that process to stop; `active.lock` is held
+    by the one running job. Each serving process reports the index it has
+    loaded under `workers/<pid>.json`, so a job can tell when all have reloaded.
+    """
+
+    def __init__(self, directory: str, history: int = 20):
+        self.directory = directory
+        self.history = history
+        self.lock_path = os.path.join(directory, "active.lock")
+        self.workers_dir = os.path.join(directory, "workers")
+        os.makedirs(self.workers_dir, exist_ok=True)
+
+    def _job_path(self, job_id: str, suffix: str = ".json") -> str:
+        return os.path.join(self.directory, job_id + suffix)
+
+    def acquire(self, job_id: str) -> Optional[str]:
+        """Take the one-job lock for job_id. Returns the ID of the job holding it instead, if any."""
+        for _ in range(2):
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                owner = _read_json(self.lock_path)
+                if owner and _pid_alive(owner["pid"]):
+                    return owner["job_id"]
+                # Left behind by a process that died mid-job
+                try:
+                    os.remove(self.lock_path)
+                except OSError:
+                    pass
+                continue
+            with os.fdopen(fd, "w") as f:
+                json.dump({"job_id": job_id, "pid": os.getpid()}, f)
+            return None
+        return "unknown"
+
+    def release(self, job_id: str) -> None:
+        owner = _read_json(self.lock_path)
+        if owner and owner.get("job_id") == job_id:
+            os.remove(self.lock_path)
+
+    def save(self, job: Dict) -> None:
+        _write_json(self._job_path(job["job_id"]), job)
+
+    def load(self, job_id: str) -> Optional[Dict]:
+        if not job_id.isalnum():
+            return None
+        job = _read_json(self._job_path(job_id))
+        if job and job["status"] in ("queued", "running") and not _pid_alive(job["pid"]):
+            job.update(status="failed", error=f"Process {job['pid']} exited while running the job")
+        return job
+
+    def list(self) -> List[Dict]:
+        """Job states, newest first; only the newest `history` are kept."""
+        entries = sorted((entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")),
+                         key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in entries[self.history:]:
+            for path in (entry.path, entry.path[:-len(".json")] + ".cancel"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        jobs = (self.load(entry.name[:-len(".json")]) for entry in entries[:self.history])
+        return sorted((job for job in jobs if job), key=lambda job: job["created_at"], reverse=True)
+
+    def request_cancel(self, job_id: str) -> None:
+        open(self._job_path(job_id, ".cancel"), "w").close()
+
+    def cancel_requested(self, job_id: str) -> bool:
+        return os.path.exists(self._job_path(job_id, ".cancel"))
+
+    def report_loaded(self, fingerprint: Tuple) -> None:
+        """Record the index this process is serving (its RetrievalState fingerprint)."""
+        _write_json(os.path.join(self.workers_dir, f"{os.getpid()}.json"),
+                    {"fingerprint": fingerprint, "updated": time.time()})
+
+    def workers_behind(self, fingerprint: Tuple) -> List[int]:
+        """PIDs of live serving processes still on an index other than `fingerprint`."""
+        expected = json.loads(json.dumps(fingerprint))
+        stale_after = 3 * heartbeat_interval()
+        behind = []
+        for entry in os.scandir(self.workers_dir):
+            if not entry.name.endswith(".json"):
+                continue
+            pid = int(entry.name[:-len(".json")])
+            report = _read_json(entry.path)
+            if not _pid_alive(pid) or (report and time.time() - report["updated"] > stale_after):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+                continue
+            if report is None or report["fingerprint"] != expected:
+                behind.append(pid)
+        return behind
+
+class IngestJob:
+    """One background re-index of the PDF corpus (and optionally the CSV index).
+
+    New PDF collections are built under versioned names while the current ones
+    keep serving. Once they are complete the shard registry and chunk store are
+    swapped and `on_complete` reloads this process's agent. The old collections
+    are deleted only after every serving process reports the new index, plus a
+    grace period for queries still reading the old one. Progress is published
+    to the shared store, so any worker can report or cancel the job.
+    """
+
+    def __init__(self, shard_by: Optional[str], include_csv: bool, store: IngestJobStore,
+                 on_complete: Optional[Callable[[], None]] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.shard_by = shard_by
+        self.include_csv = include_csv
+        self.store = store
+        self.on_complete = on_complete
+        self.progress = IngestProgress()
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.retire_note: Optional[str] = None
+        self.created_at = datetime.now().isoformat()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.collections: List[str] = []
+        self.retained: List[str] = []
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"ingest-{self.id}", daemon=True)
+        self._publisher = threading.Thread(target=self._publish, name=f"ingest-{self.id}-publish", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+        self._publisher.start()
+
+    def cancel(self) -> None:
+        self.progress.cancel_requested.set()
+
+    def is_active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def _file_paths(self) -> List[str]:
+        if settings.pdf_directory:
+            return sorted(glob.glob(os.path.join(settings.pdf_directory, "*.pdf")))
+        return [settings.pdf_path]
+
+    def _publish(self) -> None:
+        """Write progress for the other workers and pick up cancellations sent to them."""
+        while not self._done.wait(PUBLISH_SECONDS):
+            if self.is_active() and self.store.cancel_requested(self.id):
+                self.cancel()
+            try:
+                self.store.save(self.describe())
+            except OSError as e:
+                print(f"Could not publish ingest job {self.id}: {e}")
+
+    def _workers_reloaded(self) -> bool:
+        """Wait until every serving process has loaded the new index; False if some never do."""
+        from retrieval_state import source_fingerprint
+        fingerprint = source_fingerprint()
+
+        def behind() -> List[int]:
+            # This process was reloaded by on_complete
+            return [pid for pid in self.store.workers_behind(fingerprint) if pid != os.getpid()]
+
+        waiting = behind()
+        if waiting and settings.index_reload_interval <= 0:
+            self.retire_note = (f"{len(waiting)} other worker(s) still serve the old index and only reload "
+                                f"with INDEX_RELOAD_INTERVAL set; old collections kept")
+            return False
+        give_up = time.monotonic() + settings.ingest_retire_timeout_seconds
+        while waiting and time.monotonic() < give_up:
+            time.sleep(heartbeat_interval())
+            waiting = behind()
+        if waiting:
+            self.retire_note = (f"Workers {waiting} did not reload within "
+                                f"{settings.ingest_retire_timeout_seconds}s; old collections kept")
+            return False
+        return True
+
+    def _retire(self, processor, old: List[str]) -> None:
+        """Delete the previous collections once nothing can be reading them.
+
+        The new index is already live, so a failure here leaves the job
+        completed, with the old collections recorded as retained.
+        """
+        # Other workers may still be serving the old collections, and queries
+        # that captured the previous state may still be reading them
+        self.progress.stage = "retiring"
+        try:
+            if self._workers_reloaded():
+                time.sleep(settings.ingest_retire_grace_seconds)
+                processor.retire_collections(old)
+                self.progress.stage = "done"
+                return
+            print(f"Ingest job {self.id}: {self.retire_note}")
+            self.progress.stage = "retire_skipped"
+        except Exception as e:
+            self.retire_note = f"Retiring old collections failed: {e}"
+            print(f"Ingest job {self.id}: {self.retire_note}\n{traceback.format_exc()}")
+            self.progress.stage = "retire_failed"
+        self.retained = old
+
+    def _run(self) -> None:
+        from data_processing.pdf_processor import PDFProcessor, load_shard_registry
+        from data_processing.csv_processor import CSVProcessor
+
+        self.status = "running"
+        self.started = time.monotonic()
+        try:
+            processor = PDFProcessor()
+            previous = list(load_shard_registry(settings.shard_registry_path))
+            file_paths = self._file_paths()
+            shard_by = self.shard_by or (settings.shard_by if settings.pdf_directory else None)
+            registry = processor.process_corpus(
+                file_paths, shard_by,
+                progress=self.progress,
+                collection_suffix=f"_v{int(time.time())}",
+                workers=settings.ingest_job_workers,
+                low_priority=True
+            )
+            self.collections = list(registry)
+
+            if self.include_csv:
+                self.progress.set_stage("csv")
+                CSVProcessor().process_csv(force_rebuild=True)
+
+            self.progress.set_stage("reloading")
+            if self.on_complete is not None:
+                self.on_complete()
+            self.status = "completed"
+
+            self._retire(processor, [name for name in previous if name not in registry])
+        except IngestCancelled:
+            self.status = "cancelled"
+            self.progress.stage = "cancelled"
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+            print(f"Ingest job {self.id} failed: {e}\n{traceback.format_exc()}")
+        finally:
+            self.finished = time.monotonic()
+            self._done.set()
+            self._publisher.join()
+            self.store.save(self.describe())
+            self.store.release(self.id)
+
+    def describe(self) -> Dict:
+        elapsed = None
+        if self.started is not None:
+            elapsed = round((self.finished or time.monotonic()) - self.started, 1)
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "pid": os.getpid(),
+            "created_at": self.created_at,
+            "elapsed_seconds": elapsed,
+            "error": self.error,
+            "collections": self.collections,
+            # Old collections left in place because not every worker reloaded
+            "retained_collections": self.retained,
+            "retire_note": self.retire_note,
+            **self.progress.snapshot()
+        }
+
+class IngestJobManager:
+    """Runs at most one ingest job at a time across all worker processes.
+
+    Jobs started here run in this process; any process can describe, list or
+    cancel them through the shared store.
+    """
+
+    def __init__(self, history: int = 20):
+        self.store = IngestJobStore(settings.ingest_job_dir, history)
+        self.jobs: Dict[str, IngestJob] = {}
+        self._lock = threading.Lock()
+
+    def start(self, shard_by: Optional[str] = None, include_csv: bool = True,
+              on_complete: Optional[Callable[[], None]] = None) -> IngestJob:
+        job = IngestJob(shard_by, include_csv, self.store, on_complete)
+        with self._lock:
+            holder = self.store.acquire(job.id)
+            if holder is not None:
+                raise RuntimeError(f"Ingest job {holder} is still running")
+            self.jobs = {job_id: running for job_id, running in self.jobs.items()
+                         if running._thread.is_alive()}
+            self.jobs[job.id] = job
+        self.store.save(job.describe())
+        job.start()
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        job = self.jobs.get(job_id)
+        return job.describe() if job is not None else self.store.load(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """Request cancellation of a job, whichever process runs it. Returns its state."""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            if job.is_active():
+                job.cancel()
+            return job.describe()
+        state = self.store.load(job_id)
+        if state is not None and state["status"] in ("queued", "running"):
+            self.store.request_cancel(job_id)
+            state["cancel_requested"] = True
+        return state
+
+    def list(self) -> List[Dict]:
+        return self.store.list()
+
+    def report_loaded(self, fingerprint: Tuple) -> None:
+        try:
+            self.store.report_loaded(fingerprint)
+        except OSError as e:
+            print(f"Could not report loaded index: {e}")
@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 import uvicorn
 from dotenv import load_dotenv
 import logging
@@ -27,6 +28,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger payloads (verbose query responses, conversation history)
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 # Try to import and include routes with better error handling
 try:
     from routes import router
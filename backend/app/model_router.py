@@ -0,0 +1,79 @@
+from typing import Dict, List
+from langchain_openai import ChatOpenAI
+from config import settings
+from upstream import upstream_caller, HedgedCaller
+
+# Tier name for answers built from the template instructions without an LLM call
+TEMPLATE_DIRECT = "template_direct"
+
+# Questions about a template's format, not requests to fill it in
+TEMPLATE_FORMAT_TERMS = ['template', 'format', 'structure', 'layout', 'instructions', 'guidelines',
+                         'what fields', 'which fields', 'what goes in', 'requirements for']
+GENERATION_TERMS = ['write', 'create', 'draft', 'generate', 'build', 'compose', 'phrase',
+                    'help me', 'fill', 'example', 'for my', 'for a soldier']
+
+class ModelRouter:
+    """Pick the model tier for a query from its strategy.
+
+    `routes` maps a strategy name (csv_only, hybrid_approach, ...) or a
+    prompt_strategy (template_focused, ...) to a tier; the strategy name wins.
+    Each tier has its own model, max_tokens and timeout, a ChatOpenAI client
+    built once, and its own HedgedCaller so a slow complex tier doesn't skew
+    the hedge delay or trip the breaker of the fast one.
+    """
+
+    def __init__(self, tiers: Dict[str, Dict], routes: Dict[str, str], default_tier: str):
+        self.tiers = tiers
+        self.routes = routes
+        self.default_tier = default_tier if default_tier in tiers else next(iter(tiers))
+        self._llms: Dict[str, ChatOpenAI] = {}
+        self.requests: Dict[str, int] = {}
+
+    def tier_for(self, strategy: Dict) -> str:
+        for key in (strategy.get('strategy'), strategy.get('prompt_strategy')):
+            tier = self.routes.get(key)
+            if tier in self.tiers:
+                return tier
+        return self.default_tier
+
+    def is_template_lookup(self, query: str, strategy: Dict, csv_results: List[Dict]) -> bool:
+        """A pure template-format question the template instructions answer as-is."""
+        if not settings.template_direct_answers or not csv_results:
+            return False
+        if strategy.get('strategy') != 'csv_only':
+            return False
+        query_lower = query.lower()
+        return (any(term in query_lower for term in TEMPLATE_FORMAT_TERMS)
+                and not any(term in query_lower for term in GENERATION_TERMS))
+
+    def route(self, query: str, strategy: Dict, csv_results: List[Dict]) -> str:
+        tier = TEMPLATE_DIRECT if self.is_template_lookup(query, strategy, csv_results) else self.tier_for(strategy)
+        self.requests[tier] = self.requests.get(tier, 0) + 1
+        return tier
+
+    def llm_for(self, tier: str) -> ChatOpenAI:
+        if tier not in self._llms:
+            config = self.tiers[tier]
+            self._llms[tier] = ChatOpenAI(
+                api_key=settings.openai_api_key,
+                model=config.get("model", "gpt-3.5-turbo"),
+                temperature=config.get("temperature", 0.1),
+                max_tokens=config.get("max_tokens"),
+                timeout=config.get("timeout", settings.llm_deadline)
+            )
+        return self._llms[tier]
+
+    def caller_for(self, tier: str) -> HedgedCaller:
+        config = self.tiers[tier]
+        return upstream_caller(
+            f"llm:{tier}",
+            deadline=config.get("timeout", settings.llm_deadline),
+            hedge_percentile=config.get("hedge_percentile", settings.llm_hedge_percentile)
+        )
+
+    def stats(self) -> Dict:
+        return {
+            "requests_by_tier": dict(self.requests),
+            "tiers": {name: {key: config.get(key) for key in ("model", "max_tokens", "timeout")}
+                      for name, config in self.tiers.items()}
+        }
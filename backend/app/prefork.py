@@ -0,0 +1,155 @@
+"""Production entry point: build the agent once, then fork workers that share it.
+
+The master process loads everything the agent only reads at query time (term
+matcher, CSV index, chunk store, projections) and then forks N uvicorn workers
+on one listening socket. The workers share those pages copy-on-write instead
+of each building a copy. gc.freeze() moves the loaded objects out of the
+collector's reach, so collections in the workers don't write to (and
+un-share) them.
+
+The Chroma client is not shared. With CHROMA_MODE=persistent each worker
+opens its own client after the fork (a SQLite connection must not cross a
+fork), so each loads its own HNSW segments; with CHROMA_MODE=http the
+workers drop the inherited pooled connections and reconnect to the server,
+which holds the only copy of the index.
+
+    python app/prefork.py --workers 4
+
+A hot reload (POST /api/admin/reload) rebuilds the state inside the worker
+that receives it, and that copy is no longer shared; restart the master to
+share a new index again.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import gc
+import logging
+import signal
+import socket
+import time
+from typing import Dict
+import uvicorn
+from dotenv import load_dotenv
+from process_memory import memory_usage
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("prefork")
+
+def open_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def run_worker(app, sock: socket.socket, log_level: str) -> None:
+    """Child process: serve on the inherited socket until told to stop."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    gc.enable()
+    import routes
+    routes.reopen_after_fork()
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+    server.run(sockets=[sock])
+
+def spawn_worker(app, sock: socket.socket, log_level: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(app, sock, log_level)
+        finally:
+            os._exit(0)
+    return pid
+
+def log_memory(master_pid: int, workers: Dict[int, int]) -> None:
+    master = memory_usage(master_pid)
+    if master is None:
+        logger.info("Memory report unavailable (needs /proc/<pid>/smaps_rollup)")
+        return
+    logger.info(f"master pid={master_pid} rss={master['rss_mb']}MB unique={master['unique_mb']}MB")
+    for pid, index in sorted(workers.items(), key=lambda item: item[1]):
+        usage = memory_usage(pid)
+        if usage:
+            logger.info(f"worker {index} pid={pid} rss={usage['rss_mb']}MB pss={usage['pss_mb']}MB "
+                        f"unique={usage['unique_mb']}MB shared={usage['shared_mb']}MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork server sharing the agent's indexes copy-on-write")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "4")))
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--memory-report-interval", type=float, default=60,
+                        help="seconds between per-worker memory reports (0 disables)")
+    args = parser.parse_args()
+
+    # No collections while loading, so the heap isn't churned before it is frozen
+    gc.disable()
+    import main as app_module
+    import routes
+
+    logger.info("Building agent in master process...")
+    success, errors = routes.initialize_agent()
+    if not success:
+        for error in errors:
+            logger.error(f"  - {error}")
+        return 1
+    gc.collect()
+    gc.freeze()
+
+    sock = open_socket(args.host, args.port)
+    master_pid = os.getpid()
+    workers: Dict[int, int] = {}
+    for index in range(args.workers):
+        workers[spawn_worker(app_module.app, sock, args.log_level)] = index
+    logger.info(f"Serving on {args.host}:{args.port} with {args.workers} workers")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    next_report = time.monotonic() + 5
+    while not stopping:
+        time.sleep(0.5)
+        # Replace workers that died; the new fork shares the same frozen heap
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            index = workers.pop(pid, None)
+            if index is not None and not stopping:
+                logger.warning(f"worker {index} (pid {pid}) exited with status {status}; restarting")
+                workers[spawn_worker(app_module.app, sock, args.log_level)] = index
+        if args.memory_report_interval > 0 and time.monotonic() >= next_report:
+            log_memory(master_pid, workers)
+            next_report = time.monotonic() + args.memory_report_interval
+
+    logger.info("Stopping workers...")
+    for pid in workers:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in list(workers):
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+    sock.close()
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
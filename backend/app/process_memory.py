@@ -0,0 +1,27 @@
+from typing import Dict, Optional
+
+def memory_usage(pid: int) -> Optional[Dict[str, float]]:
+    """RSS, PSS, unique (private) and shared memory of a process, in MB.
+
+    Read from /proc/<pid>/smaps_rollup, so Linux only; returns None elsewhere
+    or if the process is gone. Unique RSS is what a worker costs on top of the
+    pages it shares copy-on-write with the master.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+    except OSError:
+        return None
+
+    unique = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    shared = fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)
+    return {
+        "rss_mb": round(fields.get("Rss", 0) / 1024, 1),
+        "pss_mb": round(fields.get("Pss", 0) / 1024, 1),
+        "unique_mb": round(unique / 1024, 1),
+        "shared_mb": round(shared / 1024, 1)
+    }
@@ -0,0 +1,230 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from typing import List, Dict, Tuple, FrozenSet
+from collections import Counter
+from functools import lru_cache
+import copy
+import re
+from query_rules import HYBRID_BONUSES, SECTION_KEYWORDS
+
+# Scoring for each indicator type: (points per match, cap), in the order they are summed
+INDICATOR_SCORING = [
+    ('primary_indicators', 0.3, 1.0),
+    ('secondary_indicators', 0.2, 0.6),
+    ('form_indicators', 0.15, 0.4),
+    ('knowledge_indicators', 0.15, 0.4),
+    ('context_indicators', 0.15, 0.4),
+    ('complexity_indicators', 0.15, 0.4),
+    ('ambiguous_indicators', 0.15, 0.4),
+    ('vague_indicators', 0.15, 0.4),
+    ('formatting_indicators', 0.25, 0.5),
+    ('format_knowledge_indicators', 0.25, 0.5),
+    ('document_type_indicators', 0.3, 0.6),
+    ('hybrid_keywords', 0.25, 0.5)
+]
+
+class QueryAnalyzer:
+    """Intent analysis and strategy selection compiled from the rule tables.
+
+    Each query is scanned once against the combined vocabulary; intent scores
+    and strategy conditions are then evaluated as set operations over the
+    matched terms. Results are memoized per lowercased query in bounded LRU caches.
+    """
+
+    def __init__(self, military_terms: Dict[str, str], intent_patterns: Dict[str, Dict],
+                 strategy_rules: Dict[str, Dict], cache_size: int = 1024):
+        self.military_terms = military_terms
+        self.intent_patterns = intent_patterns
+        self.strategy_rules = strategy_rules
+
+        self._term_patterns = [
+            (term, re.compile(r'\b' + re.escape(term) + r'\b'), f"{term} ({definition})")
+            for term, definition in military_terms.items()
+        ]
+        self._military_term_list = list(military_terms.keys())
+        self._compiled_intents = self._compile_intents(intent_patterns)
+        self._compiled_bonuses = [
+            (bonus, frozenset(first), frozenset(second)) for bonus, first, second in HYBRID_BONUSES
+        ]
+        self._compiled_strategies = self._compile_strategies(strategy_rules)
+        self.vocabulary = self._build_vocabulary()
+
+        self._match_cached = lru_cache(maxsize=cache_size)(self._match_terms)
+        self._intent_cached = lru_cache(maxsize=cache_size)(self._analyze_intent)
+        self._strategy_cached = lru_cache(maxsize=cache_size)(self._determine_strategy)
+
+    def _compile_intents(self, intent_patterns: Dict[str, Dict]) -> List[Tuple]:
+        compiled = []
+        for intent_type, patterns in intent_patterns.items():
+            indicator_groups = []
+            for indicator_type, per_match, cap in INDICATOR_SCORING:
+                if indicator_type in patterns:
+                    # Keep multiplicity: a term listed twice counts twice, as it always has
+                    indicator_groups.append((Counter(patterns[indicator_type]), per_match, cap))
+            compiled.append((intent_type, patterns['weight'], indicator_groups))
+        return compiled
+
+    def _compile_strategies(self, strategy_rules: Dict[str, Dict]) -> List[Tuple]:
+        compiled = []
+        for strategy_name, config in strategy_rules.items():
+            conditions = []
+            for condition_name, rule in config['conditions']:
+                conditions.append((condition_name, {
+                    'any_of': [frozenset(group) for group in rule.get('any_of', [])],
+                    'none_of': frozenset(rule.get('none_of', [])),
+                    'starts_with': tuple(rule.get('starts_with', ())),
+                    'max_words': rule.get('max_words'),
+                    'min_scores': rule.get('min_scores', {}),
+                    'below_scores': rule.get('below_scores', {})
+                }))
+            compiled.append((strategy_name, conditions, config.get('confidence_boost', 0.0)))
+        return compiled
+
+    def _build_vocabulary(self) -> FrozenSet[str]:
+        vocabulary = set(self._military_term_list)
+        vocabulary.update(SECTION_KEYWORDS)
+        for _, _, indicator_groups in self._compiled_intents:
+            for terms, _, _ in indicator_groups:
+                vocabulary.update(terms)
+        for _, first, second in self._compiled_bonuses:
+            vocabulary.update(first | second)
+        for _, conditions, _ in self._compiled_strategies:
+            for _, rule in conditions:
+                vocabulary.update(rule['none_of'])
+                for group in rule['any_of']:
+                    vocabulary.update(group)
+        return frozenset(vocabulary)
+
+    def _match_terms(self, query_lower: str) -> FrozenSet[str]:
+        """The one substring scan per query; everything else reads this set."""
+        return frozenset(term for term in self.vocabulary if term in query_lower)
+
+    def expand_military_terms(self, query: str) -> str:
+        """Expand military terminology and acronyms for better understanding."""
+        expanded_query = query.lower()
+        for term, pattern, expansion in self._term_patterns:
+            # Substring check first: skips the regex for the vast majority of terms
+            if term in expanded_query and pattern.search(expanded_query):
+                expanded_query = pattern.sub(expansion, expanded_query)
+        return expanded_query
+
+    def _analyze_intent(self, query_lower: str) -> Dict[str, any]:
+        matched = self._match_cached(query_lower)
+        military_terms_found = [term for term in self._military_term_list if term in matched]
+        military_bonus = min(len(military_terms_found) * 0.1, 0.3)
+
+        intent_scores = {}
+        for intent_type, weight, indicator_groups in self._compiled_intents:
+            score = 0.0
+            for terms, per_match, cap in indicator_groups:
+                matches = sum(terms[term] for term in matched.intersection(terms))
+                if matches > 0:
+                    score += min(matches * per_match, cap) * weight
+
+            score += military_bonus
+
+            if intent_type == 'hybrid_request':
+                hybrid_bonus = 0
+                for bonus, first, second in self._compiled_bonuses:
+                    if not matched.isdisjoint(first) and not matched.isdisjoint(second):
+                        hybrid_bonus = hybrid_bonus + bonus
+                score += hybrid_bonus
+
+            intent_scores[intent_type] = min(score, 1.0)
+
+        primary_intent = max(intent_scores.items(), key=lambda x: x[1])
+
+        sorted_scores = sorted(intent_scores.values(), reverse=True)
+        if len(sorted_scores) > 1:
+            confidence = "high" if sorted_scores[0] - sorted_scores[1] >= 0.2 else "medium" if sorted_scores[0] >= 0.4 else "low"
+        else:
+            confidence = "high" if sorted_scores[0] >= 0.6 else "medium" if sorted_scores[0] >= 0.4 else "low"
+
+        return {
+            'primary_intent': primary_intent[0],
+            'intent_scores': intent_scores,
+            'confidence': confidence,
+            'expanded_query': self.expand_military_terms(query_lower),
+            'military_terms_found': military_terms_found
+        }
+
+    def _condition_met(self, rule: Dict, query_lower: str, matched: FrozenSet[str], scores: Dict[str, float]) -> bool:
+        for intent, threshold in rule['min_scores'].items():
+            if scores.get(intent, 0) < threshold:
+                return False
+        for intent, threshold in rule['below_scores'].items():
+            if scores.get(intent, 0) >= threshold:
+                return False
+        if any(matched.isdisjoint(group) for group in rule['any_of']):
+            return False
+        if not matched.isdisjoint(rule['none_of']):
+            return False
+        if rule['starts_with'] and not query_lower.startswith(rule['starts_with']):
+            return False
+        if rule['max_words'] is not None and len(query_lower.split()) > rule['max_words']:
+            return False
+        return True
+
+    def _determine_strategy(self, query_lower: str, score_items: Tuple) -> Dict[str, any]:
+        matched = self._match_cached(query_lower)
+        scores = dict(score_items)
+
+        strategy_scores = {}
+        reasoning_steps = []
+
+        for strategy_name, conditions, confidence_boost in self._compiled_strategies:
+            score = 0.0
+            conditions_met = []
+            for condition_name, rule in conditions:
+                if self._condition_met(rule, query_lower, matched, scores):
+                    score += 0.25
+                    conditions_met.append(condition_name)
+
+            if score > 0:
+                score += confidence_boost
+
+            strategy_scores[strategy_name] = min(score, 1.0)
+
+            if conditions_met:
+                reasoning_steps.append(f"{strategy_name}: {len(conditions_met)} conditions met - {', '.join(conditions_met)}")
+
+        primary_strategy = max(strategy_scores.items(), key=lambda x: x[1])
+        config = self.strategy_rules[primary_strategy[0]]
+
+        return {
+            'strategy': primary_strategy[0],
+            'strategy_confidence': primary_strategy[1],
+            'primary_tool': config['tools']['primary'],
+            'secondary_tool': config['tools']['secondary'],
+            'strategy_scores': strategy_scores,
+            'reasoning_steps': reasoning_steps,
+            'prompt_strategy': config['prompt_strategy']
+        }
+
+    def detect_sections(self, query: str) -> List[str]:
+        """Title phrases of manual chapters/sections the query is specifically about."""
+        matched = self._match_cached(query.lower())
+        phrases = []
+        for keyword, phrase in SECTION_KEYWORDS.items():
+            if keyword in matched and phrase not in phrases:
+                phrases.append(phrase)
+        return phrases
+
+    def analyze_intent(self, query: str) -> Dict[str, any]:
+        """Memoized intent analysis; callers get their own copy to mutate."""
+        return copy.deepcopy(self._intent_cached(query.lower()))
+
+    def determine_strategy(self, query: str, intent_analysis: Dict) -> Dict[str, any]:
+        """Memoized strategy selection for a query and its intent scores."""
+        score_items = tuple(intent_analysis['intent_scores'].items())
+        return copy.deepcopy(self._strategy_cached(query.lower(), score_items))
+
+    def cache_info(self) -> Dict[str, Dict]:
+        return {
+            name: cached.cache_info()._asdict()
+            for name, cached in (('terms', self._match_cached),
+                                 ('intent', self._intent_cached),
+                                 ('strategy', self._strategy_cached))
+        }
@@ -0,0 +1,280 @@
+# Declarative vocabulary and rule tables for intent analysis and tool strategy.
+# All term matching is substring matching against the lowercased query, so
+# phrases ('based on', 'what goes in') and single words share one vocabulary
+# that QueryAnalyzer matches in a single pass.
+
+MILITARY_TERMS = {
+    # Army units and structures
+    'squad': 'small military unit typically consisting of 9-13 soldiers',
+    'platoon': 'military unit typically consisting of 16-44 soldiers, usually 2-4 squads',
+    'company': 'military unit typically consisting of 80-250 soldiers, usually 3-5 platoons',
+    'battalion': 'military unit typically consisting of 300-1000 soldiers, usually 3-5 companies',
+    'brigade': 'military unit typically consisting of 1500-3200 soldiers, usually 3-5 battalions',
+    'division': 'military unit typically consisting of 10000-20000 soldiers, usually 3-4 brigades',
+
+    # Military processes and procedures
+    'mdmp': 'Military Decision Making Process - systematic approach to problem solving and planning',
+    'troop leading procedures': 'TLP - eight-step process used by small unit leaders to plan and prepare for operations',
+    'mett-tc': 'Mission, Enemy, Terrain and weather, Troops and support available, Time available, Civil considerations',
+    'sop': 'Standard Operating Procedure - set of step-by-step instructions',
+    'conop': 'Concept of Operations - verbal or graphic statement that clearly and concisely expresses what the commander intends to accomplish',
+    'frago': 'Fragmentary Order - abbreviated form of an operation order issued as needed to change or modify a previous order',
+    'fragord': 'Fragmentary Order - abbreviated form of an operation order issued as needed to change or modify a previous order',
+    'opord': 'Operation Order - directive issued by a commander to coordinate the execution of an operation',
+    'warnord': 'Warning Order - preliminary notice of an order or action which is to follow',
+
+    # Staff positions and roles
+    's1': 'Personnel Staff Officer - responsible for personnel management, administration, and sustainment',
+    's2': 'Intelligence Staff Officer - responsible for intelligence collection, analysis, and dissemination',
+    's3': 'Operations Staff Officer - responsible for operations, training, and security',
+    's4': 'Logistics Staff Officer - responsible for supply, maintenance, transportation, and services',
+    's5': 'Plans Staff Officer - responsible for planning and civil affairs operations',
+    's6': 'Signal Staff Officer - responsible for communications and information systems',
+    's7': 'Information Operations Staff Officer - responsible for information operations and cyber',
+    's8': 'Finance Staff Officer - responsible for financial management and resource management',
+    's9': 'Civil Affairs Staff Officer - responsible for civil affairs operations and coordination',
+
+    # Training and evaluation
+    'acft': 'Army Combat Fitness Test - physical fitness assessment consisting of six events',
+    'apft': 'Army Physical Fitness Test - legacy physical fitness test with push-ups, sit-ups, and 2-mile run',
+    'ntc': 'National Training Center - premier combat training center located at Fort Irwin, California',
+    'jrtc': 'Joint Readiness Training Center - combat training center located at Fort Johnson, Louisiana',
+    'ctc': 'Combat Training Center - facility that provides realistic training environments',
+    'jmrc': 'Joint Multinational Readiness Center - combat training center located in Germany',
+
+    # Awards and decorations
+    'aam': 'Army Achievement Medal - decoration for meritorious service or achievement',
+    'arcom': 'Army Commendation Medal - decoration for sustained acts of heroism or meritorious service',
+    'msm': 'Meritorious Service Medal - decoration for outstanding meritorious achievement or service',
+    'bsm': 'Bronze Star Medal - decoration for heroic or meritorious achievement or service',
+    'purple heart': 'decoration awarded to members wounded or killed in action',
+
+    # Forms and documents
+    'da638': 'DA Form 638 - Recommendation for Award form',
+    'da31': 'DA Form 31 - Request and Authority for Leave and Earnings Statement',
+    'da4856': 'DA Form 4856 - Developmental Counseling Form',
+    'da2062': 'DA Form 2062 - Hand Receipt/Annex Number',
+    'ncoer': 'Non-Commissioned Officer Evaluation Report - performance evaluation for NCOs',
+    'oer': 'Officer Evaluation Report - performance evaluation for officers',
+
+    # Combat and tactical terms
+    'coa': 'Course of Action - sequence of actions that a commander may follow',
+    'ccir': 'Commander\'s Critical Information Requirements - information requirements identified by the commander',
+    'pir': 'Priority Intelligence Requirements - intelligence requirements associated with a decision',
+    'oir': 'Other Intelligence Requirements - intelligence requirements not associated with a specific decision',
+    'isr': 'Intelligence, Surveillance, and Reconnaissance - activities that synchronize sensors, assets, and processing',
+    'bda': 'Battle Damage Assessment - evaluation of damage resulting from the application of military force',
+    'sitrep': 'Situation Report - report providing information on the current tactical situation',
+    'spot report': 'SPOTREP - concise narrative report of essential information covering events or conditions',
+
+    # Leadership and development
+    'nco': 'Non-Commissioned Officer - enlisted soldier in a position of authority',
+    'snco': 'Senior Non-Commissioned Officer - NCO in grades E-7 through E-9',
+    'ncopd': 'Non-Commissioned Officer Professional Development - structured development program',
+    'ocs': 'Officer Candidate School - program to train enlisted soldiers to become officers',
+    'wocs': 'Warrant Officer Candidate School - program to train soldiers to become warrant officers',
+
+    # Logistics and supply
+    'supply': 'provision of personnel, material, and other items required to sustain military operations',
+    'maintenance': 'actions taken to keep equipment in serviceable condition',
+    'transportation': 'movement of personnel, equipment, and supplies',
+    'sustainment': 'provision of logistics and personnel services necessary to maintain operations',
+    'class i': 'subsistence supplies including food and water',
+    'class ii': 'general supplies including clothing, individual equipment, and administrative supplies',
+    'class iii': 'petroleum, oils, and lubricants',
+    'class iv': 'construction and barrier materials',
+    'class v': 'ammunition and explosives',
+    'class vi': 'personal demand items including food, beverages, and sundries',
+    'class vii': 'major end items including vehicles, weapons systems, and equipment',
+    'class viii': 'medical supplies and equipment',
+    'class ix': 'repair parts and components',
+    'class x': 'material to support nonmilitary programs',
+
+    # Military document components and formatting terms
+    'mission statement': 'concise statement of the task and purpose that defines what the unit must accomplish',
+    'execution': 'section of an OPORD that describes how the commander intends to accomplish the mission',
+    'scheme of maneuver': 'description of how the commander envisions the operation unfolding',
+    'concept of support': 'description of how supporting elements will enable the mission',
+    'tasks to subordinate units': 'specific missions assigned to subordinate elements',
+    'command and signal': 'information about command relationships and communications',
+    'coordinating instructions': 'instructions that apply to two or more units',
+    'scheme of fires': 'description of how fires support the maneuver plan',
+    'annex': 'appendix to an operation order providing detailed information on specific topics',
+    'commanders intent': 'clear, concise statement of what the force must do and the conditions the force must establish',
+    'end state': 'desired political and military conditions that define achievement of the commanders objectives'
+}
+
+INTENT_PATTERNS = {
+    'document_generation': {
+        'primary_indicators': [
+            'write', 'create', 'generate', 'draft', 'compose', 'prepare', 'develop',
+            'build', 'construct', 'formulate', 'make', 'produce', 'design', 'develop'
+        ],
+        'secondary_indicators': [
+            'bullet', 'award', 'citation', 'evaluation', 'report', 'memo', 'letter',
+            'recommendation', 'assessment', 'paragraph', 'statement', 'summary',
+            'section', 'annex', 'order', 'brief', 'briefing'
+        ],
+        'form_indicators': [
+            'da638', 'da31', 'da4856', 'ncoer', 'oer', 'form', 'template',
+            'opord', 'frago', 'fragord', 'conop', 'sitrep', 'spot report'
+        ],
+        'formatting_indicators': [
+            'phrase', 'format', 'structure', 'section', 'organize', 'layout',
+            'arrange', 'word', 'language', 'tone', 'style', 'presentation',
+            'phrasing', 'wording', 'formatting', 'organization'
+        ],
+        'weight': 0.8
+    },
+    'information_retrieval': {
+        'primary_indicators': [
+            'what', 'how', 'when', 'where', 'why', 'who', 'explain', 'describe',
+            'tell', 'show', 'list', 'identify', 'define', 'clarify', 'include'
+        ],
+        'secondary_indicators': [
+            'role', 'responsibility', 'duty', 'process', 'procedure', 'step',
+            'requirement', 'regulation', 'standard', 'guideline', 'policy',
+            'components', 'elements', 'parts', 'contains', 'consists'
+        ],
+        'knowledge_indicators': [
+            'during', 'in', 'for', 'about', 'regarding', 'concerning', 'involving',
+            'within', 'inside', 'part of', 'component of'
+        ],
+        'weight': 0.7
+    },
+    'hybrid_request': {
+        'primary_indicators': [
+            'using', 'based on', 'according to', 'following', 'incorporating',
+            'with', 'including', 'considering', 'leveraging', 'per', 'via'
+        ],
+        'context_indicators': [
+            'situation', 'mission', 'operation', 'training', 'deployment',
+            'exercise', 'scenario', 'environment', 'context', 'for a', 'for an'
+        ],
+        'complexity_indicators': [
+            'comprehensive', 'detailed', 'thorough', 'complete', 'full',
+            'extensive', 'in-depth', 'elaborate', 'proper', 'correct'
+        ],
+        'format_knowledge_indicators': [
+            'phrase', 'format', 'structure', 'section', 'how to write',
+            'how to phrase', 'what to include', 'how to organize',
+            'should include', 'should contain', 'goes in', 'belongs in'
+        ],
+        'document_type_indicators': [
+            'coa statement', 'opord', 'frago', 'fragord', 'conop', 'sitrep', 'spot report',
+            'evaluation', 'assessment', 'briefing', 'estimate', 'annex', 'appendix',
+            'mission statement', 'execution section', 'scheme of maneuver',
+            'concept of support', 'command and signal', 'coordinating instructions'
+        ],
+        'hybrid_keywords': [
+            'write the', 'draft the', 'create a', 'build a', 'generate the',
+            'list what', 'what goes in', 'what should be in', 'how do i',
+            'what to put in', 'what belongs in', 'components of', 'elements of'
+        ],
+        'weight': 0.9
+    },
+    'clarification_needed': {
+        'ambiguous_indicators': [
+            'help', 'assist', 'support', 'need', 'want', 'looking for',
+            'guidance', 'advice', 'direction', 'suggestions'
+        ],
+        'vague_indicators': [
+            'something', 'anything', 'stuff', 'things', 'this', 'that',
+            'it', 'general', 'basic', 'simple'
+        ],
+        'weight': 0.3
+    }
+}
+
+# Score bonuses applied to hybrid_request: (bonus, terms, terms) -> bonus if both groups match
+HYBRID_BONUSES = [
+    (0.3, ['write', 'draft', 'create', 'build', 'generate'], ['opord', 'coa', 'frago', 'fragord', 'annex']),
+    (0.2, ['section', 'paragraph', 'part', 'component'], ['what', 'how', 'include', 'goes in']),
+    (0.25, ['phrase', 'format', 'structure'], ['statement', 'section', 'paragraph'])
+]
+
+# Query phrases that point at one part of the manual -> phrase to look for in
+# chapter/section titles read from the PDF outline (hyphens treated as spaces)
+SECTION_KEYWORDS = {
+    'mdmp': 'military decision making process',
+    'military decision making process': 'military decision making process',
+    'military decision-making process': 'military decision making process',
+    'rehearsal': 'rehearsal',
+    'running estimate': 'running estimate',
+    'troop leading procedures': 'troop leading procedures',
+    'tlp': 'troop leading procedures',
+    'army design methodology': 'army design methodology',
+    'operation order': 'orders',
+    'opord': 'orders',
+    'warnord': 'orders',
+    'frago': 'orders',
+    'fragord': 'orders',
+    'assessment plan': 'assessment',
+    'rapid decision': 'rapid decision',
+    'rdsp': 'rapid decision',
+    'planning horizon': 'planning',
+    'integrating processes': 'integrating processes',
+    'ipb': 'intelligence preparation'
+}
+
+# Strategy conditions, evaluated in order; each met condition adds 0.25.
+#   Query conditions, over the vocabulary matched in the lowercased query:
+#     'any_of'      - list of term groups, each needing at least one match
+#     'none_of'     - terms that must not match
+#     'starts_with' - query must start with one of these
+#     'max_words'   - query must have at most this many words
+#   Score conditions, over intent scores:
+#     'min_scores'   - {intent: threshold}, score >= threshold
+#     'below_scores' - {intent: threshold}, score < threshold
+#
+# The lambda matrix this replaces also declared 'balanced_generation_retrieval',
+# 'insufficient_context' and 'conflicting_signals'. They were dispatched with the
+# query string instead of the scores and always raised, so they never fired;
+# they are left out here to keep strategy decisions unchanged.
+STRATEGY_RULES = {
+    'csv_only': {
+        'conditions': [
+            ('document_generation_high', {'min_scores': {'document_generation': 0.7}, 'below_scores': {'information_retrieval': 0.3}}),
+            ('form_specific', {'any_of': [['da638', 'da31', 'da4856', 'ncoer', 'oer']], 'none_of': ['what', 'how', 'explain', 'describe']}),
+            ('template_only', {'any_of': [['template', 'format only', 'structure only']], 'none_of': ['doctrine', 'definition', 'explain']}),
+            ('formatting_focus', {'any_of': [['format', 'structure', 'layout']], 'none_of': ['opord', 'coa', 'frago', 'annex']})
+        ],
+        'confidence_boost': 0.1,
+        'prompt_strategy': 'template_focused',
+        'tools': {'primary': 'csv', 'secondary': None}
+    },
+    'pdf_only': {
+        'conditions': [
+            ('information_retrieval_high', {'min_scores': {'information_retrieval': 0.6}, 'below_scores': {'document_generation': 0.3}}),
+            ('knowledge_query', {'any_of': [['what is', 'explain', 'describe', 'definition of', 'role of']], 'none_of': ['write', 'create', 'draft', 'format']}),
+            ('doctrinal_only', {'any_of': [['doctrine', 'regulation', 'manual', 'publication']], 'none_of': ['write', 'create', 'draft']}),
+            ('pure_knowledge', {'starts_with': ('what is', 'explain', 'describe', 'define'), 'none_of': ['section', 'paragraph', 'write', 'create']})
+        ],
+        'confidence_boost': 0.1,
+        'prompt_strategy': 'knowledge_focused',
+        'tools': {'primary': 'pdf', 'secondary': None}
+    },
+    'hybrid_approach': {
+        'conditions': [
+            ('hybrid_request_high', {'min_scores': {'hybrid_request': 0.4}}),
+            ('document_plus_knowledge', {'any_of': [['opord', 'coa', 'frago', 'fragord', 'annex', 'sitrep'], ['write', 'create', 'draft', 'build', 'generate']]}),
+            ('section_writing', {'any_of': [['section', 'paragraph', 'part'], ['write', 'create', 'draft', 'phrase']]}),
+            ('formatting_with_content', {'any_of': [['phrase', 'format', 'structure', 'include', 'goes in'], ['opord', 'coa', 'frago', 'annex', 'statement']]}),
+            ('what_should_include', {'any_of': [['what should', 'what to include', 'what goes in', 'how do i', 'list what']]}),
+            ('write_with_doctrine', {'any_of': [['write', 'draft', 'create', 'build'], ['mission statement', 'execution', 'scheme of maneuver', 'concept of support', 'command and signal']]}),
+            ('military_document_creation', {'any_of': [['opord', 'coa', 'frago', 'fragord', 'annex', 'sitrep', 'conop'], ['write', 'create', 'draft', 'build', 'generate', 'phrase', 'format']]})
+        ],
+        'confidence_boost': 0.4,
+        'prompt_strategy': 'hybrid_reasoning',
+        'tools': {'primary': 'csv', 'secondary': 'pdf'}
+    },
+    'clarification_required': {
+        'conditions': [
+            ('ambiguous_high', {'min_scores': {'clarification_needed': 0.6}}),
+            ('very_short_query', {'max_words': 3, 'none_of': ['opord', 'coa', 'frago']})
+        ],
+        'confidence_boost': 0.0,
+        'prompt_strategy': 'clarification',
+        'tools': {'primary': 'clarification', 'secondary': None}
+    }
+}
@@ -0,0 +1,48 @@
+import math
+import time
+from typing import Dict, List, Optional
+
+class RequestDeadline:
+    """End-to-end latency budget for one query, and the degradations it forced.
+
+    Created when the request arrives (so queueing counts against it) and passed
+    through retrieval and generation. Stages ask `below(seconds)` before doing
+    optional work and record what they skipped with `degrade()`. A deadline
+    with no budget never runs low.
+    """
+
+    def __init__(self, budget_seconds: Optional[float] = None):
+        self.budget = budget_seconds
+        self.started = time.monotonic()
+        self.degradations: List[str] = []
+
+    def remaining(self) -> float:
+        if self.budget is None:
+            return math.inf
+        return self.budget - (time.monotonic() - self.started)
+
+    def below(self, seconds: float) -> bool:
+        return self.remaining() < seconds
+
+    def tier(self, thresholds: List[float]) -> Optional[int]:
+        """How many of the degradation thresholds the remaining budget is under (None without a budget).
+
+        Requests in the same tier would degrade the same way right now.
+        """
+        if self.budget is None:
+            return None
+        remaining = self.remaining()
+        return sum(1 for seconds in thresholds if remaining < seconds)
+
+    def degrade(self, name: str) -> None:
+        if name not in self.degradations:
+            self.degradations.append(name)
+
+    def summary(self) -> Optional[Dict]:
+        if self.budget is None:
+            return None
+        return {
+            "budget_ms": round(self.budget * 1000),
+            "remaining_ms": round(max(0.0, self.remaining()) * 1000),
+            "degradations": list(self.degradations)
+        }
@@ -0,0 +1,216 @@
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Client-supplied request IDs are used as file names
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9_\-]{1,64}$')
+MAX_STACK_DEPTH = 64
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class StackSampler:
+    """Wall-clock sampling profiler for one thread.
+
+    A daemon thread reads the target thread's stack every `interval` seconds
+    and counts each distinct stack, root first. Frames at and above `root`
+    (the profiling wrapper and the thread pool) are left out. Sampling stops
+    after `max_seconds` even if the call is still running, which bounds the
+    cost of a stuck request.
+    """
+
+    def __init__(self, thread_id: int, root, interval: float, max_seconds: float):
+        self.thread_id = thread_id
+        self.root = root
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.sampler_cpu = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _sample(self) -> None:
+        frame = sys._current_frames().get(self.thread_id)
+        labels = []
+        while frame is not None and frame is not self.root and len(labels) < MAX_STACK_DEPTH:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        if labels:
+            self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def _run(self) -> None:
+        cpu_start = time.thread_time()
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            self._sample()
+        self.sampler_cpu = time.thread_time() - cpu_start
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self) -> str:
+        """Stacks in the folded format read by flamegraph.pl, speedscope and inferno."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+class RequestProfiler:
+    """Opt-in per-request profiles, stored as folded-stack files by request ID.
+
+    A request is profiled when it asks to be (the caller checks the admin
+    token) or falls in the random `sample_rate`. At most `max_concurrent`
+    requests are profiled at once; others run unprofiled. Only the newest
+    `retain` profiles are kept on disk.
+    """
+
+    def __init__(self, directory: str, sample_rate: float = 0.0, interval: float = 0.01,
+                 max_seconds: float = 60.0, max_concurrent: int = 2, retain: int = 200):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.max_concurrent = max_concurrent
+        self.retain = retain
+        self.active = 0
+        self.profiled = 0
+        self.skipped_busy = 0
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def _claim_id(self, requested: Optional[str]) -> str:
+        """The client's X-Request-Id when it's a usable file name and not taken yet.
+
+        A reused ID gets a random suffix, so it never overwrites an earlier
+        profile (or one still being recorded). Called with the lock held.
+        """
+        if not requested or not REQUEST_ID_PATTERN.match(requested):
+            profile_id = uuid.uuid4().hex[:16]
+        elif requested in self._in_flight or os.path.exists(self._paths(requested)[1]):
+            profile_id = f"{requested[:55]}-{uuid.uuid4().hex[:8]}"
+        else:
+            profile_id = requested
+        self._in_flight.add(profile_id)
+        return profile_id
+
+    def should_profile(self, requested: bool) -> bool:
+        """Whether a request asked to be profiled or falls in the sample."""
+        return requested or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def run(self, requested_id: Optional[str], label: str, func: Callable, *args, **kwargs) -> Tuple[Any, Optional[str]]:
+        """Call func(*args, **kwargs) in this thread under the sampler and save the profile.
+
+        Returns (result, profile ID); the ID is None when max_concurrent
+        profiles were already running and the call went ahead unprofiled.
+        """
+        with self._lock:
+            busy = self.active >= self.max_concurrent
+            if busy:
+                self.skipped_busy += 1
+            else:
+                self.active += 1
+                request_id = self._claim_id(requested_id)
+        if busy:
+            return func(*args, **kwargs), None
+
+        sampler = StackSampler(threading.get_ident(), sys._getframe(), self.interval, self.max_seconds)
+        started = time.perf_counter()
+        sampler.start()
+        error = None
+        try:
+            return func(*args, **kwargs), request_id
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            sampler.stop()
+            elapsed = time.perf_counter() - started
+            try:
+                self._save(request_id, sampler, {
+                    "request_id": request_id,
+                    "label": label[:200],
+                    "created_at": datetime.now().isoformat(),
+                    "duration_ms": round(elapsed * 1000, 1),
+                    "samples": sampler.samples,
+                    "interval_ms": round(self.interval * 1000, 2),
+                    # Profiler cost, as a share of the request's wall time
+                    "sampler_cpu_ms": round(sampler.sampler_cpu * 1000, 2),
+                    "overhead_pct": round(100 * sampler.sampler_cpu / elapsed, 2) if elapsed else 0.0,
+                    "error": error
+                })
+            except OSError as e:
+                print(f"Could not save profile {request_id}: {e}")
+            with self._lock:
+                self.active -= 1
+                self.profiled += 1
+                self._in_flight.discard(request_id)
+
+    def _paths(self, request_id: str):
+        base = os.path.join(self.directory, request_id)
+        return base + ".folded", base + ".json"
+
+    def _save(self, request_id: str, sampler: StackSampler, metadata: Dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        folded_path, metadata_path = self._paths(request_id)
+        with open(folded_path, "w") as f:
+            f.write(sampler.folded())
+        with open(metadata_path, "w") as f:
+            json.dump(metadata, f, indent=2)
+        self._prune()
+
+    def _prune(self) -> None:
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in entries[:max(0, len(entries) - self.retain)]:
+            for path in self._paths(entry.name[:-len(".json")]):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def get(self, request_id: str) -> Optional[str]:
+        """Folded stacks for a request, or None if there's no such profile."""
+        if not REQUEST_ID_PATTERN.match(request_id):
+            return None
+        folded_path, _ = self._paths(request_id)
+        if not os.path.exists(folded_path):
+            return None
+        with open(folded_path) as f:
+            return f.read()
+
+    def list(self) -> List[Dict]:
+        """Metadata of stored profiles, newest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                try:
+                    with open(entry.path) as f:
+                        profiles.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return sorted(profiles, key=lambda profile: profile.get("created_at", ""), reverse=True)
+
+    def stats(self) -> Dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "interval_ms": round(self.interval * 1000, 2),
+            "active": self.active,
+            "profiled": self.profiled,
+            "skipped_busy": self.skipped_busy
+        }
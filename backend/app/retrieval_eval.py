@@ -0,0 +1,117 @@
+from typing import List, Dict, Optional, Callable
+import contextlib
+import io
+import json
+import os
+import time
+
+class CachedEmbeddings:
+    """Query-embedding cache in front of an embeddings client.
+
+    Vectors are stored in a JSON file keyed by query text. With offline=True a
+    cache miss raises instead of calling the API, so evaluations are repeatable
+    without network access once the cache has been filled.
+    """
+
+    def __init__(self, embeddings, cache_path: str, offline: bool = True):
+        self.embeddings = embeddings
+        self.cache_path = cache_path
+        self.offline = offline
+        self.misses = 0
+        self.missing: List[str] = []
+        self.cache: Dict[str, List[float]] = {}
+        if os.path.exists(cache_path):
+            with open(cache_path) as f:
+                self.cache = json.load(f)
+
+    def embed_query(self, text: str) -> List[float]:
+        if text not in self.cache:
+            if self.offline:
+                # Recorded because retrieval code may swallow the exception
+                self.missing.append(text)
+                raise KeyError(f"No cached embedding for query (run with --refresh-cache): {text[:60]}")
+            self.cache[text] = self.embeddings.embed_query(text)
+            self.misses += 1
+        return self.cache[text]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def save(self) -> None:
+        with open(self.cache_path, "w") as f:
+            json.dump(self.cache, f)
+
+def _normalize_title(title: str) -> str:
+    return title.lower().replace('-', ' ')
+
+def is_relevant_pdf(result: Dict, item: Dict) -> bool:
+    """A PDF result is relevant if any page it covers is one of the item's labeled pages.
+
+    Items without `relevant_pages` fall back to outline chapter/section
+    phrases. Those are the section filter's own keywords, so such items
+    mostly measure whether the filter fired; evaluate_agent counts them
+    separately.
+    """
+    metadata = result.get('metadata', {})
+    if item.get('relevant_pages'):
+        first = metadata.get('page', 0)
+        return any(page in item['relevant_pages'] for page in range(first, metadata.get('page_end', first) + 1))
+    titles = _normalize_title(f"{metadata.get('chapter', '')} {metadata.get('section', '')}")
+    return any(phrase in titles for phrase in item.get('relevant_sections', []))
+
+def is_relevant_csv(result: Dict, item: Dict) -> bool:
+    return f"{result.get('template_name', '')}|{result.get('field_label', '')}" in item.get('relevant', [])
+
+def first_relevant_rank(results: List[Dict], item: Dict, is_relevant: Callable) -> Optional[int]:
+    for rank, result in enumerate(results, 1):
+        if is_relevant(result, item):
+            return rank
+    return None
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize(ranks: List[Optional[int]], latencies: List[float], ks: List[int]) -> Dict:
+    """recall@k (share of questions with a relevant hit in the top k), MRR and latency."""
+    total = len(ranks) or 1
+    summary = {f"recall@{k}": round(sum(1 for r in ranks if r is not None and r <= k) / total, 3) for k in ks}
+    summary["mrr"] = round(sum(1.0 / r for r in ranks if r is not None) / total, 3)
+    if latencies:
+        summary["p50_ms"] = round(_percentile(latencies, 50) * 1000, 1)
+        summary["p95_ms"] = round(_percentile(latencies, 95) * 1000, 1)
+    summary["questions"] = len(ranks)
+    return summary
+
+def evaluate_agent(agent, dataset: Dict, ks: List[int]) -> Dict:
+    """Run the agent's PDF and CSV retrieval over the labeled set.
+
+    Only PDF items with hand-checked `relevant_pages` count towards the
+    "pdf" metrics, which are left out while there are none. Items labeled by
+    section title alone are reported as "pdf_section_filter_check": they
+    show whether the section filter fired, not whether retrieval is right.
+    """
+    max_k = max(ks)
+    pdf_items = dataset.get('pdf', [])
+    report = {}
+    for kind, items, search, is_relevant in (
+        ('pdf', [item for item in pdf_items if item.get('relevant_pages')],
+         agent.enhanced_pdf_search, is_relevant_pdf),
+        ('pdf_section_filter_check', [item for item in pdf_items if not item.get('relevant_pages')],
+         agent.enhanced_pdf_search, is_relevant_pdf),
+        ('csv', dataset.get('csv', []), agent.enhanced_csv_search, is_relevant_csv)
+    ):
+        if not items:
+            continue
+        ranks, latencies = [], []
+        for item in items:
+            # The agent logs every step to stdout; keep the report readable
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                intent_analysis = agent.analyze_query_intent(item['question'])
+                results = search(item['question'], intent_analysis, max_results=max_k)
+                latencies.append(time.perf_counter() - start)
+            ranks.append(first_relevant_rank(results, item, is_relevant))
+        report[kind] = summarize(ranks, latencies, ks)
+    return report
@@ -0,0 +1,75 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from typing import List, Dict, Tuple
+from datetime import datetime
+from data_processing.csv_processor import CSVProcessor
+from data_processing.embeddings import EmbeddingManager
+from data_processing.chunk_store import ChunkStore
+from data_processing.pdf_processor import load_shard_registry
+from config import settings
+
+def source_fingerprint() -> Tuple:
+    """(path, mtime, size) of every file the retrieval indexes are loaded from.
+
+    Re-ingesting the PDFs rewrites the chunk store and shard registry, so a
+    change here means the vector index changed too.
+    """
+    fingerprint = []
+    for path in (settings.csv_path, settings.chunk_store_path, settings.shard_registry_path):
+        try:
+            stat = os.stat(path)
+            fingerprint.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            fingerprint.append((path, None, None))
+    return tuple(fingerprint)
+
+class RetrievalState:
+    """Everything a query reads from the CSV and vector indexes.
+
+    Built once and never mutated: a reload builds a new instance and swaps the
+    agent's reference, so a query that captured the old one finishes on it.
+    """
+
+    def __init__(self, csv_processor: CSVProcessor, embedding_manager: EmbeddingManager,
+                 chunk_store: ChunkStore, pdf_shards: List[str], version: int, fingerprint: Tuple):
+        self.csv_processor = csv_processor
+        self.embedding_manager = embedding_manager
+        self.chunk_store = chunk_store
+        self.section_titles = chunk_store.section_titles()
+        self.pdf_shards = pdf_shards
+        self.version = version
+        self.fingerprint = fingerprint
+        self.loaded_at = datetime.now().isoformat()
+
+    @classmethod
+    def build(cls, version: int = 1) -> "RetrievalState":
+        """Load the CSV index, chunk store and collection handles from disk."""
+        # Taken first so a change made while building triggers another reload
+        fingerprint = source_fingerprint()
+
+        csv_processor = CSVProcessor()
+        csv_processor.process_csv()
+        chunk_store = ChunkStore.load(settings.chunk_store_path)
+        pdf_shards = list(load_shard_registry(settings.shard_registry_path))
+
+        embedding_manager = EmbeddingManager()
+        embedding_manager.refresh_collections(pdf_shards)
+        # Load the HNSW segments now rather than on the first query after the swap
+        embedding_manager.warm_collections()
+
+        return cls(csv_processor, embedding_manager, chunk_store, pdf_shards, version, fingerprint)
+
+    def describe(self) -> Dict:
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "csv_entries": len(self.csv_processor.search_index),
+            "chunks": len(self.chunk_store),
+            "pdf_collections": self.pdf_shards,
+            "embedding_projections": {
+                name: projection.describe()
+                for name, projection in self.embedding_manager.projections.items() if projection
+            }
+        }
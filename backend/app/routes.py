@@ -2,20 +2,70 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, List
+from typing import Any, Optional, Dict, List, Literal
+import asyncio
 import logging
 import traceback
 from datetime import datetime
+from single_flight import FollowerTimeout, SingleFlight
+from admission import AdmissionController, AdmissionRejected
+from request_deadline import RequestDeadline
+from process_memory import memory_usage
+from request_profiler import RequestProfiler
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+try:
+    # orjson serializes query responses several times faster than the stdlib encoder
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as QueryJSONResponse
+except ImportError:
+    QueryJSONResponse = JSONResponse
+
+# Returned by /api/query unless the request sets verbose or picks its own fields
+COMPACT_FIELDS = ("answer", "sources", "tool_used", "confidence", "classification",
+                  "answer_mode", "degradations", "session_id", "timestamp")
+
 class QueryRequest(BaseModel):
     question: str
     session_id: Optional[str] = None
+    # End-to-end latency budget; also accepted as the X-Request-Deadline-Ms header
+    deadline_ms: Optional[int] = None
+    # "extractive" answers from retrieved passages without an LLM call
+    answer_mode: Optional[Literal["generative", "extractive"]] = None
+    # Response shape: the compact fields by default, everything with verbose,
+    # or exactly the listed fields
+    verbose: bool = False
+    fields: Optional[List[str]] = None
+
+class QuerySources(BaseModel):
+    csv_results: List[Dict] = []
+    pdf_results: List[Dict] = []
+
+class CompactQueryResponse(BaseModel):
+    """Default /api/query response (documentation only; responses skip validation)."""
+    answer: str
+    sources: QuerySources
+    tool_used: str
+    confidence: Any
+    classification: Optional[Dict] = None
+    answer_mode: str = "generative"
+    degradations: List[str] = []
+    session_id: Optional[str] = None
+    timestamp: str
+
+def select_fields(response: Dict, fields: Optional[List[str]], verbose: bool) -> Dict:
+    if fields:
+        return {key: response[key] for key in fields if key in response}
+    if verbose:
+        return response
+    return {key: response[key] for key in COMPACT_FIELDS if key in response}
 
 class ConversationMemory:
     """Simple in-memory conversation storage for sessions."""
@@ -61,6 +111,46 @@ class ConversationMemory:
 # Create router and memory
 router = APIRouter()
 conversation_memory = ConversationMemory()
+query_flight = SingleFlight()
+admission = None
+ingest_jobs = None
+profiler = None
+
+def get_ingest_jobs():
+    """Ingest job manager, imported on first use (it loads config and the PDF pipeline)."""
+    global ingest_jobs
+    if ingest_jobs is None:
+        from ingest_jobs import IngestJobManager
+        ingest_jobs = IngestJobManager()
+    return ingest_jobs
+
+def get_admission() -> AdmissionController:
+    """Admission controller for /api/query, created from Settings on first use."""
+    global admission
+    if admission is None:
+        from config import settings
+        admission = AdmissionController(
+            max_concurrency=settings.max_concurrent_queries,
+            max_queue=settings.query_queue_depth,
+            per_session_limit=settings.per_session_concurrency,
+            queue_timeout=settings.query_queue_timeout
+        )
+    return admission
+
+def get_profiler() -> RequestProfiler:
+    """Per-request profiler, created from Settings on first use."""
+    global profiler
+    if profiler is None:
+        from config import settings
+        profiler = RequestProfiler(
+            settings.profile_dir,
+            sample_rate=settings.profile_sample_rate,
+            interval=settings.profile_interval_ms / 1000,
+            max_seconds=settings.profile_max_seconds,
+            max_concurrent=settings.profile_max_concurrent,
+            retain=settings.profile_retain
+        )
+    return profiler
 
 # Global agent instance
 agent = None
@@ -99,7 +189,10 @@ def test_dependencies():
         logger.info("✓ config import successful")
         logger.info(f"✓ PDF path: {settings.pdf_path}")
         logger.info(f"✓ CSV path: {settings.csv_path}")
-        logger.info(f"✓ ChromaDB path: {settings.chroma_persist_directory}")
+        if settings.chroma_mode == "http":
+            logger.info(f"✓ ChromaDB server: {settings.chroma_host}:{settings.chroma_port}")
+        else:
+            logger.info(f"✓ ChromaDB path: {settings.chroma_persist_directory}")
     except ImportError as e:
         issues.append(f"Failed to import config: {e}")
     
@@ -110,13 +203,19 @@ def test_dependencies():
             issues.append(f"PDF file not found at: {settings.pdf_path}")
         if not os.path.exists(settings.csv_path):
             issues.append(f"CSV file not found at: {settings.csv_path}")
-        if not os.path.exists(settings.chroma_persist_directory):
+        if settings.chroma_mode != "http" and not os.path.exists(settings.chroma_persist_directory):
             issues.append(f"ChromaDB directory not found at: {settings.chroma_persist_directory}")
     except Exception as e:
         issues.append(f"Error checking file paths: {e}")
     
     return issues
 
+def reopen_after_fork():
+    """Give a forked worker its own Chroma client; the parent's persistent one can't be shared."""
+    from config import settings
+    if agent is not None and settings.chroma_mode != "http":
+        agent.state.embedding_manager.reopen_client()
+
 def initialize_agent():
     """Initialize the enhanced RAG agent with detailed error handling."""
     global agent
@@ -277,8 +376,61 @@ async def get_example_queries():
         ]
     }
 
-@router.post("/api/query")
-async def process_query(request: QueryRequest):
+def degrade_thresholds(settings) -> List[float]:
+    """The remaining-budget thresholds at which process_query starts cutting work."""
+    return [settings.degrade_reduce_results_below, settings.degrade_skip_secondary_below,
+            settings.degrade_cap_answer_below, settings.degrade_skip_requery_below,
+            settings.degrade_extractive_below]
+
+def request_deadline(request: QueryRequest, header_ms: Optional[int]) -> RequestDeadline:
+    """Deadline from the body field, else the header, else the configured default."""
+    from config import settings
+    deadline_ms = request.deadline_ms or header_ms or settings.default_request_deadline_ms
+    return RequestDeadline(deadline_ms / 1000 if deadline_ms and deadline_ms > 0 else None)
+
+@router.post("/api/query", response_class=QueryJSONResponse,
+             responses={200: {"model": CompactQueryResponse}})
+async def process_query(request: QueryRequest,
+                        x_request_deadline_ms: Optional[int] = Header(default=None),
+                        x_profile: Optional[str] = Header(default=None),
+                        x_admin_token: Optional[str] = Header(default=None),
+                        x_request_id: Optional[str] = Header(default=None)):
+    """Admit the query (or reject it with 429 when over capacity) and answer it."""
+    # Started before queueing so time spent waiting for a slot counts against it
+    deadline = request_deadline(request, x_request_deadline_ms)
+    profile_requested = x_profile is not None and x_profile.lower() in ("1", "true", "yes")
+    if profile_requested:
+        check_profile_token(x_admin_token)
+    controller = get_admission()
+    try:
+        ticket = await controller.acquire(
+            request.session_id,
+            timeout=deadline.remaining() if deadline.budget is not None else None
+        )
+    except AdmissionRejected as e:
+        logger.warning(f"Rejected query ({e.reason}); retry after {e.retry_after}s")
+        raise HTTPException(
+            status_code=429,
+            detail=f"Server busy ({e.reason}); retry later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    try:
+        profile = get_profiler().should_profile(profile_requested)
+        return await answer_query(request, deadline, profile, x_request_id)
+    finally:
+        controller.release(ticket)
+
+def check_profile_token(token: Optional[str]):
+    """X-Profile and the profile endpoints need the admin token, and are off when none is configured.
+
+    Stored profiles carry users' question text, so they are never served without it.
+    """
+    from config import settings
+    if not settings.admin_token or token != settings.admin_token:
+        raise HTTPException(status_code=403, detail="Profiling requires a valid X-Admin-Token")
+
+async def answer_query(request: QueryRequest, deadline: RequestDeadline, profile: bool = False,
+                       request_id: Optional[str] = None):
     """Enhanced query processing with conversation memory and detailed responses."""
     global agent
     
@@ -302,7 +454,36 @@ async def process_query(request: QueryRequest):
         
         # Process the query with enhanced agent
         logger.info(f"Processing enhanced query: {request.question[:50]}...")
-        result = agent.process_query(request.question)
+        from config import settings
+        coalesced = False
+        profile_id = None
+        if profile:
+            # Not coalesced, so the profile shows this request's own work
+            result, profile_id = await run_in_threadpool(get_profiler().run, request_id, request.question,
+                                                         agent.process_query, request.question, deadline,
+                                                         request.answer_mode)
+        elif settings.query_coalescing_enabled:
+            # Identical concurrent questions share one embedding + LLM round trip. The key
+            # needs the query analysis, so it runs off the event loop and is handed on
+            analysis = await run_in_threadpool(agent.analyze_query, request.question)
+            # Only requests whose deadlines would degrade the answer alike share it
+            key = (*agent.coalescing_key(request.question, analysis), request.answer_mode,
+                   deadline.tier(degrade_thresholds(settings)))
+            # A follower waits only while it could still afford its own extractive answer
+            follower_timeout = (deadline.remaining() - settings.degrade_extractive_below
+                                if deadline.budget is not None else None)
+            try:
+                result, coalesced = await query_flight.do(key, agent.process_query, request.question,
+                                                          deadline, request.answer_mode, analysis,
+                                                          timeout=follower_timeout)
+            except FollowerTimeout:
+                logger.info(f"In-flight query outlasted this request's deadline; answering alone: {key[0][:50]}...")
+                result = await run_in_threadpool(agent.process_query, request.question, deadline,
+                                                 request.answer_mode, analysis)
+            if coalesced:
+                logger.info(f"Coalesced onto in-flight query: {key[0][:50]}...")
+        else:
+            result = await run_in_threadpool(agent.process_query, request.question, deadline, request.answer_mode)
         
         # Store in conversation memory
         if request.session_id:
@@ -314,12 +495,20 @@ async def process_query(request: QueryRequest):
             "sources": result["sources"],
             "tool_used": result["tool_used"],
             "confidence": result["confidence"],
+            "classification": result.get("classification"),
             "reasoning_chain": result.get("reasoning_chain", {}),
             "strategy": result.get("strategy", {}),
             "intent_analysis": result.get("intent_analysis", {}),
+            "token_usage": result.get("token_usage", {}),
+            "sources_used": result.get("sources_used", {}),
+            "context_packing": result.get("context_packing"),
+            "answer_mode": result.get("answer_mode", "generative"),
+            "degradations": result.get("degradations", []),
+            "deadline": result.get("deadline"),
             "session_id": request.session_id,
             "timestamp": datetime.now().isoformat(),
-            "agent_version": "enhanced-v2.0"
+            "agent_version": "enhanced-v2.0",
+            "coalesced": coalesced
         }
         
         # Add conversation history if available
@@ -327,7 +516,11 @@ async def process_query(request: QueryRequest):
             history = conversation_memory.get_session_history(request.session_id)
             enhanced_response["conversation_length"] = len(history)
         
-        return enhanced_response
+        # Built directly so FastAPI skips jsonable_encoder on the (possibly large) payload
+        response = QueryJSONResponse(select_fields(enhanced_response, request.fields, request.verbose))
+        if profile_id is not None:
+            response.headers["X-Profile-Id"] = profile_id
+        return response
         
     except Exception as e:
         logger.error(f"Error processing enhanced query: {str(e)}")
@@ -383,6 +576,19 @@ async def get_reasoning_analysis(session_id: str):
         "timestamp": datetime.now().isoformat()
     }
 
+@router.get("/api/metrics")
+async def get_metrics():
+    """Load metrics for autoscaling: queue depth, wait times, rejections, coalescing."""
+    from upstream import upstream_stats
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "admission": get_admission().stats(),
+        "query_coalescing": query_flight.stats(),
+        "upstream": upstream_stats(),
+        "model_routing": agent.model_router.stats() if agent is not None else None,
+        "profiling": get_profiler().stats()
+    }
+
 @router.get("/api/status")
 async def get_status():
     """Get detailed enhanced system status."""
@@ -419,6 +625,16 @@ async def get_status():
             except:
                 status["intent_analysis_working"] = False
         
+        status["query_coalescing"] = query_flight.stats()
+        status["admission"] = get_admission().stats()
+        from upstream import upstream_stats
+        status["upstream"] = upstream_stats()
+        if agent is not None:
+            status["index"] = agent.state.describe()
+            status["model_routing"] = agent.model_router.stats()
+        # Unique RSS shows what this worker costs beyond pages shared with the pre-fork master
+        status["process"] = {"pid": os.getpid(), "memory": memory_usage(os.getpid())}
+        
         return status
         
     except Exception as e:
@@ -426,4 +642,126 @@ async def get_status():
             "error": str(e),
             "timestamp": datetime.now().isoformat(),
             "agent_initialized": False
-        }
\ No newline at end of file
+        }
+
+class IngestRequest(BaseModel):
+    # Defaults to SHARD_BY for a PDF directory, or the single-collection layout
+    shard_by: Optional[Literal["document", "family"]] = None
+    include_csv: bool = True
+
+def reload_after_ingest():
+    """Swap the new index into this worker; other workers pick it up via their watcher.
+
+    The job retires the old collections only once every worker reports the new index.
+    """
+    if agent is not None:
+        agent.reload_state()
+        get_ingest_jobs().report_loaded(agent.state.fingerprint)
+
+@router.post("/api/ingest", status_code=202)
+async def start_ingest(request: IngestRequest, x_admin_token: Optional[str] = Header(default=None)):
+    """Start a background re-index; the current index keeps serving until it completes."""
+    check_admin_token(x_admin_token)
+    try:
+        job = get_ingest_jobs().start(request.shard_by, request.include_csv, on_complete=reload_after_ingest)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    logger.info(f"Started ingest job {job.id}")
+    return job.describe()
+
+@router.get("/api/ingest")
+async def list_ingest_jobs(x_admin_token: Optional[str] = Header(default=None)):
+    check_admin_token(x_admin_token)
+    return {"jobs": get_ingest_jobs().list()}
+
+@router.get("/api/ingest/{job_id}")
+async def get_ingest_job(job_id: str, x_admin_token: Optional[str] = Header(default=None)):
+    """Stage, pages/chunks processed, embedding throughput and ETA of an ingest job."""
+    check_admin_token(x_admin_token)
+    job = get_ingest_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingest job not found")
+    return job
+
+@router.delete("/api/ingest/{job_id}")
+async def cancel_ingest_job(job_id: str, x_admin_token: Optional[str] = Header(default=None)):
+    """Request cancellation; the job stops at its next batch boundary."""
+    check_admin_token(x_admin_token)
+    job = get_ingest_jobs().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingest job not found")
+    return job
+
+@router.get("/api/profiles")
+async def list_profiles(x_admin_token: Optional[str] = Header(default=None)):
+    """Stored per-request profiles, newest first."""
+    check_profile_token(x_admin_token)
+    profiles = await run_in_threadpool(get_profiler().list)
+    return {"profiles": profiles, "profiling": get_profiler().stats()}
+
+@router.get("/api/profiles/{request_id}", response_class=PlainTextResponse)
+async def get_profile(request_id: str, x_admin_token: Optional[str] = Header(default=None)):
+    """Folded stacks for one request; render with flamegraph.pl, speedscope or inferno."""
+    check_profile_token(x_admin_token)
+    folded = get_profiler().get(request_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(folded)
+
+def check_admin_token(token: Optional[str]):
+    """Admin endpoints fail closed: without a configured ADMIN_TOKEN nobody gets in."""
+    from config import settings
+    if not settings.admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled until ADMIN_TOKEN is set")
+    if token != settings.admin_token:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+async def reload_indexes() -> Dict:
+    """Rebuild the agent's retrieval state off the event loop and swap it in."""
+    previous = agent.state.version
+    description = await run_in_threadpool(agent.reload_state)
+    get_ingest_jobs().report_loaded(agent.state.fingerprint)
+    logger.info(f"Retrieval indexes reloaded: version {previous} -> {description['version']}")
+    return description
+
+@router.post("/api/admin/reload")
+async def reload_index(x_admin_token: Optional[str] = Header(default=None)):
+    """Reload the template CSV and vector index without restarting."""
+    check_admin_token(x_admin_token)
+    if agent is None:
+        raise HTTPException(status_code=409, detail="Agent not initialized")
+    try:
+        return {"reloaded": True, "index": await reload_indexes()}
+    except Exception as e:
+        # The previous state stays in place
+        logger.error(f"Index reload failed: {e}")
+        logger.error(f"Full traceback: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"Index reload failed: {str(e)}")
+
+async def watch_index_sources(interval: float, reload: bool):
+    """Report the loaded index for ingest jobs; with `reload`, also reload once the index
+    source files change and then stay unchanged for one interval."""
+    from retrieval_state import source_fingerprint
+    last_seen = None
+    while True:
+        if agent is not None:
+            await run_in_threadpool(get_ingest_jobs().report_loaded, agent.state.fingerprint)
+        await asyncio.sleep(interval)
+        if agent is None or not reload:
+            continue
+        current = source_fingerprint()
+        if current != agent.state.fingerprint and current == last_seen:
+            try:
+                await reload_indexes()
+            except Exception as e:
+                logger.error(f"Index reload failed: {e}")
+        last_seen = current
+
+@router.on_event("startup")
+async def start_index_watcher():
+    from config import settings
+    from ingest_jobs import heartbeat_interval
+    reload = settings.index_reload_interval > 0
+    asyncio.create_task(watch_index_sources(heartbeat_interval(), reload))
+    if reload:
+        logger.info(f"Watching index sources every {settings.index_reload_interval}s")
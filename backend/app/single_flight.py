@@ -0,0 +1,64 @@
+import asyncio
+import re
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially different phrasings share a coalescing key."""
+    normalized = re.sub(r'\s+', ' ', query.strip().lower())
+    return normalized.rstrip('?.! ')
+
+class FollowerTimeout(Exception):
+    """A coalesced caller gave up waiting for the in-flight call it joined."""
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key onto one in-flight computation.
+
+    The first caller for a key runs `func` in a worker thread; callers that arrive
+    while it is running await the same task and receive the same result (or
+    exception). Nothing is cached once the call completes. A caller that joins
+    an existing call waits at most `timeout` seconds for it, then gets
+    FollowerTimeout; the call itself keeps running for the others.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.executed_count = 0
+        self.coalesced_count = 0
+        self.follower_timeout_count = 0
+
+    async def do(self, key: Hashable, func: Callable, *args, timeout: Optional[float] = None,
+                 **kwargs) -> Tuple[Any, bool]:
+        """Run or join the call for `key`. Returns (result, coalesced)."""
+        task = self._in_flight.get(key)
+        coalesced = task is not None
+
+        if coalesced:
+            self.coalesced_count += 1
+        else:
+            self.executed_count += 1
+            task = asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._release(key, done))
+
+        # Shield so one cancelled waiter (client disconnect) doesn't cancel the others
+        if coalesced and timeout is not None:
+            try:
+                result = await asyncio.wait_for(asyncio.shield(task), max(0.0, timeout))
+            except asyncio.TimeoutError:
+                self.follower_timeout_count += 1
+                raise FollowerTimeout(f"In-flight call did not finish within {timeout:.2f}s")
+        else:
+            result = await asyncio.shield(task)
+        return result, coalesced
+
+    def _release(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "executed_requests": self.executed_count,
+            "coalesced_requests": self.coalesced_count,
+            "follower_timeouts": self.follower_timeout_count,
+            "in_flight": len(self._in_flight)
+        }
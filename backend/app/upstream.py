@@ -0,0 +1,250 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Optional
+
+class DeadlineExceeded(TimeoutError):
+    """No attempt of an upstream call finished within its deadline."""
+
+class CircuitOpenError(RuntimeError):
+    """The upstream's circuit breaker is open; the call was not attempted."""
+
+class CircuitBreaker:
+    """Fail fast while an upstream's recent error rate is too high.
+
+    Opens when at least `min_calls` of the last `window` calls were recorded
+    and `error_rate` of them failed. After `cooldown` seconds one probe call is
+    let through; its outcome closes the breaker or re-opens it.
+    """
+
+    def __init__(self, error_rate: float, min_calls: int, cooldown: float, window: int = 50):
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.outcomes = deque(maxlen=window)
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = "half_open"
+                return True
+            # Open, or half-open with the probe still running
+            return False
+
+    def abandon(self) -> None:
+        """A call that says nothing about upstream health (e.g. cut short by its request's deadline).
+
+        A half-open probe that ends this way returns the breaker to open
+        without restarting the cooldown, so the next call probes again.
+        """
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "open"
+
+    def record(self, success: bool) -> None:
+        with self._lock:
+            if self.state == "half_open":
+                if success:
+                    self.state = "closed"
+                    self.outcomes.clear()
+                else:
+                    self._open()
+                return
+            self.outcomes.append(success)
+            failures = self.outcomes.count(False)
+            if len(self.outcomes) >= self.min_calls and failures / len(self.outcomes) >= self.error_rate:
+                self._open()
+
+    def _open(self) -> None:
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+
+class HedgedCaller:
+    """Run a blocking upstream call with a deadline, hedging and a circuit breaker.
+
+    The call runs on a worker thread. If it hasn't finished after the
+    `hedge_percentile` latency of recent calls, one duplicate is sent and
+    whichever attempt succeeds first wins. Attempts still running at the
+    deadline are abandoned (the client timeout bounds how long they linger)
+    and DeadlineExceeded is raised.
+    """
+
+    MIN_SAMPLES = 20
+
+    def __init__(self, name: str, deadline: float, hedge_percentile: float, breaker: CircuitBreaker):
+        self.name = name
+        self.deadline = deadline
+        self.hedge_percentile = hedge_percentile
+        self.breaker = breaker
+        self.latencies = deque(maxlen=500)
+        self.calls = 0
+        self.hedges_fired = 0
+        self.hedge_wins = 0
+        self.errors = 0
+        self.deadline_exceeded = 0
+        self.rejected_by_breaker = 0
+        self._lock = threading.Lock()
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while hedging is off or unwarmed."""
+        if self.hedge_percentile <= 0 or len(self.latencies) < self.MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(self.hedge_percentile / 100 * len(ordered)))]
+
+    def call(self, func: Callable, *args, deadline: Optional[float] = None, **kwargs):
+        """Call func(*args, **kwargs); a shorter `deadline` (seconds) overrides the caller's own.
+
+        Only upstream errors and timeouts against the caller's own deadline
+        count against the breaker; running out of a tighter request budget
+        doesn't, since it says nothing about the upstream's health.
+        """
+        request_bound = deadline is not None and deadline < self.deadline
+        deadline = min(deadline, self.deadline) if request_bound else self.deadline
+        if deadline <= 0:
+            with self._lock:
+                self.deadline_exceeded += 1
+            raise DeadlineExceeded(f"{self.name} call skipped; request deadline already passed")
+        if not self.breaker.allow():
+            with self._lock:
+                self.rejected_by_breaker += 1
+            raise CircuitOpenError(f"{self.name} upstream is failing; circuit open")
+
+        with self._lock:
+            self.calls += 1
+        start = time.monotonic()
+        try:
+            result = self._run(func, args, kwargs, start, deadline)
+        except DeadlineExceeded:
+            if request_bound:
+                self.breaker.abandon()
+            else:
+                self.breaker.record(False)
+            raise
+        except Exception:
+            self.breaker.record(False)
+            raise
+        self.breaker.record(True)
+        with self._lock:
+            self.latencies.append(time.monotonic() - start)
+        return result
+
+    def _run(self, func: Callable, args, kwargs, start: float, deadline: float):
+        executor = _get_executor()
+        end = start + deadline
+        hedge_delay = self.hedge_delay()
+        primary = executor.submit(func, *args, **kwargs)
+        pending = {primary}
+        hedged = False
+        last_error = None
+
+        while pending:
+            now = time.monotonic()
+            if now >= end:
+                break
+            timeout = end - now
+            if not hedged and hedge_delay is not None:
+                timeout = min(timeout, max(0.0, start + hedge_delay - now))
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for attempt in done:
+                if attempt.exception() is None:
+                    if attempt is not primary:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return attempt.result()
+                last_error = attempt.exception()
+
+            if (not hedged and hedge_delay is not None and pending
+                    and time.monotonic() - start >= hedge_delay):
+                hedged = True
+                with self._lock:
+                    self.hedges_fired += 1
+                pending.add(executor.submit(func, *args, **kwargs))
+
+        if not pending and last_error is not None:
+            with self._lock:
+                self.errors += 1
+            raise last_error
+        with self._lock:
+            self.deadline_exceeded += 1
+        raise DeadlineExceeded(f"{self.name} call exceeded its {deadline:.1f}s deadline")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            ordered = sorted(self.latencies)
+            hedge_delay = self.hedge_delay()
+            return {
+                "calls": self.calls,
+                "deadline_s": self.deadline,
+                "hedges_fired": self.hedges_fired,
+                "hedge_wins": self.hedge_wins,
+                "hedge_win_rate": round(self.hedge_wins / self.hedges_fired, 3) if self.hedges_fired else 0.0,
+                # Extra upstream requests paid for per call
+                "cost_overhead": round(self.hedges_fired / self.calls, 3) if self.calls else 0.0,
+                "hedge_delay_ms": round(hedge_delay * 1000, 1) if hedge_delay is not None else None,
+                "latency_ms_p50": round(ordered[len(ordered) // 2] * 1000, 1) if ordered else None,
+                "errors": self.errors,
+                "deadline_exceeded": self.deadline_exceeded,
+                "rejected_by_breaker": self.rejected_by_breaker,
+                "breaker_state": self.breaker.state,
+                "breaker_times_opened": self.breaker.times_opened
+            }
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            from config import settings
+            _executor = ThreadPoolExecutor(max_workers=settings.upstream_max_workers,
+                                           thread_name_prefix="upstream")
+        return _executor
+
+def _reset_after_fork():
+    # Worker threads don't survive a fork; children start their own pool
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+_callers: Dict[str, HedgedCaller] = {}
+_callers_lock = threading.Lock()
+
+def upstream_caller(name: str, deadline: Optional[float] = None,
+                    hedge_percentile: Optional[float] = None) -> HedgedCaller:
+    """Process-wide caller per upstream name, so stats and breaker state are shared.
+
+    "embedding" is configured from Settings; other names (the LLM model tiers)
+    default to the LLM settings unless given their own deadline/percentile.
+    """
+    with _callers_lock:
+        if name not in _callers:
+            from config import settings
+            defaults = {
+                "embedding": (settings.embedding_deadline, settings.embedding_hedge_percentile)
+            }.get(name, (settings.llm_deadline, settings.llm_hedge_percentile))
+            deadline = deadline if deadline is not None else defaults[0]
+            percentile = hedge_percentile if hedge_percentile is not None else defaults[1]
+            _callers[name] = HedgedCaller(name, deadline, percentile, CircuitBreaker(
+                error_rate=settings.circuit_breaker_error_rate,
+                min_calls=settings.circuit_breaker_min_calls,
+                cooldown=settings.circuit_breaker_cooldown
+            ))
+        return _callers[name]
+
+def upstream_stats() -> Dict[str, Dict]:
+    return {name: caller.stats() for name, caller in _callers.items()}
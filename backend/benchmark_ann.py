@@ -0,0 +1,114 @@
+import argparse
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import chromadb
+from app.config import settings
+from app.data_processing.embeddings import hnsw_collection_metadata, create_chroma_client
+from app.data_processing.pdf_processor import load_shard_registry
+
+def load_corpus_vectors():
+    """Pull every stored chunk embedding out of the PDF collections."""
+    client = create_chroma_client()
+    ids, vectors = [], []
+    for name in load_shard_registry(settings.shard_registry_path):
+        data = client.get_collection(name).get(include=["embeddings"])
+        ids.extend(data["ids"])
+        vectors.extend(data["embeddings"])
+    return ids, np.asarray(vectors, dtype=np.float32)
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    """Brute-force neighbours under the same metric as the index."""
+    if space == "cosine":
+        corpus = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        scores = -(queries @ corpus.T)
+    elif space == "ip":
+        scores = -(queries @ corpus.T)
+    else:
+        scores = (queries ** 2).sum(1)[:, None] - 2 * queries @ corpus.T + (corpus ** 2).sum(1)[None, :]
+    return np.argsort(scores, axis=1)[:, :k]
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+def run_config(ids, corpus, queries, truth, k, space, m, ef_construction, ef_search):
+    workdir = tempfile.mkdtemp(prefix="ann_sweep_")
+    try:
+        client = chromadb.PersistentClient(path=workdir)
+        collection = client.create_collection(
+            name="sweep",
+            embedding_function=None,
+            metadata=hnsw_collection_metadata(space, m, ef_construction, ef_search)
+        )
+        start = time.perf_counter()
+        batch_size = 1000
+        for i in range(0, len(ids), batch_size):
+            collection.add(ids=ids[i:i+batch_size], embeddings=corpus[i:i+batch_size].tolist())
+        build_seconds = time.perf_counter() - start
+
+        position = {doc_id: i for i, doc_id in enumerate(ids)}
+        latencies, hits = [], 0
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+            latencies.append(time.perf_counter() - start)
+            found = {position[doc_id] for doc_id in result["ids"][0]}
+            hits += len(found & set(expected.tolist()))
+
+        return {
+            "space": space,
+            "M": m,
+            "ef_construction": ef_construction,
+            "ef_search": ef_search,
+            f"recall@{k}": round(hits / (len(queries) * k), 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+            "build_s": round(build_seconds, 2),
+            "index_mb": round(directory_size(workdir) / 1e6, 2)
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep HNSW parameters on the ingested PDF corpus")
+    parser.add_argument("--space", nargs="+", default=[settings.chroma_distance_metric])
+    parser.add_argument("--m", nargs="+", type=int, default=[8, 16, 32])
+    parser.add_argument("--ef-construction", nargs="+", type=int, default=[100, 200])
+    parser.add_argument("--ef-search", nargs="+", type=int, default=[10, 50, 100])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200, help="stored chunks reused as query vectors")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    ids, corpus = load_corpus_vectors()
+    if not len(ids):
+        print("No vectors found; run initialize_data.py first")
+        return 1
+    print(f"Loaded {len(ids)} vectors of dimension {corpus.shape[1]}")
+
+    # Perturbed copies of stored chunks stand in for queries, so no embedding calls are needed
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(ids), size=min(args.queries, len(ids)), replace=False)
+    queries = corpus[sample] + rng.normal(0, 0.01, size=(len(sample), corpus.shape[1])).astype(np.float32)
+
+    results = []
+    for space in args.space:
+        truth = exact_top_k(corpus, queries, args.k, space)
+        for m, ef_construction, ef_search in itertools.product(args.m, args.ef_construction, args.ef_search):
+            result = run_config(ids, corpus, queries, truth, args.k, space, m, ef_construction, ef_search)
+            results.append(result)
+            print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {len(results)} configurations to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
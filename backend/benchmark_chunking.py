@@ -0,0 +1,98 @@
+import argparse
+import glob
+import itertools
+import json
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from config import settings
+from data_processing.chunker import Chunker
+from data_processing.hashing import file_digest
+from data_processing.page_cache import PageTextCache
+from data_processing.pdf_processor import PDFProcessor
+
+def load_documents(paths):
+    """(source, pages) per PDF, from the page text cache when possible."""
+    cache = PageTextCache(settings.page_text_cache_dir) if settings.page_text_cache_dir else None
+    documents = []
+    for path in paths:
+        cached = cache.load(file_digest(path)) if cache else None
+        pages = cached[0] if cached else PDFProcessor.load_pdf(path)
+        documents.append((os.path.basename(path), pages))
+    return documents
+
+def per_page_splitter(documents, chunk_size, overlap):
+    """The previous behaviour: a new splitter for every page, no cross-page chunks."""
+    count = 0
+    for _, pages in documents:
+        for page_text in pages:
+            if not page_text or not page_text.strip():
+                continue
+            splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap,
+                                                      length_function=len)
+            count += len(splitter.split_text(page_text))
+    return count
+
+def run_config(documents, total_bytes, name, chunk_fn, repeat):
+    timings, chunk_count = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunk_count = chunk_fn()
+        timings.append(time.perf_counter() - start)
+    seconds = min(timings)
+    return {
+        "config": name,
+        "chunks": chunk_count,
+        "seconds": round(seconds, 3),
+        "chunks_per_sec": round(chunk_count / seconds, 1) if seconds else None,
+        "mb_per_sec": round(total_bytes / 1e6 / seconds, 2) if seconds else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunking throughput on the PDF corpus (chunks/sec, MB/sec)")
+    parser.add_argument("--pdf", nargs="+", help="PDFs to chunk (default: the configured corpus)")
+    parser.add_argument("--chunk-size", nargs="+", type=int, default=[settings.chunk_size])
+    parser.add_argument("--overlap", type=int, default=settings.chunk_overlap)
+    parser.add_argument("--unit", nargs="+", default=["chars", "tokens"])
+    parser.add_argument("--repeat", type=int, default=3, help="runs per configuration; the fastest is reported")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    paths = args.pdf
+    if not paths:
+        paths = sorted(glob.glob(os.path.join(settings.pdf_directory, "*.pdf"))) if settings.pdf_directory else [settings.pdf_path]
+    documents = load_documents(paths)
+    total_bytes = sum(len((page or "").encode("utf-8")) for _, pages in documents for page in pages)
+    print(f"Loaded {len(documents)} documents, {sum(len(p) for _, p in documents)} pages, "
+          f"{total_bytes / 1e6:.2f} MB of text")
+
+    results = []
+    for chunk_size in args.chunk_size:
+        result = run_config(documents, total_bytes, f"per_page_splitter size={chunk_size}",
+                            lambda: per_page_splitter(documents, chunk_size, args.overlap), args.repeat)
+        results.append(result)
+        print(json.dumps(result))
+
+        for unit, across_pages in itertools.product(args.unit, [False, True]):
+            chunker = Chunker(chunk_size, args.overlap, unit, across_pages)
+
+            def chunk_all():
+                return sum(len(chunks) for source, pages in documents
+                           for _, _, chunks in chunker.chunk_document(pages, source))
+
+            name = f"chunker size={chunk_size} unit={unit} across_pages={across_pages}"
+            result = run_config(documents, total_bytes, name, chunk_all, args.repeat)
+            results.append(result)
+            print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {len(results)} configurations to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
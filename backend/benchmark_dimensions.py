@@ -0,0 +1,57 @@
+import argparse
+import itertools
+import json
+import numpy as np
+from app.config import settings
+from app.data_processing.projection import EmbeddingProjection
+from benchmark_ann import load_corpus_vectors, exact_top_k, run_config
+
+def main():
+    parser = argparse.ArgumentParser(description="Index size, query latency and recall per embedding dimension")
+    parser.add_argument("--dims", nargs="+", type=int, default=[64, 128, 256, 512])
+    parser.add_argument("--reduction", nargs="+", default=["truncate", "pca"], choices=["truncate", "pca"])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200, help="stored chunks reused as query vectors")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    ids, corpus = load_corpus_vectors()
+    if not len(ids):
+        print("No vectors found; run initialize_data.py first")
+        return 1
+    print(f"Loaded {len(ids)} vectors of dimension {corpus.shape[1]}")
+    if settings.embedding_reduction != "none":
+        print("Note: the current index is already reduced; recall is measured against it, not full-size embeddings")
+
+    # Perturbed copies of stored chunks stand in for queries, so no embedding calls are needed
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(ids), size=min(args.queries, len(ids)), replace=False)
+    queries = corpus[sample] + rng.normal(0, 0.01, size=(len(sample), corpus.shape[1])).astype(np.float32)
+
+    # Recall is against the exact neighbours at full dimensionality
+    space = settings.chroma_distance_metric
+    truth = exact_top_k(corpus, queries, args.k, space)
+    index_args = (args.k, space, settings.hnsw_m, settings.hnsw_ef_construction, settings.hnsw_ef_search)
+
+    results = [{"reduction": "none", "dims": corpus.shape[1],
+                **run_config(ids, corpus, queries, truth, *index_args)}]
+    print(json.dumps(results[0]))
+    for reduction, dims in itertools.product(args.reduction, args.dims):
+        if dims >= corpus.shape[1] or (reduction == "pca" and dims > len(ids)):
+            continue
+        projection = EmbeddingProjection.fit(reduction, dims, corpus)
+        reduced = np.asarray(projection.apply(corpus), dtype=np.float32)
+        reduced_queries = np.asarray(projection.apply(queries), dtype=np.float32)
+        result = {"reduction": reduction, "dims": dims, **projection.describe(),
+                  **run_config(ids, reduced, reduced_queries, truth, *index_args)}
+        results.append(result)
+        print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {len(results)} configurations to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+
+from config import settings
+from retrieval_eval import CachedEmbeddings, evaluate_agent
+
+# Retrieval variants compared by default; each maps Settings fields to override
+DEFAULT_CONFIGS = [
+    {"name": "baseline"},
+    {"name": "raw_query", "pdf_use_expanded_query": False},
+    {"name": "no_keyword_boosts", "pdf_keyword_boosts": False},
+    {"name": "raw_query_no_boosts", "pdf_use_expanded_query": False, "pdf_keyword_boosts": False},
+    {"name": "no_section_filter", "section_filtering_enabled": False},
+    {"name": "neighbors_1", "pdf_neighbor_expansion": 1}
+]
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline retrieval quality vs latency evaluation")
+    parser.add_argument("--dataset", default="./data/retrieval_eval.json")
+    parser.add_argument("--configs", help="JSON list of {name, <settings overrides>}; e.g. point "
+                                          "chroma_persist_directory at an index built with another chunk_size")
+    parser.add_argument("--k", nargs="+", type=int, default=[1, 3, 5])
+    parser.add_argument("--embedding-cache", default="./data/eval_query_embeddings.json")
+    parser.add_argument("--refresh-cache", action="store_true", help="call the embeddings API for uncached queries")
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args()
+
+    with open(args.dataset) as f:
+        dataset = json.load(f)
+    unpaged = [item["question"] for item in dataset.get("pdf", []) if not item.get("relevant_pages")]
+    if len(unpaged) == len(dataset.get("pdf", [])):
+        print("No PDF question has relevant_pages, so no PDF recall/MRR is reported; "
+              "label pages in the dataset to measure PDF retrieval")
+    if unpaged:
+        print(f"{len(unpaged)} PDF questions without relevant_pages are reported only as "
+              f"pdf_section_filter_check (section titles match the filter by construction): {unpaged}")
+    configs = DEFAULT_CONFIGS
+    if args.configs:
+        with open(args.configs) as f:
+            configs = json.load(f)
+
+    from agent import RAGAgent
+
+    defaults = settings.model_dump()
+    report = {}
+    for config in configs:
+        overrides = {key: value for key, value in config.items() if key != "name"}
+        for key, value in {**defaults, **overrides}.items():
+            setattr(settings, key, value)
+
+        agent = RAGAgent()
+        cache = CachedEmbeddings(agent.embedding_manager.embeddings, args.embedding_cache,
+                                 offline=not args.refresh_cache)
+        agent.embedding_manager.embeddings = cache
+
+        result = evaluate_agent(agent, dataset, args.k)
+        if cache.missing:
+            result["embedding_cache_misses"] = len(set(cache.missing))
+        if cache.misses:
+            cache.save()
+        report[config["name"]] = result
+        print(json.dumps({"config": config["name"], **result}))
+
+    for key, value in defaults.items():
+        setattr(settings, key, value)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote report for {len(report)} configurations to {args.output}")
+
+    missing = sum(r.get("embedding_cache_misses", 0) for r in report.values())
+    if missing:
+        print(f"{missing} queries had no cached embedding; rerun once with --refresh-cache")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
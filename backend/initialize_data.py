@@ -1,6 +1,7 @@
 import os
 from app.data_processing import PDFProcessor, CSVProcessor, EmbeddingManager
 from app.config import settings
+from app.data_processing.pdf_processor import load_shard_registry
 
 def initialize_data():
     print("Starting data initialization...")
@@ -22,8 +23,9 @@ def initialize_data():
     # Process CSV
     print("\nProcessing CSV file...")
     try:
-        index = csv_processor.process_csv()
+        index = csv_processor.process_csv(force_rebuild=True)
         print(f"✓ CSV processing completed successfully. Indexed {len(index)} entries")
+        print(f"✓ CSV index snapshot written to {settings.csv_snapshot_path}")
     except Exception as e:
         print(f"✗ Error processing CSV: {str(e)}")
         return False
@@ -31,8 +33,9 @@ def initialize_data():
     # Verify ChromaDB persistence
     print("\nVerifying ChromaDB persistence...")
     try:
-        collection = embedding_manager.get_collection("pdf_documents")
-        count = collection.count()
+        count = 0
+        for name in load_shard_registry(settings.shard_registry_path):
+            count += embedding_manager.get_collection(name).count()
         print(f"✓ ChromaDB verification successful. Found {count} documents")
     except Exception as e:
         print(f"✗ Error verifying ChromaDB: {str(e)}")
@@ -0,0 +1,62 @@
+import unittest
+import asyncio
+from app.admission import AdmissionController, AdmissionRejected
+
+class TestAdmissionController(unittest.TestCase):
+    def run_async(self, coro):
+        return asyncio.run(coro)
+
+    def test_rejects_when_running_and_queue_are_full(self):
+        async def scenario():
+            controller = AdmissionController(max_concurrency=1, max_queue=1, per_session_limit=10, queue_timeout=5)
+            running = await controller.acquire()
+            queued = asyncio.ensure_future(controller.acquire())
+            await asyncio.sleep(0)
+            self.assertEqual(controller.stats()["queue_depth"], 1)
+
+            with self.assertRaises(AdmissionRejected) as rejected:
+                await controller.acquire()
+            self.assertEqual(rejected.exception.reason, "queue_full")
+            self.assertGreaterEqual(rejected.exception.retry_after, 1)
+
+            controller.release(running)
+            controller.release(await queued)
+            stats = controller.stats()
+            self.assertEqual((stats["active"], stats["queue_depth"], stats["admitted"]), (0, 0, 2))
+            self.assertEqual(stats["rejected"]["queue_full"], 1)
+        self.run_async(scenario())
+
+    def test_per_session_cap_counts_queued_requests(self):
+        async def scenario():
+            controller = AdmissionController(max_concurrency=1, max_queue=10, per_session_limit=2, queue_timeout=5)
+            first = await controller.acquire("a")
+            second = asyncio.ensure_future(controller.acquire("a"))
+            await asyncio.sleep(0)
+
+            with self.assertRaises(AdmissionRejected) as rejected:
+                await controller.acquire("a")
+            self.assertEqual(rejected.exception.reason, "session_limit")
+
+            # Another session still gets a place in the queue
+            other = asyncio.ensure_future(controller.acquire("b"))
+            await asyncio.sleep(0)
+            controller.release(first)
+            controller.release(await second)
+            controller.release(await other)
+            self.assertEqual(controller.sessions, {})
+        self.run_async(scenario())
+
+    def test_queue_timeout_frees_the_session(self):
+        async def scenario():
+            controller = AdmissionController(max_concurrency=1, max_queue=10, per_session_limit=1, queue_timeout=0.01)
+            running = await controller.acquire()
+            with self.assertRaises(AdmissionRejected) as rejected:
+                await controller.acquire("a")
+            self.assertEqual(rejected.exception.reason, "queue_timeout")
+            self.assertNotIn("a", controller.sessions)
+            controller.release(running)
+            self.assertEqual(controller.stats()["queue_depth"], 0)
+        self.run_async(scenario())
+
+if __name__ == '__main__':
+    unittest.main()
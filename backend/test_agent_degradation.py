@@ -0,0 +1,126 @@
+import unittest
+from types import SimpleNamespace
+from app import agent
+from app.agent import EnhancedRAGAgent
+
+settings = agent.settings
+INTENT = {"primary_intent": "information_retrieval", "confidence": "high", "military_terms_found": ["warning order"],
+          "intent_scores": {}}
+STRATEGY = {"strategy": "hybrid_approach", "primary_tool": "pdf", "secondary_tool": "csv",
+            "prompt_strategy": "knowledge_focused", "strategy_confidence": 0.8, "reasoning_steps": []}
+PDF_RESULTS = [{"text": "The commander issues the warning order to subordinate units early.",
+                "metadata": {"source": "fm.pdf", "page": 12}, "relevance_score": 0.9}]
+
+class FakeEmbeddings:
+    def __init__(self, results=()):
+        self.results = list(results)
+        self.calls = []
+
+    def query_shards(self, collection_names, query, n_results, where=None, deadline=None):
+        self.calls.append(n_results)
+        return [dict(r) for r in self.results]
+
+class FakeLLM:
+    max_tokens = None
+    model_name = "gpt-test"
+
+    def invoke(self, messages, **kwargs):
+        return SimpleNamespace(content="Issue the warning order early.",
+                               response_metadata={"token_usage": {"prompt_tokens": 40, "completion_tokens": 8}})
+
+class FakeCaller:
+    def __init__(self):
+        self.kwargs = None
+
+    def call(self, fn, messages, deadline=None, **kwargs):
+        self.kwargs = kwargs
+        return fn(messages, **kwargs)
+
+class FakeRouter:
+    def __init__(self):
+        self.llm = FakeLLM()
+        self.caller = FakeCaller()
+
+    def route(self, query, strategy, csv_results):
+        return "standard"
+
+    def llm_for(self, tier):
+        return self.llm
+
+    def caller_for(self, tier):
+        return self.caller
+
+class FakePacker:
+    def pack(self, csv_results, pdf_results, prompt_strategy):
+        return {"context": "context", "csv_results": csv_results, "pdf_results": pdf_results,
+                "sources_dropped": 0, "context_tokens": 20, "budget": 100}
+
+def make_agent(results=()) -> EnhancedRAGAgent:
+    """An agent wired to in-memory fakes instead of Chroma and the OpenAI API."""
+    rag = object.__new__(EnhancedRAGAgent)
+    rag.state = SimpleNamespace(pdf_shards=["fm_5_0"], embedding_manager=FakeEmbeddings(results),
+                                chunk_store=[], section_titles={}, csv_processor=None, version=1)
+    rag.model_router = FakeRouter()
+    rag.context_packer = FakePacker()
+    rag.enhanced_csv_search = lambda query, intent_analysis, max_results=5, state=None: []
+    return rag
+
+class TestAgentDegradation(unittest.TestCase):
+    def setUp(self):
+        self.saved = (settings.answer_mode, settings.pdf_neighbor_expansion)
+        settings.answer_mode = "generative"
+        settings.pdf_neighbor_expansion = 0
+
+    def tearDown(self):
+        settings.answer_mode, settings.pdf_neighbor_expansion = self.saved
+
+    def test_nearly_spent_budget_answers_extractively(self):
+        rag = make_agent()
+        deadline = agent.RequestDeadline(settings.degrade_extractive_below / 2)
+        response = rag.generate_enhanced_response("How is the warning order issued?", [], PDF_RESULTS,
+                                                  INTENT, STRATEGY, deadline)
+        self.assertEqual(response["answer_mode"], "extractive")
+        self.assertEqual(response["reasoning_chain"]["extractive_reason"], "deadline")
+        self.assertEqual(response["reasoning_chain"]["citations"], ["p. 12"])
+        self.assertEqual(deadline.degradations, ["extractive_answer"])
+        self.assertIsNone(rag.model_router.caller.kwargs)
+
+    def test_short_budget_caps_the_answer_length(self):
+        rag = make_agent()
+        deadline = agent.RequestDeadline((settings.degrade_extractive_below + settings.degrade_cap_answer_below) / 2)
+        response = rag.generate_enhanced_response("How is the warning order issued?", [], PDF_RESULTS,
+                                                  INTENT, STRATEGY, deadline)
+        self.assertNotIn("answer_mode", response)
+        self.assertEqual(rag.model_router.caller.kwargs, {"max_tokens": settings.degraded_max_tokens})
+        self.assertEqual(deadline.degradations, ["capped_answer_length"])
+
+    def test_empty_pdf_search_skips_the_requery_when_short_of_time(self):
+        rag = make_agent()
+        deadline = agent.RequestDeadline(settings.degrade_skip_requery_below / 2)
+        self.assertEqual(rag.enhanced_pdf_search("warning order", INTENT, 3, deadline=deadline), [])
+        # One search, without the candidate multiplier
+        self.assertEqual(rag.state.embedding_manager.calls, [3])
+        self.assertEqual(deadline.degradations, ["skipped_pdf_requery"])
+
+    def test_process_query_reports_every_degradation(self):
+        rag = make_agent()
+        deadline = agent.RequestDeadline(settings.degrade_extractive_below / 2)
+        analysis = {"intent_analysis": INTENT, "strategy": STRATEGY}
+        response = rag.process_query("How is the warning order issued?", deadline=deadline, analysis=analysis)
+        self.assertEqual(response["degradations"], ["reduced_results", "skipped_secondary_tool:csv",
+                                                    "skipped_pdf_requery", "extractive_answer"])
+        self.assertEqual(response["deadline"]["degradations"], response["degradations"])
+        self.assertEqual(rag.state.embedding_manager.calls, [settings.degraded_max_results])
+
+    def test_no_budget_never_degrades(self):
+        rag = make_agent(PDF_RESULTS)
+        analysis = {"intent_analysis": INTENT, "strategy": STRATEGY}
+        response = rag.process_query("How is the warning order issued?", analysis=analysis)
+        self.assertEqual(response["degradations"], [])
+        self.assertIsNone(response["deadline"])
+        self.assertEqual(response["answer"], "Issue the warning order early.")
+        self.assertEqual(rag.model_router.caller.kwargs, {})
+        self.assertEqual(rag.state.embedding_manager.calls, [5 * settings.pdf_candidate_multiplier])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from app.chunk_merger import MIN_OVERLAP_CHARS, merge_adjacent_chunks
+
+OVERLAP = "the commander issues the warning order "
+
+def chunk(text: str, page: int, index: int, score: float, tokens=None, source: str = "fm.pdf",
+          terms=None) -> dict:
+    metadata = {"source": source, "page": page, "page_end": page, "chunk_index": index}
+    if tokens is not None:
+        metadata["token_count"] = tokens
+    return {"text": text, "metadata": metadata, "relevance_score": score, "military_terms_matched": terms or []}
+
+class TestMergeAdjacentChunks(unittest.TestCase):
+    def test_splitter_overlap_is_emitted_once(self):
+        first = chunk("Mission analysis begins; " + OVERLAP, 3, 0, 0.5)
+        second = chunk(OVERLAP + "as soon as possible.", 3, 1, 0.8)
+        merged = merge_adjacent_chunks([second, first], max_overlap=100)
+        self.assertEqual(len(merged), 1)
+        self.assertEqual(merged[0]["text"], "Mission analysis begins; " + OVERLAP + "as soon as possible.")
+        self.assertEqual(merged[0]["merged_chunks"], 2)
+        self.assertEqual(merged[0]["relevance_score"], 0.8)
+        self.assertEqual(merged[0]["metadata"]["chunk_indices"], [0, 1])
+
+    def test_short_coincidental_overlap_is_kept(self):
+        shared = "x" * (MIN_OVERLAP_CHARS - 1)
+        merged = merge_adjacent_chunks([chunk("a " + shared, 1, 0, 0.5), chunk(shared + " b", 1, 1, 0.4)],
+                                       max_overlap=100)
+        self.assertEqual(merged[0]["text"], "a " + shared + "\n" + shared + " b")
+
+    def test_gaps_pages_and_sources_split_runs(self):
+        results = [
+            chunk("one", 1, 0, 0.9), chunk("two", 1, 1, 0.8), chunk("four", 1, 3, 0.7),
+            chunk("other page", 2, 2, 0.6), chunk("other document", 1, 2, 0.5, source="adp.pdf")
+        ]
+        merged = merge_adjacent_chunks(results, max_overlap=0)
+        self.assertEqual([r["text"] for r in merged], ["one\ntwo", "four", "other page", "other document"])
+
+    def test_duplicate_hits_keep_the_better_score(self):
+        merged = merge_adjacent_chunks([chunk("same", 1, 0, 0.3), chunk("same", 1, 0, 0.7)], max_overlap=0)
+        self.assertEqual(len(merged), 1)
+        self.assertEqual(merged[0]["relevance_score"], 0.7)
+        self.assertNotIn("merged_chunks", merged[0])
+
+    def test_token_count_scales_with_surviving_text(self):
+        first = chunk("Mission analysis begins; " + OVERLAP, 3, 0, 0.5, tokens=20)
+        second = chunk(OVERLAP + "as soon as possible.", 3, 1, 0.8, tokens=20)
+        merged = merge_adjacent_chunks([first, second], max_overlap=100)[0]
+        total_chars = len(first["text"]) + len(second["text"])
+        self.assertEqual(merged["metadata"]["token_count"], round(40 * len(merged["text"]) / total_chars))
+        self.assertLess(merged["metadata"]["token_count"], 40)
+
+        unknown = merge_adjacent_chunks([chunk("a", 3, 0, 0.5, tokens=5), chunk("b", 3, 1, 0.5)], max_overlap=0)[0]
+        self.assertNotIn("token_count", unknown["metadata"])
+
+    def test_military_terms_are_combined_without_duplicates(self):
+        merged = merge_adjacent_chunks([chunk("a", 1, 0, 0.5, terms=["MDMP", "COA"]),
+                                        chunk("b", 1, 1, 0.5, terms=["COA", "OPORD"])], max_overlap=0)[0]
+        self.assertEqual(merged["military_terms_matched"], ["MDMP", "COA", "OPORD"])
+
+    def test_results_without_position_pass_through_sorted_by_score(self):
+        loose = {"text": "no metadata", "metadata": {}, "relevance_score": 0.95}
+        merged = merge_adjacent_chunks([chunk("one", 1, 0, 0.4), loose], max_overlap=0)
+        self.assertEqual([r["text"] for r in merged], ["no metadata", "one"])
+
+if __name__ == "__main__":
+    unittest.main()
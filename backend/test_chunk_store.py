@@ -0,0 +1,63 @@
+import unittest
+import os
+import tempfile
+from app.data_processing.chunk_store import ChunkStore, make_chunk_id
+
+def page_chunks(source: str, page_num: int, texts, chapter: str = "") -> list:
+    return [{"text": text, "metadata": {"source": source, "page": page_num, "page_end": page_num,
+                                         "chunk_index": i, "chapter": chapter, "section": ""}}
+            for i, text in enumerate(texts)]
+
+class TestChunkStore(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "index", "chunks.json")
+        self.store = ChunkStore(self.path)
+        self.page_text = "Alpha beta. Gamma delta. Epsilon zeta."
+        self.ids = self.store.add_page(4, self.page_text,
+                                       page_chunks("fm.pdf", 4, ["Alpha beta.", "Gamma delta.", "Epsilon zeta."],
+                                                   "Chapter 1"))
+
+    def test_add_page_returns_ids_and_offsets_in_order(self):
+        self.assertEqual(self.ids, [make_chunk_id(4, i) for i in range(3)])
+        offsets = [entry["offset"] for entry in self.store.get_page_entries(4)]
+        self.assertEqual(offsets, [0, 12, 25])
+        self.assertEqual([c["text"] for c in self.store.get_page(4)],
+                         ["Alpha beta.", "Gamma delta.", "Epsilon zeta."])
+
+    def test_get_returns_a_copy(self):
+        chunk = self.store.get(self.ids[1])
+        self.assertEqual(chunk["id"], self.ids[1])
+        chunk["metadata"]["page"] = 99
+        self.assertEqual(self.store.get(self.ids[1])["metadata"]["page"], 4)
+        self.assertIsNone(self.store.get("page_1_chunk_9"))
+
+    def test_neighbors_stay_on_the_page(self):
+        self.assertEqual([c["id"] for c in self.store.get_neighbors(self.ids[1], 1)], [self.ids[0], self.ids[2]])
+        self.assertEqual([c["id"] for c in self.store.get_neighbors(self.ids[0], 5)], self.ids[1:])
+        self.assertEqual(self.store.get_neighbors(self.ids[0], 0), [])
+        self.assertEqual(self.store.get_neighbors("missing", 1), [])
+
+    def test_prefixed_documents_are_kept_apart(self):
+        other = self.store.add_page(4, "Other text.", page_chunks("adp.pdf", 4, ["Other text."]), "adp_")
+        self.assertEqual(other, ["adp_page_4_chunk_0"])
+        self.assertEqual(len(self.store.get_page(4, "fm.pdf")), 3)
+        self.assertEqual(len(self.store.get_page(4, "adp.pdf")), 1)
+        # Ambiguous without a source once there are several documents
+        self.assertEqual(self.store.get_page(4), [])
+        self.assertEqual(self.store.page_count(), 2)
+
+    def test_save_and_load_round_trip(self):
+        self.store.save()
+        loaded = ChunkStore.load(self.path)
+        self.assertEqual(len(loaded), 3)
+        self.assertEqual(loaded.get_page_entries(4), self.store.get_page_entries(4))
+        self.assertEqual([c["id"] for c in loaded.get_neighbors(self.ids[2], 1)], [self.ids[1]])
+        self.assertEqual(loaded.section_titles(), {"chapter": ["Chapter 1"], "section": []})
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+
+    def test_missing_file_loads_empty(self):
+        store = ChunkStore.load(self.path + ".missing")
+        self.assertEqual((len(store), store.page_count()), (0, 0))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import os
+import tempfile
+from app.data_processing.chunker import Chunker
+from app.data_processing.chunk_store import ChunkStore
+from app.chunk_merger import merge_adjacent_chunks
+
+PAGES = [
+    "one two three four five",
+    "six seven eight nine ten",
+    "eleven twelve thirteen fourteen"
+]
+
+class TestCrossPageChunking(unittest.TestCase):
+    def setUp(self):
+        # 60 chars fits pages 1 and 2 together but not page 3 as well
+        chunker = Chunker(chunk_size=60, overlap=0, across_pages=True)
+        self.pages = chunker.chunk_document(PAGES, "fm.pdf")
+        self.store = ChunkStore(os.path.join(tempfile.mkdtemp(), "chunks.json"))
+        self.ids = [chunk_id for page_num, page_text, chunks in self.pages
+                    for chunk_id in self.store.add_page(page_num, page_text, chunks)]
+
+    def test_chunk_spanning_a_page_break_is_numbered_through_the_document(self):
+        chunks = [chunk for _, _, page_chunks in self.pages for chunk in page_chunks]
+        self.assertEqual([(c["metadata"]["page"], c["metadata"]["page_end"]) for c in chunks], [(1, 2), (3, 3)])
+        self.assertEqual([c["metadata"]["chunk_index"] for c in chunks], [0, 1])
+        self.assertTrue(all(c["metadata"]["chunk_index_scope"] == "document" for c in chunks))
+
+    def test_neighbors_reach_across_the_page_break(self):
+        first, second = self.ids
+        self.assertEqual([n["id"] for n in self.store.get_neighbors(second, 1)], [first])
+        self.assertEqual([n["id"] for n in self.store.get_neighbors(first, 1)], [second])
+
+    def test_consecutive_chunks_on_different_pages_merge(self):
+        results = [{**self.store.get(chunk_id), "relevance_score": score}
+                   for chunk_id, score in zip(self.ids, (0.4, 0.9))]
+        merged = merge_adjacent_chunks(results, max_overlap=0)
+        self.assertEqual(len(merged), 1)
+        metadata = merged[0]["metadata"]
+        self.assertEqual((metadata["page"], metadata["page_end"], metadata["chunk_indices"]), (1, 3, [0, 1]))
+        self.assertEqual(merged[0]["text"], "\n".join(PAGES))
+        self.assertEqual(merged[0]["relevance_score"], 0.9)
+
+    def test_per_page_chunks_still_merge_only_within_their_page(self):
+        results = [
+            {"text": "page five tail", "metadata": {"source": "fm.pdf", "page": 5, "chunk_index": 3,
+                                                    "chunk_index_scope": "page"}},
+            {"text": "page nine head", "metadata": {"source": "fm.pdf", "page": 9, "chunk_index": 4,
+                                                    "chunk_index_scope": "page"}}
+        ]
+        self.assertEqual(len(merge_adjacent_chunks(results, max_overlap=0)), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from app.context_packer import ContextPacker, CSV_SECTION_HEADER, PDF_SECTION_HEADER
+
+def csv_result(name: str, tokens: int, score: float) -> dict:
+    return {"template_name": name, "field_label": "Field", "instructions": "Fill it in",
+            "token_count": tokens, "relevance_score": score}
+
+def pdf_result(page: int, tokens: int, score: float) -> dict:
+    return {"text": f"Text of page {page}", "relevance_score": score,
+            "metadata": {"source": "fm.pdf", "page": page, "token_count": tokens}}
+
+class TestContextPacker(unittest.TestCase):
+    def pack(self, budget, csv_results=(), pdf_results=()):
+        return ContextPacker(budgets={"test": budget}, default_budget=0).pack(
+            list(csv_results), list(pdf_results), "test")
+
+    def test_stays_within_budget_and_counts_what_was_dropped(self):
+        sources = [pdf_result(page, 100, 1.0 - page / 10) for page in range(1, 6)]
+        packed = self.pack(350, pdf_results=sources)
+        self.assertLessEqual(packed["context_tokens"], 350)
+        self.assertEqual([r["metadata"]["page"] for r in packed["pdf_results"]], [1, 2, 3])
+        self.assertEqual(packed["sources_dropped"], 2)
+        self.assertEqual(packed["budget"], 350)
+
+    def test_highest_relevance_wins_across_sections(self):
+        csv = csv_result("DA638", 100, 0.4)
+        pdf = pdf_result(7, 100, 0.9)
+        packed = self.pack(150, [csv], [pdf])
+        self.assertEqual(packed["pdf_results"], [pdf])
+        self.assertEqual(packed["csv_results"], [])
+        self.assertIn(PDF_SECTION_HEADER, packed["context"])
+        self.assertNotIn(CSV_SECTION_HEADER, packed["context"])
+
+    def test_kept_sources_stay_in_retrieval_order(self):
+        sources = [pdf_result(1, 50, 0.2), pdf_result(2, 50, 0.9), pdf_result(3, 50, 0.5)]
+        packed = self.pack(1000, pdf_results=sources)
+        self.assertEqual(packed["pdf_results"], sources)
+        context = packed["context"]
+        self.assertLess(context.index("Text of page 1"), context.index("Text of page 2"))
+        self.assertLess(context.index("Text of page 2"), context.index("Text of page 3"))
+
+    def test_source_too_large_for_the_budget_is_skipped_not_truncated(self):
+        large = pdf_result(1, 500, 0.9)
+        small = pdf_result(2, 50, 0.1)
+        packed = self.pack(200, pdf_results=[large, small])
+        self.assertEqual(packed["pdf_results"], [small])
+        self.assertEqual(packed["sources_dropped"], 1)
+        self.assertNotIn("Text of page 1", packed["context"])
+
+    def test_nothing_fits_in_a_tiny_budget(self):
+        packed = self.pack(5, [csv_result("DA638", 10, 0.5)], [pdf_result(1, 10, 0.5)])
+        self.assertEqual((packed["context"], packed["context_tokens"], packed["sources_dropped"]), ("", 0, 2))
+
+    def test_unknown_strategy_uses_the_default_budget(self):
+        packer = ContextPacker(budgets={"test": 10}, default_budget=2000)
+        self.assertEqual(packer.budget_for("test"), 10)
+        self.assertEqual(packer.budget_for("other"), 2000)
+
+if __name__ == "__main__":
+    unittest.main()
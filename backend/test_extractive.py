@@ -0,0 +1,78 @@
+import unittest
+from app.extractive import build_extractive_answer, query_terms, score_sentence, split_sentences
+
+def pdf(text: str, page: int, source: str = "fm.pdf", page_end=None, score: float = 0.5) -> dict:
+    metadata = {"source": source, "page": page}
+    if page_end is not None:
+        metadata["page_end"] = page_end
+    return {"text": text, "metadata": metadata, "relevance_score": score}
+
+class TestExtractiveAnswer(unittest.TestCase):
+    def test_split_sentences_drops_fragments(self):
+        text = "Mission analysis is the second step of MDMP. See figure 5-2.  The staff\nbriefs the commander on it."
+        self.assertEqual(split_sentences(text), ["Mission analysis is the second step of MDMP.",
+                                                 "The staff briefs the commander on it."])
+
+    def test_query_terms_skip_stopwords_and_duplicates(self):
+        self.assertEqual(query_terms("What is the mission analysis step?", ["mission", "MDMP"]),
+                         ["mission", "analysis", "step", "mdmp"])
+
+    def test_score_counts_distinct_terms_normalized_by_length(self):
+        terms = ["mission", "analysis"]
+        short = score_sentence("Mission analysis starts on receipt of mission.", terms)
+        long = score_sentence("Mission analysis starts on receipt of the higher headquarters order "
+                              "and continues through the approval of the restated mission.", terms)
+        self.assertGreater(short, long)
+        self.assertEqual(score_sentence("Course of action development follows later.", terms), 0.0)
+
+    def test_ranks_by_term_overlap(self):
+        result = build_extractive_answer(
+            "How does the commander issue the warning order?", [],
+            [pdf("The staff prepares many products during planning. "
+                 "The commander issues the warning order to subordinate units early.", 12),
+             pdf("A warning order alerts units to prepare for a coming operation.", 14, score=0.9)])
+        lines = result["answer"].split("\n")
+        self.assertEqual(lines[0], "- The commander issues the warning order to subordinate units early. [p. 12]")
+        self.assertEqual(lines[1], "- A warning order alerts units to prepare for a coming operation. [p. 14]")
+        self.assertEqual(result["sentences_used"], 2)
+
+    def test_citations_for_single_and_multiple_documents(self):
+        query = "rehearsal types"
+        single = build_extractive_answer(query, [], [
+            pdf("There are several rehearsal types the unit can use.", 40, page_end=41)])
+        self.assertEqual(single["citations"], ["pp. 40-41"])
+
+        multi = build_extractive_answer(query, [], [
+            pdf("There are several rehearsal types the unit can use.", 40, "fm.pdf"),
+            pdf("Combined arms rehearsal types vary by echelon and time.", 7, "adp.pdf")])
+        self.assertEqual(sorted(multi["citations"]), ["adp.pdf, p. 7", "fm.pdf, p. 40"])
+
+        template = build_extractive_answer("proposed citation length", [
+            {"template_name": "DA638", "field_label": "Proposed Citation",
+             "instructions": "Keep the proposed citation within the length the form allows."}], [])
+        self.assertEqual(template["citations"], ["DA638 - Proposed Citation"])
+
+    def test_duplicate_sentences_are_used_once(self):
+        sentence = "The running estimate is maintained by each staff section."
+        result = build_extractive_answer("who maintains the running estimate", [],
+                                         [pdf(sentence, 20), pdf(sentence, 20, score=0.9)])
+        self.assertEqual(result["sentences_used"], 1)
+        self.assertEqual(result["citations"], ["p. 20"])
+
+    def test_max_chars_skips_a_long_sentence_for_a_shorter_one(self):
+        long = ("The military decision making process is an iterative planning methodology that integrates "
+                "the activities of the commander, staff and subordinate headquarters in depth.")
+        short = "The decision making process has seven steps overall."
+        result = build_extractive_answer("military decision making process steps", [],
+                                         [pdf(long, 1), pdf(short, 2)], max_chars=80)
+        self.assertEqual(result["answer"], f"- {short} [p. 2]")
+        self.assertLessEqual(len(result["answer"]), 80)
+
+    def test_no_matching_sentences_gives_an_empty_answer(self):
+        empty = {"answer": "", "citations": [], "sentences_used": 0}
+        self.assertEqual(build_extractive_answer("rehearsal types", [], []), empty)
+        self.assertEqual(build_extractive_answer("rehearsal types", [],
+                                                 [pdf("Fires support the maneuver plan at every level.", 3)]), empty)
+
+if __name__ == "__main__":
+    unittest.main()
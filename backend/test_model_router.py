@@ -0,0 +1,58 @@
+import unittest
+from app import model_router
+from app.model_router import ModelRouter, TEMPLATE_DIRECT
+
+TIERS = {"fast": {"model": "gpt-3.5-turbo"}, "standard": {"model": "gpt-3.5-turbo"},
+         "complex": {"model": "gpt-4o"}}
+ROUTES = {"csv_only": "fast", "template_focused": "fast", "pdf_only": "standard",
+          "hybrid_approach": "complex", "knowledge_focused": "standard", "broken": "missing"}
+CSV_RESULTS = [{"template_name": "DA638: Recommendation for Award", "field_label": "Proposed Citation"}]
+
+class TestModelRouter(unittest.TestCase):
+    def setUp(self):
+        self.router = ModelRouter(TIERS, ROUTES, "standard")
+        self.saved = model_router.settings.template_direct_answers
+        model_router.settings.template_direct_answers = True
+
+    def tearDown(self):
+        model_router.settings.template_direct_answers = self.saved
+
+    def test_strategy_name_beats_prompt_strategy(self):
+        strategy = {"strategy": "hybrid_approach", "prompt_strategy": "template_focused"}
+        self.assertEqual(self.router.tier_for(strategy), "complex")
+        self.assertEqual(self.router.tier_for({"strategy": "unrouted", "prompt_strategy": "template_focused"}), "fast")
+
+    def test_unknown_or_unconfigured_tier_falls_back_to_default(self):
+        self.assertEqual(self.router.tier_for({"strategy": "unrouted"}), "standard")
+        self.assertEqual(self.router.tier_for({"strategy": "broken"}), "standard")
+        self.assertEqual(self.router.tier_for({}), "standard")
+        self.assertEqual(ModelRouter(TIERS, ROUTES, "nonexistent").default_tier, "fast")
+
+    def test_format_question_is_answered_from_the_template(self):
+        strategy = {"strategy": "csv_only", "prompt_strategy": "template_focused"}
+        query = "What is the format of the proposed citation on a DA638?"
+        self.assertTrue(self.router.is_template_lookup(query, strategy, CSV_RESULTS))
+        self.assertEqual(self.router.route(query, strategy, CSV_RESULTS), TEMPLATE_DIRECT)
+        self.assertEqual(self.router.stats()["requests_by_tier"], {TEMPLATE_DIRECT: 1})
+
+    def test_requests_to_write_something_go_to_an_llm_tier(self):
+        strategy = {"strategy": "csv_only", "prompt_strategy": "template_focused"}
+        for query in ("Write the proposed citation format for my Soldier",
+                      "Draft the award template instructions for my squad leader"):
+            self.assertFalse(self.router.is_template_lookup(query, strategy, CSV_RESULTS), query)
+            self.assertEqual(self.router.route(query, strategy, CSV_RESULTS), "fast")
+
+    def test_template_lookup_needs_csv_only_strategy_and_results(self):
+        query = "What is the format of the proposed citation?"
+        hybrid = {"strategy": "hybrid_approach", "prompt_strategy": "template_focused"}
+        self.assertFalse(self.router.is_template_lookup(query, hybrid, CSV_RESULTS))
+        self.assertEqual(self.router.route(query, hybrid, CSV_RESULTS), "complex")
+        self.assertFalse(self.router.is_template_lookup(query, {"strategy": "csv_only"}, []))
+
+    def test_template_lookup_can_be_disabled(self):
+        model_router.settings.template_direct_answers = False
+        self.assertFalse(self.router.is_template_lookup("What is the format of the citation?",
+                                                        {"strategy": "csv_only"}, CSV_RESULTS))
+
+if __name__ == "__main__":
+    unittest.main()
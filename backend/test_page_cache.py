@@ -0,0 +1,65 @@
+import unittest
+import os
+import tempfile
+from app.data_processing.page_cache import PageTextCache, PageTextFile
+
+PAGES = ["First page", "", "Third page with ünïcödé"]
+SECTIONS = {1: {"chapter": "Chapter 1", "section": "Fundamentals"}, 3: {"chapter": "Chapter 2", "section": ""}}
+
+class TestPageTextCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = PageTextCache(tempfile.mkdtemp())
+        self.pages_path, self.sections_path = self.cache._paths("abc123")
+
+    def test_round_trip(self):
+        self.cache.store("abc123", PAGES, SECTIONS)
+        self.assertEqual(self.cache.load("abc123"), (PAGES, SECTIONS))
+        with self.cache.open("abc123") as cached:
+            self.assertEqual(len(cached), 3)
+            self.assertEqual(cached.page(2), PAGES[2])
+            with self.assertRaises(IndexError):
+                cached.page(3)
+
+    def test_missing_entry_is_a_miss(self):
+        self.assertIsNone(self.cache.load("abc123"))
+        self.assertIsNone(self.cache.open("abc123"))
+
+    def test_pages_without_sections_file_are_a_miss(self):
+        # The sections file is written last, so without it the entry is incomplete
+        self.cache.store("abc123", PAGES, SECTIONS)
+        os.remove(self.sections_path)
+        self.assertIsNone(self.cache.load("abc123"))
+
+    def test_truncated_pages_file_is_a_miss(self):
+        self.cache.store("abc123", PAGES, SECTIONS)
+        size = os.path.getsize(self.pages_path)
+        for length in (size - 3, 30, 5, 0):
+            with open(self.pages_path, "r+b") as f:
+                f.truncate(length)
+            self.assertIsNone(self.cache.load("abc123"), f"truncated to {length} bytes")
+
+    def test_padded_pages_file_is_rejected(self):
+        self.cache.store("abc123", PAGES, SECTIONS)
+        with open(self.pages_path, "ab") as f:
+            f.write(b"extra")
+        with self.assertRaises(ValueError):
+            PageTextFile(self.pages_path)
+
+    def test_corrupt_file_and_sections_are_misses(self):
+        self.cache.store("abc123", PAGES, SECTIONS)
+        with open(self.sections_path, "w") as f:
+            f.write('{"1": {"chapter"')
+        self.assertIsNone(self.cache.load("abc123"))
+
+        self.cache.store("abc123", PAGES, SECTIONS)
+        with open(self.pages_path, "r+b") as f:
+            f.write(b"NOTPAGES")
+        self.assertIsNone(self.cache.load("abc123"))
+
+    def test_store_replaces_an_earlier_entry(self):
+        self.cache.store("abc123", PAGES, SECTIONS)
+        self.cache.store("abc123", ["Only page"], {})
+        self.assertEqual(self.cache.load("abc123"), (["Only page"], {}))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,313 @@
+import unittest
+import contextlib
+import io
+import random
+import re
+from typing import Dict
+from app.query_analysis import QueryAnalyzer
+from app.query_rules import MILITARY_TERMS, INTENT_PATTERNS, STRATEGY_RULES
+
+class LegacyAnalyzer:
+    """The lambda-matrix implementation QueryAnalyzer replaced, kept as the parity reference."""
+
+    def __init__(self):
+        self.military_terms = dict(MILITARY_TERMS)
+        self.intent_patterns = INTENT_PATTERNS
+        self.strategy_matrix = self._initialize_strategy_matrix()
+
+    def _initialize_strategy_matrix(self) -> Dict[str, Dict]:
+        """Initialize enhanced strategy determination matrix for better hybrid detection."""
+        return {
+            'csv_only': {
+                'conditions': {
+                    'document_generation_high': lambda scores: scores.get('document_generation', 0) >= 0.7 and scores.get('information_retrieval', 0) < 0.3,
+                    'form_specific': lambda query: any(form in query.lower() for form in ['da638', 'da31', 'da4856', 'ncoer', 'oer']) and not any(word in query.lower() for word in ['what', 'how', 'explain', 'describe']),
+                    'template_only': lambda query: any(word in query.lower() for word in ['template', 'format only', 'structure only']) and not any(word in query.lower() for word in ['doctrine', 'definition', 'explain']),
+                    'formatting_focus': lambda query: any(word in query.lower() for word in ['format', 'structure', 'layout']) and not any(doc in query.lower() for doc in ['opord', 'coa', 'frago', 'annex'])
+                },
+                'confidence_boost': 0.1,
+                'prompt_strategy': 'template_focused'
+            },
+            'pdf_only': {
+                'conditions': {
+                    'information_retrieval_high': lambda scores: scores.get('information_retrieval', 0) >= 0.6 and scores.get('document_generation', 0) < 0.3,
+                    'knowledge_query': lambda query: any(term in query.lower() for term in ['what is', 'explain', 'describe', 'definition of', 'role of']) and not any(word in query.lower() for word in ['write', 'create', 'draft', 'format']),
+                    'doctrinal_only': lambda query: any(term in query.lower() for term in ['doctrine', 'regulation', 'manual', 'publication']) and not any(word in query.lower() for word in ['write', 'create', 'draft']),
+                    'pure_knowledge': lambda query: query.lower().startswith(('what is', 'explain', 'describe', 'define')) and not any(word in query.lower() for word in ['section', 'paragraph', 'write', 'create'])
+                },
+                'confidence_boost': 0.1,
+                'prompt_strategy': 'knowledge_focused'
+            },
+            'hybrid_approach': {
+                'conditions': {
+                    'hybrid_request_high': lambda scores: scores.get('hybrid_request', 0) >= 0.4,
+                    'balanced_generation_retrieval': lambda scores: (scores.get('document_generation', 0) >= 0.3 and scores.get('information_retrieval', 0) >= 0.3),
+                    'document_plus_knowledge': lambda query: any(doc in query.lower() for doc in ['opord', 'coa', 'frago', 'fragord', 'annex', 'sitrep']) and any(action in query.lower() for action in ['write', 'create', 'draft', 'build', 'generate']),
+                    'section_writing': lambda query: any(section in query.lower() for section in ['section', 'paragraph', 'part']) and any(action in query.lower() for action in ['write', 'create', 'draft', 'phrase']),
+                    'formatting_with_content': lambda query: any(fmt in query.lower() for fmt in ['phrase', 'format', 'structure', 'include', 'goes in']) and any(doc in query.lower() for doc in ['opord', 'coa', 'frago', 'annex', 'statement']),
+                    'what_should_include': lambda query: any(phrase in query.lower() for phrase in ['what should', 'what to include', 'what goes in', 'how do i', 'list what']),
+                    'write_with_doctrine': lambda query: any(action in query.lower() for action in ['write', 'draft', 'create', 'build']) and any(doc in query.lower() for doc in ['mission statement', 'execution', 'scheme of maneuver', 'concept of support', 'command and signal']),
+                    'military_document_creation': lambda query: len([term for term in ['opord', 'coa', 'frago', 'fragord', 'annex', 'sitrep', 'conop'] if term in query.lower()]) >= 1 and len([action for action in ['write', 'create', 'draft', 'build', 'generate', 'phrase', 'format'] if action in query.lower()]) >= 1
+                },
+                'confidence_boost': 0.4,
+                'prompt_strategy': 'hybrid_reasoning'
+            },
+            'clarification_required': {
+                'conditions': {
+                    'ambiguous_high': lambda scores: scores.get('clarification_needed', 0) >= 0.6,
+                    'insufficient_context': lambda scores: max(scores.values()) < 0.4 if scores else True,
+                    'conflicting_signals': lambda scores: len([s for s in scores.values() if s >= 0.4]) >= 3 if scores else False,
+                    'very_short_query': lambda query: len(query.split()) <= 3 and not any(doc in query.lower() for doc in ['opord', 'coa', 'frago'])
+                },
+                'confidence_boost': 0.0,
+                'prompt_strategy': 'clarification'
+            }
+        }
+
+    def expand_military_terms(self, query: str) -> str:
+        """Expand military terminology and acronyms for better understanding."""
+        expanded_query = query.lower()
+        
+        # Track expansions for logging
+        expansions_made = []
+        
+        for term, definition in self.military_terms.items():
+            # Create regex pattern for whole word matching
+            pattern = r'\b' + re.escape(term) + r'\b'
+            if re.search(pattern, expanded_query):
+                # Add definition context without replacing the original term
+                expansion = f"{term} ({definition})"
+                expanded_query = re.sub(pattern, expansion, expanded_query)
+                expansions_made.append(term)
+        
+        return expanded_query
+
+    def analyze_query_intent(self, query: str) -> Dict[str, any]:
+        """Perform enhanced intent analysis with better hybrid detection."""
+        query_lower = query.lower()
+        expanded_query = self.expand_military_terms(query)
+        
+        intent_scores = {}
+        
+        # Calculate scores for each intent category
+        for intent_type, patterns in self.intent_patterns.items():
+            score = 0.0
+            indicators_found = []
+            
+            # Check primary indicators
+            if 'primary_indicators' in patterns:
+                primary_matches = sum(1 for indicator in patterns['primary_indicators'] 
+                                    if indicator in query_lower)
+                primary_score = min(primary_matches * 0.3, 1.0) * patterns['weight']
+                score += primary_score
+                
+                if primary_matches > 0:
+                    indicators_found.extend([ind for ind in patterns['primary_indicators'] if ind in query_lower])
+            
+            # Check secondary indicators
+            if 'secondary_indicators' in patterns:
+                secondary_matches = sum(1 for indicator in patterns['secondary_indicators'] 
+                                      if indicator in query_lower)
+                secondary_score = min(secondary_matches * 0.2, 0.6) * patterns['weight']
+                score += secondary_score
+                
+                if secondary_matches > 0:
+                    indicators_found.extend([ind for ind in patterns['secondary_indicators'] if ind in query_lower])
+            
+            # Check all other indicator types
+            for indicator_type in ['form_indicators', 'knowledge_indicators', 'context_indicators', 
+                                 'complexity_indicators', 'ambiguous_indicators', 'vague_indicators',
+                                 'formatting_indicators', 'format_knowledge_indicators', 
+                                 'document_type_indicators', 'hybrid_keywords']:
+                if indicator_type in patterns:
+                    matches = sum(1 for indicator in patterns[indicator_type] 
+                                if indicator in query_lower)
+                    if matches > 0:
+                        # Different weights for different indicator types
+                        if indicator_type in ['formatting_indicators', 'format_knowledge_indicators', 'hybrid_keywords']:
+                            indicator_score = min(matches * 0.25, 0.5) * patterns['weight']
+                        elif indicator_type in ['document_type_indicators']:
+                            indicator_score = min(matches * 0.3, 0.6) * patterns['weight']
+                        else:
+                            indicator_score = min(matches * 0.15, 0.4) * patterns['weight']
+                        
+                        score += indicator_score
+                        indicators_found.extend([ind for ind in patterns[indicator_type] if ind in query_lower])
+            
+            # Enhanced military terminology bonus
+            military_term_count = len([term for term in self.military_terms.keys() if term in query_lower])
+            military_bonus = min(military_term_count * 0.1, 0.3)
+            score += military_bonus
+            
+            # Special hybrid detection bonuses
+            if intent_type == 'hybrid_request':
+                # Bonus for document creation with specific military docs
+                doc_creation_bonus = 0
+                if any(action in query_lower for action in ['write', 'draft', 'create', 'build', 'generate']):
+                    if any(doc in query_lower for doc in ['opord', 'coa', 'frago', 'fragord', 'annex']):
+                        doc_creation_bonus = 0.3
+                
+                # Bonus for section/component questions
+                section_bonus = 0
+                if any(section in query_lower for section in ['section', 'paragraph', 'part', 'component']):
+                    if any(question in query_lower for question in ['what', 'how', 'include', 'goes in']):
+                        section_bonus = 0.2
+                
+                # Bonus for formatting + content questions
+                format_content_bonus = 0
+                if any(fmt in query_lower for fmt in ['phrase', 'format', 'structure']):
+                    if any(doc in query_lower for doc in ['statement', 'section', 'paragraph']):
+                        format_content_bonus = 0.25
+                
+                score += doc_creation_bonus + section_bonus + format_content_bonus
+            
+            # Normalize score
+            intent_scores[intent_type] = min(score, 1.0)
+        
+        # Determine primary intent
+        primary_intent = max(intent_scores.items(), key=lambda x: x[1])
+        
+        # Calculate confidence based on score separation
+        sorted_scores = sorted(intent_scores.values(), reverse=True)
+        if len(sorted_scores) > 1:
+            confidence = "high" if sorted_scores[0] - sorted_scores[1] >= 0.2 else "medium" if sorted_scores[0] >= 0.4 else "low"
+        else:
+            confidence = "high" if sorted_scores[0] >= 0.6 else "medium" if sorted_scores[0] >= 0.4 else "low"
+        
+        return {
+            'primary_intent': primary_intent[0],
+            'intent_scores': intent_scores,
+            'confidence': confidence,
+            'expanded_query': expanded_query,
+            'military_terms_found': [term for term in self.military_terms.keys() if term in query_lower]
+        }
+
+    def determine_tool_strategy(self, query: str, intent_analysis: Dict) -> Dict[str, any]:
+        """Determine enhanced tool usage strategy with better hybrid detection."""
+        
+        strategy_scores = {}
+        reasoning_steps = []
+        
+        # Evaluate each strategy against its conditions
+        for strategy_name, strategy_config in self.strategy_matrix.items():
+            score = 0.0
+            conditions_met = []
+            
+            if 'conditions' not in strategy_config:
+                continue
+                
+            for condition_name, condition_func in strategy_config['conditions'].items():
+                try:
+                    if condition_name.endswith('_high') or condition_name.endswith('_low'):
+                        # Score-based condition
+                        if condition_func(intent_analysis['intent_scores']):
+                            score += 0.25
+                            conditions_met.append(condition_name)
+                    else:
+                        # Query-based condition
+                        if condition_func(query):
+                            score += 0.25
+                            conditions_met.append(condition_name)
+                except Exception as e:
+                    # Handle any condition evaluation errors gracefully
+                    print(f"Error evaluating condition {condition_name}: {e}")
+            
+            # Apply confidence boost
+            if score > 0 and 'confidence_boost' in strategy_config:
+                score += strategy_config['confidence_boost']
+            
+            strategy_scores[strategy_name] = min(score, 1.0)
+            
+            if conditions_met:
+                reasoning_steps.append(f"{strategy_name}: {len(conditions_met)} conditions met - {', '.join(conditions_met)}")
+        
+        # Determine primary strategy
+        primary_strategy = max(strategy_scores.items(), key=lambda x: x[1])
+        
+        # Map strategy to tools
+        tool_mapping = {
+            'csv_only': {'primary': 'csv', 'secondary': None},
+            'pdf_only': {'primary': 'pdf', 'secondary': None},
+            'hybrid_approach': {'primary': 'csv', 'secondary': 'pdf'},
+            'clarification_required': {'primary': 'clarification', 'secondary': None}
+        }
+        
+        tools = tool_mapping[primary_strategy[0]]
+        
+        return {
+            'strategy': primary_strategy[0],
+            'strategy_confidence': primary_strategy[1],
+            'primary_tool': tools['primary'],
+            'secondary_tool': tools['secondary'],
+            'strategy_scores': strategy_scores,
+            'reasoning_steps': reasoning_steps,
+            'prompt_strategy': self.strategy_matrix[primary_strategy[0]]['prompt_strategy']
+        }
+
+QUERIES = [
+    "Write an award bullet for a Soldier that got a 600 on their ACFT",
+    "What is the role of the S6 during MDMP?",
+    "Write a situation paragraph for my infantry battalion's upcoming mission at NTC",
+    "Create a character assessment for an NCO evaluation",
+    "Explain the steps of the military decision making process",
+    "How do I phrase the mission statement in an OPORD?",
+    "What goes in the execution section of a FRAGO?",
+    "DA638 format only",
+    "help",
+    "opord",
+    "test query",
+    "Define commanders intent and end state",
+    "Draft the scheme of maneuver for a company attack using doctrine",
+    "List what should be in annex C",
+    "What does the S2 do regarding PIR and CCIR during COA development?",
+    "Template for NCOER bullets",
+    "Describe class IX supply and maintenance procedures per the manual",
+    "I need some general help with this thing",
+    "Write a detailed, comprehensive brief for the battalion commander about the exercise",
+    "what is   the role of s3 in  troop leading procedures",
+]
+
+def _generated_queries(count: int = 400):
+    """Random mixes of rule vocabulary so every condition gets exercised."""
+    analyzer = QueryAnalyzer(MILITARY_TERMS, INTENT_PATTERNS, STRATEGY_RULES)
+    vocabulary = sorted(analyzer.vocabulary) + ["the", "a", "soldier", "for", "my", "unit"]
+    rng = random.Random(5)
+    queries = []
+    for _ in range(count):
+        words = rng.sample(vocabulary, rng.randint(1, 9))
+        query = " ".join(words)
+        queries.append(query.upper() if rng.random() < 0.2 else query)
+    return queries
+
+class TestQueryAnalysisParity(unittest.TestCase):
+    def setUp(self):
+        self.legacy = LegacyAnalyzer()
+        self.analyzer = QueryAnalyzer(MILITARY_TERMS, INTENT_PATTERNS, STRATEGY_RULES, cache_size=64)
+
+    def _assert_same(self, query: str):
+        expected_intent = self.legacy.analyze_query_intent(query)
+        actual_intent = self.analyzer.analyze_intent(query)
+        self.assertEqual(actual_intent, expected_intent, query)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected_strategy = self.legacy.determine_tool_strategy(query, expected_intent)
+        actual_strategy = self.analyzer.determine_strategy(query, actual_intent)
+        self.assertEqual(actual_strategy, expected_strategy, query)
+
+    def test_example_queries_match_legacy(self):
+        for query in QUERIES:
+            self._assert_same(query)
+
+    def test_generated_queries_match_legacy(self):
+        for query in _generated_queries():
+            self._assert_same(query)
+
+    def test_results_are_memoized_and_isolated(self):
+        first = self.analyzer.analyze_intent("What is the role of the S6 during MDMP?")
+        first['intent_scores']['hybrid_request'] = 99
+        second = self.analyzer.analyze_intent("what is the role of the s6 during mdmp?")
+        self.assertNotEqual(second['intent_scores']['hybrid_request'], 99)
+        self.assertEqual(self.analyzer.cache_info()['intent']['hits'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from app.request_deadline import RequestDeadline
+
+THRESHOLDS = [8.0, 6.0, 5.0, 4.0, 1.5]
+
+class TestRequestDeadline(unittest.TestCase):
+    def test_tier_counts_the_thresholds_above_the_remaining_budget(self):
+        self.assertEqual(RequestDeadline(30.0).tier(THRESHOLDS), 0)
+        self.assertEqual(RequestDeadline(5.5).tier(THRESHOLDS), 2)
+        self.assertEqual(RequestDeadline(1.0).tier(THRESHOLDS), 5)
+        self.assertEqual(RequestDeadline(-1.0).tier(THRESHOLDS), 5)
+
+    def test_below_compares_the_remaining_budget(self):
+        deadline = RequestDeadline(5.0)
+        self.assertTrue(deadline.below(6.0))
+        self.assertFalse(deadline.below(4.0))
+        self.assertLessEqual(deadline.remaining(), 5.0)
+
+    def test_degradations_are_recorded_once_in_order(self):
+        deadline = RequestDeadline(2.0)
+        for name in ("reduced_results", "extractive_answer", "reduced_results"):
+            deadline.degrade(name)
+        self.assertEqual(deadline.degradations, ["reduced_results", "extractive_answer"])
+
+    def test_summary_reports_budget_remaining_and_degradations(self):
+        deadline = RequestDeadline(2.0)
+        deadline.degrade("extractive_answer")
+        summary = deadline.summary()
+        self.assertEqual(summary["budget_ms"], 2000)
+        self.assertTrue(0 < summary["remaining_ms"] <= 2000)
+        self.assertEqual(summary["degradations"], ["extractive_answer"])
+        self.assertEqual(RequestDeadline(-1.0).summary()["remaining_ms"], 0)
+
+    def test_no_budget_never_runs_low(self):
+        deadline = RequestDeadline()
+        self.assertFalse(deadline.below(1e9))
+        self.assertIsNone(deadline.tier(THRESHOLDS))
+        self.assertIsNone(deadline.summary())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import tempfile
+import time
+from app.request_profiler import RequestProfiler
+
+def busy_lookup(seconds):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        time.sleep(0.001)
+    return "done"
+
+class TestRequestProfiler(unittest.TestCase):
+    def test_profile_is_stored_as_folded_stacks(self):
+        profiler = RequestProfiler(tempfile.mkdtemp(), interval=0.002)
+        result, profile_id = profiler.run("req-1", "question", busy_lookup, 0.1)
+        self.assertEqual(result, "done")
+        self.assertEqual(profile_id, "req-1")
+
+        folded = profiler.get("req-1")
+        self.assertIn("busy_lookup", folded)
+        for line in folded.splitlines():
+            stack, count = line.rsplit(" ", 1)
+            self.assertTrue(stack.startswith("busy_lookup"))
+            self.assertGreater(int(count), 0)
+        self.assertEqual(profiler.list()[0]["request_id"], "req-1")
+        self.assertIsNone(profiler.get("../req-1"))
+
+    def test_runs_unprofiled_beyond_max_concurrent(self):
+        profiler = RequestProfiler(tempfile.mkdtemp(), max_concurrent=0)
+        result, profile_id = profiler.run("req-2", "question", busy_lookup, 0)
+        self.assertEqual(result, "done")
+        self.assertIsNone(profile_id)
+        self.assertIsNone(profiler.get("req-2"))
+        self.assertEqual(profiler.stats()["skipped_busy"], 1)
+
+    def test_reused_request_id_does_not_overwrite(self):
+        profiler = RequestProfiler(tempfile.mkdtemp(), interval=0.002)
+        _, first = profiler.run("same-id", "first question", busy_lookup, 0.01)
+        _, second = profiler.run("same-id", "second question", busy_lookup, 0.01)
+        self.assertEqual(first, "same-id")
+        self.assertNotEqual(second, first)
+        self.assertTrue(second.startswith("same-id-"))
+        labels = {profile["request_id"]: profile["label"] for profile in profiler.list()}
+        self.assertEqual(labels, {first: "first question", second: "second question"})
+        self.assertIsNotNone(profiler.get(second))
+
+    def test_unusable_request_id_is_replaced(self):
+        profiler = RequestProfiler(tempfile.mkdtemp(), interval=0.002)
+        _, profile_id = profiler.run("../../etc/passwd", "question", busy_lookup, 0)
+        self.assertNotIn("/", profile_id)
+        self.assertIsNotNone(profiler.get(profile_id))
+
+if __name__ == "__main__":
+    unittest.main()
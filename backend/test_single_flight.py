@@ -0,0 +1,105 @@
+import unittest
+import asyncio
+import threading
+from app.single_flight import FollowerTimeout, SingleFlight, normalize_query
+
+class TestSingleFlight(unittest.TestCase):
+    def run_async(self, coro):
+        return asyncio.run(coro)
+
+    def test_concurrent_callers_share_one_call(self):
+        async def scenario():
+            flight = SingleFlight()
+            release = threading.Event()
+            calls = []
+
+            def work(value):
+                calls.append(value)
+                release.wait(5)
+                return value * 2
+
+            leader = asyncio.ensure_future(flight.do("key", work, 21))
+            await asyncio.sleep(0.05)
+            follower = asyncio.ensure_future(flight.do("key", work, 21))
+            await asyncio.sleep(0)
+            release.set()
+            self.assertEqual(await leader, (42, False))
+            self.assertEqual(await follower, (42, True))
+            self.assertEqual(calls, [21])
+            self.assertEqual(flight.stats(), {"executed_requests": 1, "coalesced_requests": 1,
+                                              "follower_timeouts": 0, "in_flight": 0})
+        self.run_async(scenario())
+
+    def test_leader_failure_reaches_every_caller_and_is_not_cached(self):
+        async def scenario():
+            flight = SingleFlight()
+            release = threading.Event()
+
+            def fail():
+                release.wait(5)
+                raise RuntimeError("upstream down")
+
+            leader = asyncio.ensure_future(flight.do("key", fail))
+            await asyncio.sleep(0.05)
+            follower = asyncio.ensure_future(flight.do("key", fail))
+            await asyncio.sleep(0)
+            release.set()
+            for waiter in (leader, follower):
+                with self.assertRaisesRegex(RuntimeError, "upstream down"):
+                    await waiter
+            # The failed call is released, so the next caller runs its own
+            self.assertEqual(await flight.do("key", lambda: "recovered"), ("recovered", False))
+        self.run_async(scenario())
+
+    def test_cancelled_waiter_does_not_cancel_the_shared_call(self):
+        async def scenario():
+            flight = SingleFlight()
+            release = threading.Event()
+
+            def work():
+                release.wait(5)
+                return "answer"
+
+            leader = asyncio.ensure_future(flight.do("key", work))
+            await asyncio.sleep(0.05)
+            follower = asyncio.ensure_future(flight.do("key", work))
+            await asyncio.sleep(0)
+            # A client disconnect cancels the leader's request
+            leader.cancel()
+            await asyncio.sleep(0)
+            release.set()
+            self.assertEqual(await follower, ("answer", True))
+            self.assertTrue(leader.cancelled())
+            self.assertEqual(flight.stats()["in_flight"], 0)
+        self.run_async(scenario())
+
+    def test_follower_timeout_leaves_the_call_running(self):
+        async def scenario():
+            flight = SingleFlight()
+            release = threading.Event()
+
+            def work():
+                release.wait(5)
+                return "answer"
+
+            leader = asyncio.ensure_future(flight.do("key", work))
+            await asyncio.sleep(0.05)
+            with self.assertRaises(FollowerTimeout):
+                await flight.do("key", work, timeout=0.05)
+            release.set()
+            self.assertEqual(await leader, ("answer", False))
+            self.assertEqual(flight.stats()["follower_timeouts"], 1)
+        self.run_async(scenario())
+
+    def test_timeout_does_not_apply_to_the_leader(self):
+        async def scenario():
+            flight = SingleFlight()
+            self.assertEqual(await flight.do("key", lambda: "answer", timeout=0), ("answer", False))
+        self.run_async(scenario())
+
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query("  What is   MDMP?? "), "what is mdmp")
+        self.assertEqual(normalize_query("what is mdmp"), normalize_query("What is MDMP?"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import unittest
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+import numpy as np
+from app.data_processing import snapshot
+from app.data_processing.snapshot import MANIFEST, SnapshotError, export_snapshot, import_snapshot
+from app.data_processing.embeddings import create_chroma_client
+
+settings = snapshot.settings
+OVERRIDES = ("chroma_mode", "chroma_persist_directory", "shard_registry_path", "chunk_store_path",
+             "embedding_projection_dir", "embedding_model")
+COLLECTION = "fm_5_0"
+IDS = ["page_1_chunk_0", "page_1_chunk_1", "page_2_chunk_0"]
+DOCUMENTS = ["Mission analysis begins.", "The staff gathers facts.", "Course of action development."]
+METADATAS = [{"source": "fm.pdf", "page": 1, "chunk_index": 0}, {"source": "fm.pdf", "page": 1, "chunk_index": 1},
+             {"source": "fm.pdf", "page": 2, "chunk_index": 0}]
+VECTORS = [[0.1, 0.2, 0.3, 0.4], [0.5, 0.1, 0.0, 0.2], [0.9, 0.8, 0.7, 0.6]]
+
+def rewrite(source: str, target: str, replace=None, drop=(), edit_manifest=None) -> str:
+    """Copy a snapshot archive with entries replaced or dropped and the manifest edited."""
+    with zipfile.ZipFile(source) as archive:
+        entries = {name: archive.read(name) for name in archive.namelist()}
+    manifest = json.loads(entries.pop(MANIFEST))
+    for name in drop:
+        entries.pop(name)
+    entries.update(replace or {})
+    if edit_manifest is not None:
+        edit_manifest(manifest)
+    with zipfile.ZipFile(target, "w") as archive:
+        for name, data in entries.items():
+            archive.writestr(name, data)
+        archive.writestr(MANIFEST, json.dumps(manifest))
+    return target
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.saved = {key: getattr(settings, key) for key in OVERRIDES}
+        settings.chroma_mode = "persistent"
+        settings.embedding_model = "text-embedding-3-small"
+        self.use_store("source")
+
+        collection = create_chroma_client().create_collection(COLLECTION, embedding_function=None,
+                                                              metadata={"hnsw:space": "l2"})
+        collection.add(ids=IDS, documents=DOCUMENTS, metadatas=METADATAS, embeddings=VECTORS)
+        with open(settings.shard_registry_path, "w") as f:
+            json.dump({"shard_by": "single", "shards": {COLLECTION: ["fm.pdf"]}}, f)
+        with open(settings.chunk_store_path, "w") as f:
+            json.dump({"chunks": {}, "pages": {}}, f)
+
+        self.archive = os.path.join(self.directory, "snapshot.zip")
+        export_snapshot(self.archive)
+
+    def tearDown(self):
+        for key, value in self.saved.items():
+            setattr(settings, key, value)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def use_store(self, name: str) -> None:
+        base = os.path.join(self.directory, name)
+        os.makedirs(base, exist_ok=True)
+        settings.chroma_persist_directory = os.path.join(base, "chroma")
+        settings.shard_registry_path = os.path.join(base, "shards.json")
+        settings.chunk_store_path = os.path.join(base, "chunks.json")
+        settings.embedding_projection_dir = os.path.join(base, "projections")
+
+    def variant(self, **changes) -> str:
+        return rewrite(self.archive, os.path.join(self.directory, "variant.zip"), **changes)
+
+    def test_round_trip(self):
+        source_registry = open(settings.shard_registry_path).read()
+        self.use_store("target")
+        result = import_snapshot(self.archive)
+        self.assertEqual(result, {"collections": [COLLECTION], "chunks": 3})
+
+        stored = create_chroma_client().get_collection(COLLECTION).get(
+            ids=IDS, include=["documents", "metadatas", "embeddings"])
+        by_id = {chunk_id: i for i, chunk_id in enumerate(stored["ids"])}
+        order = [by_id[chunk_id] for chunk_id in IDS]
+        self.assertEqual([stored["documents"][i] for i in order], DOCUMENTS)
+        self.assertEqual([stored["metadatas"][i] for i in order], METADATAS)
+        self.assertTrue(np.allclose([stored["embeddings"][i] for i in order], VECTORS))
+        with open(settings.shard_registry_path) as f:
+            self.assertEqual(json.load(f), json.loads(source_registry))
+
+    def test_checksum_mismatch_is_rejected(self):
+        corrupt = self.variant(replace={f"collections/{COLLECTION}/documents.json": json.dumps(["x", "y", "z"])})
+        self.use_store("target")
+        with self.assertRaisesRegex(SnapshotError, "Checksum mismatch"):
+            import_snapshot(corrupt)
+
+    def test_missing_entry_is_rejected(self):
+        partial = self.variant(drop=[f"collections/{COLLECTION}/embeddings.npy"])
+        self.use_store("target")
+        with self.assertRaisesRegex(SnapshotError, "missing"):
+            import_snapshot(partial)
+
+    def test_count_and_dims_must_match_the_manifest(self):
+        self.use_store("target")
+        wrong_count = self.variant(edit_manifest=lambda m: m["collections"][COLLECTION].update(count=2))
+        with self.assertRaisesRegex(SnapshotError, "column lengths"):
+            import_snapshot(wrong_count)
+        wrong_dims = self.variant(edit_manifest=lambda m: m["collections"][COLLECTION].update(dims=8))
+        with self.assertRaisesRegex(SnapshotError, "expected 8 dims"):
+            import_snapshot(wrong_dims)
+        self.assertNotIn(COLLECTION, [c.name for c in create_chroma_client().list_collections()])
+
+    def test_embedding_model_mismatch_is_rejected(self):
+        self.use_store("target")
+        settings.embedding_model = "text-embedding-3-large"
+        with self.assertRaisesRegex(SnapshotError, "text-embedding-3-small"):
+            import_snapshot(self.archive)
+
+    def test_non_empty_collections_need_force(self):
+        # Importing back into the source store, whose collection holds data
+        with self.assertRaisesRegex(SnapshotError, "already hold data"):
+            import_snapshot(self.archive)
+        self.assertEqual(import_snapshot(self.archive, force=True)["chunks"], 3)
+        self.assertEqual(create_chroma_client().get_collection(COLLECTION).count(), 3)
+
+    def test_path_like_names_are_rejected(self):
+        payload = b"not a projection"
+        digest = hashlib.sha256(payload).hexdigest()
+        escaping = self.variant(replace={"projections/../escape.npz": payload},
+                                edit_manifest=lambda m: m["entries"].update({"projections/../escape.npz": digest}))
+        self.use_store("target")
+        with self.assertRaisesRegex(SnapshotError, "unsafe projection name"):
+            import_snapshot(escaping)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "target", "escape.npz")))
+
+        def rename_collection(manifest):
+            manifest["collections"]["../fm"] = manifest["collections"].pop(COLLECTION)
+        with self.assertRaisesRegex(SnapshotError, "unsafe collection name"):
+            import_snapshot(self.variant(edit_manifest=rename_collection))
+
+if __name__ == "__main__":
+    unittest.main()
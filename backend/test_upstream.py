@@ -0,0 +1,128 @@
+import unittest
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app import upstream
+from app.upstream import CircuitBreaker, CircuitOpenError, DeadlineExceeded, HedgedCaller
+
+def setUpModule():
+    # Stands in for the Settings-sized pool so no config is needed
+    upstream._executor = ThreadPoolExecutor(max_workers=8)
+
+def tearDownModule():
+    upstream._executor.shutdown(wait=False)
+    upstream._executor = None
+
+def failing():
+    raise ConnectionError("upstream down")
+
+def sleeper(seconds):
+    time.sleep(seconds)
+    return "ok"
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_at_error_rate_then_probes_after_cooldown(self):
+        breaker = CircuitBreaker(error_rate=0.5, min_calls=4, cooldown=0.05)
+        for success in (True, False, True):
+            breaker.record(success)
+        self.assertEqual(breaker.state, "closed")
+        breaker.record(False)
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, "half_open")
+        # Only the one probe goes through while it runs
+        self.assertFalse(breaker.allow())
+        breaker.record(True)
+        self.assertEqual(breaker.state, "closed")
+        self.assertTrue(breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker(error_rate=0.5, min_calls=1, cooldown=0.05)
+        breaker.record(False)
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record(False)
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.times_opened, 2)
+
+    def test_abandoned_probe_lets_the_next_call_probe(self):
+        breaker = CircuitBreaker(error_rate=0.5, min_calls=1, cooldown=0.05)
+        breaker.record(False)
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.abandon()
+        self.assertEqual(breaker.state, "open")
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.times_opened, 1)
+
+class TestHedgedCaller(unittest.TestCase):
+    def caller(self, deadline=1.0, hedge_percentile=0, min_calls=2):
+        breaker = CircuitBreaker(error_rate=0.5, min_calls=min_calls, cooldown=60)
+        return HedgedCaller("test", deadline, hedge_percentile, breaker)
+
+    def test_upstream_errors_open_the_breaker(self):
+        caller = self.caller()
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                caller.call(failing)
+        self.assertEqual(caller.breaker.state, "open")
+        with self.assertRaises(CircuitOpenError):
+            caller.call(sleeper, 0)
+        self.assertEqual(caller.stats()["rejected_by_breaker"], 1)
+
+    def test_request_deadline_does_not_count_against_upstream(self):
+        caller = self.caller(deadline=1.0)
+        for _ in range(5):
+            with self.assertRaises(DeadlineExceeded):
+                caller.call(sleeper, 0.2, deadline=0.02)
+        self.assertEqual(caller.breaker.state, "closed")
+        self.assertEqual(caller.stats()["deadline_exceeded"], 5)
+        self.assertEqual(caller.call(sleeper, 0), "ok")
+
+    def test_own_deadline_timeouts_count_against_upstream(self):
+        caller = self.caller(deadline=0.02)
+        for _ in range(2):
+            with self.assertRaises(DeadlineExceeded):
+                caller.call(sleeper, 0.2)
+        self.assertEqual(caller.breaker.state, "open")
+
+    def test_passed_deadline_skips_the_call(self):
+        caller = self.caller()
+        calls = []
+        with self.assertRaises(DeadlineExceeded):
+            caller.call(calls.append, 1, deadline=0)
+        self.assertEqual(calls, [])
+        self.assertEqual(caller.stats()["calls"], 0)
+
+    def test_hedge_wins_when_primary_is_slow(self):
+        caller = self.caller(deadline=2.0, hedge_percentile=50)
+        caller.latencies.extend([0.01] * HedgedCaller.MIN_SAMPLES)
+        attempts = itertools.count()
+        lock = threading.Lock()
+
+        def slow_then_fast():
+            with lock:
+                attempt = next(attempts)
+            time.sleep(1.0 if attempt == 0 else 0.0)
+            return attempt
+
+        start = time.monotonic()
+        self.assertEqual(caller.call(slow_then_fast), 1)
+        self.assertLess(time.monotonic() - start, 0.5)
+        stats = caller.stats()
+        self.assertEqual(stats["hedges_fired"], 1)
+        self.assertEqual(stats["hedge_wins"], 1)
+
+    def test_no_hedge_until_warmed_up(self):
+        caller = self.caller(hedge_percentile=50)
+        self.assertIsNone(caller.hedge_delay())
+        self.assertEqual(caller.call(sleeper, 0.01), "ok")
+        self.assertEqual(caller.stats()["hedges_fired"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
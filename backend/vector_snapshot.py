@@ -0,0 +1,31 @@
+import argparse
+import time
+from app.data_processing.snapshot import export_snapshot, import_snapshot, SnapshotError
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import the PDF vector store without re-embedding")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="write the current index to a snapshot file")
+    export_parser.add_argument("path")
+    import_parser = commands.add_parser("import", help="load a snapshot into this node's store")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--force", action="store_true", help="replace collections that already hold data")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        if args.command == "export":
+            manifest = export_snapshot(args.path)
+            chunks = sum(info["count"] for info in manifest["collections"].values())
+            print(f"✓ Exported {chunks} chunks in {len(manifest['collections'])} collections to {args.path}")
+        else:
+            result = import_snapshot(args.path, force=args.force)
+            print(f"✓ Imported {result['chunks']} chunks in {len(result['collections'])} collections from {args.path}")
+    except SnapshotError as e:
+        print(f"✗ {e}")
+        return 1
+    print(f"Done in {time.perf_counter() - start:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    exit(main())